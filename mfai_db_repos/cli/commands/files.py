@@ -14,7 +14,7 @@ from rich.table import Table
 from mfai_db_repos.lib.database.connection import get_session
 from mfai_db_repos.lib.database.repository import RepositoryRepository
 from mfai_db_repos.lib.database.repository_file import RepositoryFileRepository
-from mfai_db_repos.lib.file_processor.pipeline import ExtractionPipeline, ProcessingOptions
+from mfai_db_repos.lib.file_processor.pipeline import ExecutorMode, ExtractionPipeline, ProcessingOptions
 from mfai_db_repos.lib.git.repository import GitRepository
 from mfai_db_repos.utils.config import Config
 from mfai_db_repos.utils.logger import get_logger, setup_logging
@@ -84,6 +84,12 @@ def files_group():
     type=int,
     default=5,
 )
+@click.option(
+    "--executor",
+    help="How files are processed: serial, or in parallel with threads or processes",
+    type=click.Choice([mode.value for mode in ExecutorMode]),
+    default=ExecutorMode.SERIAL.value,
+)
 @click.option(
     "--verbose", "-v",
     help="Enable verbose logging",
@@ -101,6 +107,7 @@ def process_files(
     ignore_binary: bool,
     limit: Optional[int],
     workers: int,
+    executor: str,
     verbose: bool,
 ):
     """Process files in a repository."""
@@ -148,6 +155,7 @@ def process_files(
             pipeline = ExtractionPipeline(
                 config=Config(),
                 options=options,
+                executor=executor,
             )
             
             with Progress(
@@ -71,6 +71,11 @@ def process():
     help="Include repository README.md content in file analysis for better context",
     is_flag=True,
 )
+@click.option(
+    "--incremental",
+    help="Only process files changed since the last indexed commit",
+    is_flag=True,
+)
 def repository(
     repo_url: Optional[str] = None,
     repo_id: Optional[int] = None,
@@ -81,6 +86,7 @@ def repository(
     include_tests: bool = False,
     github_token: Optional[str] = None,
     include_readme: bool = False,
+    incremental: bool = False,
 ):
     """Process a repository with the complete workflow.
     
@@ -91,6 +97,7 @@ def repository(
       python -m mfai_db_repos.cli.main process repository --repo-id 1 --limit 20
       python -m mfai_db_repos.cli.main process repository --repo-url https://github.com/example/repo.git --include-tests
       python -m mfai_db_repos.cli.main process repository --repo-url https://github.com/example/private-repo.git --github-token YOUR_TOKEN
+      python -m mfai_db_repos.cli.main process repository --repo-id 1 --incremental
     
     This command will:
     1. Clone/update the repository if needed
@@ -108,6 +115,10 @@ def repository(
     By default, test files and directories are excluded. Use the --include-tests flag
     to process test files and directories as well.
     
+    With --incremental, the repository is pulled and only files added or modified
+    since the last indexed commit are processed. Deleted files are removed and
+    renamed files are moved without re-analysis.
+    
     For private GitHub repositories, you can provide a GitHub personal access token:
     - Use the --github-token option OR
     - Set the GITHUB_TOKEN environment variable in your .env file
@@ -144,6 +155,7 @@ def repository(
             limit=limit,
             include_tests=include_tests,
             include_readme=include_readme,
+            incremental=incremental,
         ))
         
         # Print summary
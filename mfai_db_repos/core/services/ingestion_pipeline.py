@@ -0,0 +1,253 @@
+"""
+Staged ingestion pipeline for repository processing.
+
+This module provides a producer/consumer pipeline in which each stage runs its
+own pool of workers connected by bounded asyncio queues, so a slow item only
+occupies one worker of one stage instead of stalling a whole batch. The final
+stage is a sink that receives items in groups, flushed by size or by time.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Marker placed on a queue to tell a worker that no more items will arrive
+_DONE = object()
+
+# Marker a stage handler returns to leave an item out of the run without failing it
+SKIPPED = object()
+
+
+@dataclass
+class PipelineStage:
+    """A pipeline stage processing one item at a time."""
+
+    name: str
+    handler: Callable[[str, Any], Awaitable[Optional[Any]]]  # Returns None to drop the item, SKIPPED to skip it
+    concurrency: int = 1
+
+
+@dataclass
+class StageStats:
+    """Counters for a single pipeline stage."""
+
+    processed: int = 0  # Items passed on to the next stage
+    dropped: int = 0  # Items that failed or were dropped
+    skipped: int = 0  # Items left out without an error
+    busy_seconds: float = 0.0  # Total time spent inside the handler
+
+
+@dataclass
+class PipelineResult:
+    """Results from a pipeline run."""
+
+    succeeded: List[str] = field(default_factory=list)  # Keys written by the sink
+    failed: List[str] = field(default_factory=list)  # Keys dropped by any stage
+    skipped: List[str] = field(default_factory=list)  # Keys skipped by any stage
+    stage_stats: Dict[str, StageStats] = field(default_factory=dict)
+
+    @property
+    def success_count(self) -> int:
+        """Get the number of successfully processed items."""
+        return len(self.succeeded)
+
+    @property
+    def failure_count(self) -> int:
+        """Get the number of failed items."""
+        return len(self.failed)
+
+    @property
+    def skip_count(self) -> int:
+        """Get the number of skipped items."""
+        return len(self.skipped)
+
+
+class StagedPipeline:
+    """Pipeline of concurrent stages connected by bounded queues."""
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        sink: Callable[[List[Tuple[str, Any]]], Awaitable[None]],
+        sink_batch_size: int = 20,
+        sink_flush_interval: float = 2.0,
+        queue_size: Optional[int] = None,
+    ):
+        """Initialize a staged pipeline.
+
+        Args:
+            stages: Stages in processing order
+            sink: Coroutine receiving groups of (key, item); raising fails the whole group
+            sink_batch_size: Maximum number of items passed to the sink at once
+            sink_flush_interval: Maximum seconds an item waits before the sink is called
+            queue_size: Capacity of each queue (defaults to twice the consumer concurrency)
+        """
+        if not stages:
+            raise ValueError("At least one pipeline stage is required")
+
+        self.stages = stages
+        self.sink = sink
+        self.sink_batch_size = max(1, sink_batch_size)
+        self.sink_flush_interval = sink_flush_interval
+        self.queue_size = queue_size
+
+    def _make_queue(self, consumers: int) -> asyncio.Queue:
+        """Create a bounded queue for a stage with the given number of workers.
+
+        Args:
+            consumers: Number of workers reading from the queue
+
+        Returns:
+            Bounded asyncio queue
+        """
+        return asyncio.Queue(maxsize=self.queue_size or max(2, 2 * consumers))
+
+    async def run(self, items: Iterable[Tuple[str, Any]]) -> PipelineResult:
+        """Run all items through the pipeline.
+
+        Args:
+            items: Iterable of (key, item) pairs; the key identifies the item in results
+
+        Returns:
+            PipelineResult with succeeded, failed and skipped keys
+        """
+        result = PipelineResult(
+            stage_stats={stage.name: StageStats() for stage in self.stages}
+        )
+        queues = [self._make_queue(stage.concurrency) for stage in self.stages]
+        queues.append(self._make_queue(self.sink_batch_size))
+
+        tasks = [asyncio.create_task(self._feed(items, queues[0], self.stages[0].concurrency))]
+        for index, stage in enumerate(self.stages):
+            next_consumers = self.stages[index + 1].concurrency if index + 1 < len(self.stages) else 1
+            tasks.append(asyncio.create_task(
+                self._run_stage(stage, queues[index], queues[index + 1], next_consumers, result)
+            ))
+        tasks.append(asyncio.create_task(self._run_sink(queues[-1], result)))
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        for name, stats in result.stage_stats.items():
+            logger.debug(
+                f"Stage {name}: {stats.processed} processed, {stats.dropped} dropped, "
+                f"{stats.skipped} skipped, "
+                f"{stats.busy_seconds:.1f}s busy"
+            )
+
+        return result
+
+    async def _feed(self, items: Iterable[Tuple[str, Any]], queue: asyncio.Queue, consumers: int) -> None:
+        """Put all input items on the first queue, followed by end markers.
+
+        Args:
+            items: Input (key, item) pairs
+            queue: Queue of the first stage
+            consumers: Number of workers in the first stage
+        """
+        for key, item in items:
+            await queue.put((key, item))
+        for _ in range(consumers):
+            await queue.put(_DONE)
+
+    async def _run_stage(
+        self,
+        stage: PipelineStage,
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue,
+        next_consumers: int,
+        result: PipelineResult,
+    ) -> None:
+        """Run the workers of a stage and signal the next stage when they finish.
+
+        Args:
+            stage: Stage definition
+            inbox: Queue to read items from
+            outbox: Queue to pass processed items to
+            next_consumers: Number of workers reading from the outbox
+            result: Shared pipeline result
+        """
+        stats = result.stage_stats[stage.name]
+
+        async def worker() -> None:
+            while True:
+                entry = await inbox.get()
+                if entry is _DONE:
+                    return
+
+                key, item = entry
+                start = time.perf_counter()
+                try:
+                    output = await stage.handler(key, item)
+                except Exception as e:
+                    logger.error(f"Stage {stage.name} failed for {key}: {str(e)}")
+                    output = None
+                stats.busy_seconds += time.perf_counter() - start
+
+                if output is SKIPPED:
+                    stats.skipped += 1
+                    result.skipped.append(key)
+                    continue
+
+                if output is None:
+                    stats.dropped += 1
+                    result.failed.append(key)
+                    continue
+
+                stats.processed += 1
+                await outbox.put((key, output))
+
+        await asyncio.gather(*(worker() for _ in range(max(1, stage.concurrency))))
+
+        for _ in range(next_consumers):
+            await outbox.put(_DONE)
+
+    async def _run_sink(self, inbox: asyncio.Queue, result: PipelineResult) -> None:
+        """Collect items into groups and pass them to the sink.
+
+        A group is flushed when it reaches the batch size or when its oldest
+        item has waited for the flush interval.
+
+        Args:
+            inbox: Queue of processed items
+            result: Shared pipeline result
+        """
+        loop = asyncio.get_running_loop()
+        finished = False
+
+        while not finished:
+            entry = await inbox.get()
+            if entry is _DONE:
+                return
+
+            group = [entry]
+            deadline = loop.time() + self.sink_flush_interval
+
+            while len(group) < self.sink_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(inbox.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _DONE:
+                    finished = True
+                    break
+                group.append(entry)
+
+            keys = [key for key, _ in group]
+            try:
+                await self.sink(group)
+                result.succeeded.extend(keys)
+            except Exception as e:
+                logger.error(f"Pipeline sink failed for {len(group)} items: {str(e)}")
+                result.failed.extend(keys)
@@ -6,21 +6,39 @@ with a complete workflow including file extraction, content analysis,
 embedding generation, and database storage.
 """
 import asyncio
+import hashlib
 import os
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
 
+from mfai_db_repos.core.services.ingestion_pipeline import SKIPPED, PipelineStage, StagedPipeline
 from mfai_db_repos.lib.database.connection import session_context
 from mfai_db_repos.lib.database.repository import RepositoryRepository
 from mfai_db_repos.lib.database.repository_file import RepositoryFileRepository
 from mfai_db_repos.lib.database.models import RepositoryFile
+from mfai_db_repos.lib.embeddings.cache import AnalysisCache
+from mfai_db_repos.lib.embeddings.local_analysis import (
+    LOCAL_ANALYSIS_MODEL,
+    LOCAL_ANALYSIS_VERSION,
+    LocalAnalyzerRegistry,
+    get_local_analyzer_registry,
+)
 from mfai_db_repos.lib.embeddings.manager import EmbeddingManager, ProviderType
-from mfai_db_repos.lib.embeddings.google_genai import GoogleGenAIEmbeddingConfig
+from mfai_db_repos.lib.embeddings.google_genai import (
+    ANALYSIS_PROMPT_VERSION,
+    AnalysisContentMode,
+    GoogleGenAIEmbeddingConfig,
+)
 from mfai_db_repos.lib.embeddings.openai import OpenAIEmbeddingConfig
-from mfai_db_repos.lib.git.repository import GitRepository, RepoStatus
+from mfai_db_repos.lib.embeddings.routing import AnalysisRoute, AnalysisRoutingPolicy
+from mfai_db_repos.lib.git.repository import FileChanges, GitRepository, RepoStatus
 from mfai_db_repos.lib.file_processor.extractor import FileExtractor
-from mfai_db_repos.utils.env import get_env, get_int_env, get_float_env
+from mfai_db_repos.lib.file_processor.sampler import DataSampler, get_data_sampler
+from mfai_db_repos.lib.file_processor.scanner import FileCandidate, RepositoryScanner
+from mfai_db_repos.utils.blocking import BlockingCategory, LoopLagMonitor, run_blocking
+from mfai_db_repos.utils.config import config
+from mfai_db_repos.utils.env import get_bool_env, get_env, get_int_env, get_float_env
 from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -80,16 +98,45 @@ class RepositoryProcessingService:
         self,
         batch_size: Optional[int] = None,
         parallel_workers: Optional[int] = None,
+        read_workers: Optional[int] = None,
+        analysis_workers: Optional[int] = None,
+        embedding_workers: Optional[int] = None,
+        db_commit_size: Optional[int] = None,
+        local_analyzers: Optional[LocalAnalyzerRegistry] = None,
+        data_sampler: Optional[DataSampler] = None,
     ):
         """Initialize the repository processing service.
         
         Args:
             batch_size: Number of files to process in each batch (defaults to env BATCH_SIZE)
             parallel_workers: Number of parallel workers for API calls (defaults to env PARALLEL_WORKERS)
+            read_workers: Concurrent file reads (defaults to env READ_WORKERS)
+            analysis_workers: Concurrent analysis requests (defaults to env ANALYSIS_WORKERS)
+            embedding_workers: Concurrent embedding requests (defaults to env EMBEDDING_WORKERS)
+            db_commit_size: Maximum files per database commit (defaults to env DB_COMMIT_SIZE)
+            local_analyzers: Rule-based analyzers for structured and stub files (defaults to
+                the built-in analyzers, or none if env LOCAL_ANALYSIS is false)
+            data_sampler: Sampler replacing large data files with excerpts and statistics
+                for analysis (defaults to env DATA_SAMPLE_MIN_CHARS)
         """
         self.batch_size = batch_size or get_int_env("BATCH_SIZE", 5)
         self.parallel_workers = parallel_workers or get_int_env("PARALLEL_WORKERS", 5)
         
+        # Per-stage concurrency of the streaming pipeline
+        self.read_workers = read_workers or get_int_env("READ_WORKERS", 4)
+        self.analysis_workers = analysis_workers or get_int_env("ANALYSIS_WORKERS", 3 * self.parallel_workers)
+        # Embedding workers mostly wait on coalesced requests, so allow enough to fill a batch
+        self.embedding_workers = embedding_workers or get_int_env(
+            "EMBEDDING_WORKERS", max(self.parallel_workers, get_int_env("EMBEDDING_BATCH_SIZE", 64))
+        )
+        self.db_commit_size = db_commit_size or get_int_env("DB_COMMIT_SIZE", 20)
+        
+        # Files that parse into an analysis skip the model requests
+        self.local_analyzers = local_analyzers
+        if self.local_analyzers is None and get_bool_env("LOCAL_ANALYSIS", True):
+            self.local_analyzers = get_local_analyzer_registry()
+        self.data_sampler = data_sampler or get_data_sampler()
+        
     async def create_embedding_manager(self) -> EmbeddingManager:
         """
         Create and configure the embedding manager with both
@@ -119,9 +166,25 @@ class RepositoryProcessingService:
         # Create Google GenAI config
         google_config = GoogleGenAIEmbeddingConfig(
             api_key=google_api_key,
-            model="gemini-2.0-flash",  # Default model - better for structured output with LaTeX
+            model=config.config.embedding.gemini_model,  # Standard analysis model
             batch_size=1,  # Process one file at a time for analysis
-            max_parallel_requests=self.parallel_workers
+            max_parallel_requests=self.parallel_workers,
+            analysis_content_mode=get_env("ANALYSIS_CONTENT_MODE", AnalysisContentMode.RAW),
+        )
+        
+        # Persistent cache of analyses and embeddings, skipped for unchanged content
+        cache = None
+        cache_path = get_env("API_CACHE_PATH")
+        if cache_path:
+            try:
+                cache = AnalysisCache(cache_path)
+            except Exception as e:
+                logger.warning(f"Analysis cache unavailable at {cache_path}: {str(e)}")
+        
+        # Analysis models from the configuration, routed per file by size, category and repository
+        routing_policy = AnalysisRoutingPolicy.from_env(
+            standard_model=config.config.embedding.gemini_model,
+            light_model=config.config.embedding.gemini_light_model,
         )
         
         # Create manager with both providers
@@ -132,7 +195,13 @@ class RepositoryProcessingService:
             secondary_config=google_config,
             max_parallel_requests=self.parallel_workers,
             batch_size=self.batch_size,
-            rate_limit_per_minute=100
+            rate_limit_per_minute=get_int_env("RATE_LIMIT_PER_MINUTE", 100),
+            tokens_per_minute=get_int_env("TOKENS_PER_MINUTE", 0) or None,
+            micro_batch_size=get_int_env("EMBEDDING_BATCH_SIZE", 64),
+            micro_batch_tokens=get_int_env("EMBEDDING_BATCH_TOKENS", 200_000),
+            micro_batch_wait=get_float_env("EMBEDDING_BATCH_WAIT", 0.5),
+            cache=cache,
+            routing_policy=routing_policy,
         )
         
         return manager
@@ -195,7 +264,8 @@ class RepositoryProcessingService:
         git_repo = GitRepository(repo_url, None, branch)
         
         # Clone repository if not already cloned
-        if not git_repo.is_cloned() and not git_repo.clone():
+        # Cloning and pulling run git for a long time, keep them off the event loop
+        if not git_repo.is_cloned() and not await run_blocking(BlockingCategory.GIT, git_repo.clone):
             logger.error(f"Failed to clone repository {repo_url}")
             async with session_context() as session:
                 repo_repo = RepositoryRepository(session)
@@ -215,7 +285,7 @@ class RepositoryProcessingService:
                 await repo_repo.update(db_repo)
         
         # Update repository
-        success, changed_files = git_repo.update()
+        success, changed_files = await run_blocking(BlockingCategory.GIT, git_repo.update)
         if not success:
             logger.error(f"Failed to update repository {repo_url}")
             async with session_context() as session:
@@ -244,7 +314,20 @@ class RepositoryProcessingService:
             logger.error("Repository is not cloned")
             return None
         
+        # Probing candidates and reading the README is blocking file I/O
         repo_path = Path(git_repo.repo.working_dir)
+        return await run_blocking(BlockingCategory.DISK, self._find_readme_content, repo_path)
+    
+    def _find_readme_content(self, repo_path: Path) -> Optional[str]:
+        """
+        Find and read the README file of a checked out repository.
+        
+        Args:
+            repo_path: Path to the repository working tree
+            
+        Returns:
+            README content as string or None if not found
+        """
         # Common README filenames to check
         readme_filenames = [
             "README.md", "readme.md", "Readme.md", 
@@ -261,7 +344,6 @@ class RepositoryProcessingService:
                     # Try to read the content directly first (handles symlinks better)
                     try:
                         # Use os.path.realpath for better symlink resolution
-                        import os
                         if readme_path.is_symlink():
                             resolved_str = os.path.realpath(str(readme_path)).strip()
                         else:
@@ -295,72 +377,89 @@ class RepositoryProcessingService:
         
         return None
     
-    async def extract_repository_files(
-        self, 
-        repo_id: int, 
-        git_repo: GitRepository, 
+    async def scan_repository_files(
+        self,
+        git_repo: GitRepository,
         limit: Optional[int] = None,
-        include_tests: bool = False
-    ) -> List[str]:
+        include_tests: bool = False,
+        paths: Optional[List[str]] = None,
+    ) -> List[FileCandidate]:
         """
-        Extract files from the repository and return their relative paths.
+        Scan the repository in a single pass and return candidate file records.
         
         Args:
-            repo_id: Repository ID
             git_repo: GitRepository instance
-            limit: Optional limit on number of files to extract
+            limit: Optional limit on number of files to return
             include_tests: Whether to include test files and directories
+            paths: Optional relative paths to check instead of walking the whole tree
             
         Returns:
-            List of file paths relative to repository root
+            List of FileCandidate records (path, size, mtime) for processable files
         """
         if not git_repo.is_cloned() or not git_repo.repo:
             logger.error("Repository is not cloned")
             return []
         
-        # Initialize file extractor with configuration
-        extractor = FileExtractor(
+        # Set up exclude patterns based on include_tests flag
+        exclude_patterns = None  # Use default exclude patterns
+        if include_tests:
+            # If including tests, create a custom exclude patterns list without test exclusions
+            exclude_patterns = [
+                # Common version control directories
+                "**/.git/**", 
+                # Virtual environments
+                "**/venv/**", "**/.venv/**", 
+                # Python cache files
+                "**/__pycache__/**", "**/.pytest_cache/**",
+            ]
+        
+        scanner = RepositoryScanner(
+            exclude_patterns=exclude_patterns,
+            include_tests=include_tests,
             max_file_size_mb=get_float_env("MAX_FILE_SIZE_MB", 10),
         )
         
-        # Get all files recursively
         repo_path = Path(git_repo.repo.working_dir)
-        all_files = []
-        
-        for root, _, files in os.walk(repo_path):
-            # Skip .git directory
-            if ".git" in Path(root).parts:
+        if paths is None:
+            found = await run_blocking(BlockingCategory.DISK, scanner.scan, repo_path)
+        else:
+            found = await run_blocking(BlockingCategory.DISK, scanner.scan_paths, repo_path, paths)
+        candidates = []
+        for candidate in found:
+            if candidate.is_binary:
+                logger.debug(f"Skipping binary file {candidate.path}")
                 continue
+            candidates.append(candidate)
             
-            # Process files
-            for filename in files:
-                filepath = Path(root) / filename
-                rel_path = str(filepath.relative_to(repo_path))
-                
-                # Set up exclude patterns based on include_tests flag
-                exclude_patterns = None  # Use default exclude patterns
-                if include_tests:
-                    # If including tests, create a custom exclude patterns list without test exclusions
-                    exclude_patterns = [
-                        # Common version control directories
-                        "**/.git/**", 
-                        # Virtual environments
-                        "**/venv/**", "**/.venv/**", 
-                        # Python cache files
-                        "**/__pycache__/**", "**/.pytest_cache/**",
-                    ]
-                
-                # Check if the file should be processed
-                if extractor.should_process_file(
-                    filepath,
-                    None,  # Use default include patterns 
-                    exclude_patterns  # Use custom exclude patterns if include_tests=True
-                ):
-                    all_files.append(rel_path)
-        
-        # Apply limit if specified
-        if limit is not None and limit > 0:
-            all_files = all_files[:limit]
+            # Apply limit if specified
+            if limit is not None and limit > 0 and len(candidates) >= limit:
+                break
+        
+        return candidates
+    
+    async def extract_repository_files(
+        self, 
+        repo_id: int, 
+        git_repo: GitRepository, 
+        limit: Optional[int] = None,
+        include_tests: bool = False,
+        paths: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Extract files from the repository and return their relative paths.
+        
+        Args:
+            repo_id: Repository ID
+            git_repo: GitRepository instance
+            limit: Optional limit on number of files to extract
+            include_tests: Whether to include test files and directories
+            paths: Optional relative paths to check instead of walking the whole tree
+            
+        Returns:
+            List of file paths relative to repository root
+        """
+        candidates = await self.scan_repository_files(git_repo, limit, include_tests, paths)
+        all_files = [candidate.path for candidate in candidates]
         
         logger.info(f"Found {len(all_files)} files to process in repository")
         return all_files
@@ -389,46 +488,310 @@ class RepositoryProcessingService:
         if not git_repo.is_cloned() or not git_repo.repo:
             return None
         
-        # Get full file path
-        repo_path = Path(git_repo.repo.working_dir)
-        full_path = repo_path / file_path
+        try:
+            # Get repository information for file record and embedding text
+            async with session_context() as session:
+                repo_repo = RepositoryRepository(session)
+                repository = await repo_repo.get_by_id(repo_id)
+                
+                if not repository:
+                    logger.error(f"Repository with ID {repo_id} not found")
+                    return None
+            
+            # 1. Read the file once for its content, metadata and git hashes
+            file_data = await self._read_file_stage(file_path, git_repo)
+            if file_data is None or file_data is SKIPPED:
+                return None
+            
+            # 2. Analyze the file, locally, from an identical analyzed blob or with Gemini
+            analyzed_blobs = await self._load_analyzed_blobs(
+                [file_data["blob_sha"]], embedding_manager.routing_policy.routes
+            )
+            file_data = await self._analysis_stage(
+                file_data, embedding_manager, readme_content, analyzed_blobs, repository.name
+            )
+            
+            # 3. Embed the analysis text
+            file_data = await self._embedding_stage(file_data, embedding_manager, repository.name)
+            
+            # Create a dictionary with all fields except content_tsvector
+            metadata = file_data["metadata"]
+            repo_file_data = {
+                # Repository info
+                "repo_id": repo_id,
+                "repo_url": repository.url,
+                "repo_name": repository.name,
+                "repo_branch": repository.default_branch,
+                "repo_commit_hash": file_data["commit_hash"],
+                "repo_metadata": {"git_status": "added", "file_type": metadata["file_type"]},
+                
+                # File info
+                "filepath": file_path,
+                "filename": file_data["filename"],
+                "extension": file_data["extension"],
+                "file_size": metadata["file_size"],
+                "last_modified": metadata["last_modified"],
+                "git_status": "added",
+                "blob_sha": file_data["blob_sha"],
+                
+                # Content and analysis (excluding content_tsvector)
+                "content": file_data["content"],
+                "analysis": file_data["analysis"],
+                "tags": file_data["tags"],
+                "file_type": file_data["file_type"],
+                "technical_level": file_data["technical_level"],
+                "analysis_model": file_data.get("analysis_model"),
+                "analysis_prompt_version": (
+                    file_data.get("analysis_prompt_version", ANALYSIS_PROMPT_VERSION)
+                    if file_data.get("analysis_model") else None
+                ),
+                
+                # Embedding
+                "embedding_string": file_data["embedding_string"],
+                "embedding": file_data["embedding"],
+                
+                # Timestamps
+                "indexed_at": datetime.utcnow(),
+            }
+            
+            # Create file object (Don't save to DB yet - that happens in process_file_batch)
+            return RepositoryFile(**repo_file_data)
+                
+        except Exception as e:
+            logger.error(f"Error processing file {file_path}: {str(e)}")
+            return None
+    
+    async def _read_file_stage(self, file_path: str, git_repo: GitRepository) -> Any:
+        """
+        Read a file and collect its metadata (pipeline stage 1).
+        
+        Args:
+            file_path: Path to the file relative to the repository root
+            git_repo: GitRepository instance
+            
+        Returns:
+            File data dictionary, SKIPPED if the file has no text to index, or None
+            if it cannot be read
+        """
+        if not git_repo.is_cloned() or not git_repo.repo:
+            logger.error(f"Repository is not properly cloned")
+            return None
+        
+        full_path = Path(git_repo.repo.working_dir) / file_path
         
-        # Initialize file extractor
         extractor = FileExtractor(
             max_file_size_mb=get_float_env("MAX_FILE_SIZE_MB", 10),
         )
+        # One read yields the content, metadata and content hash. File I/O, libmagic
+        # and encoding detection are blocking, so they run on the disk pool.
+        record = await run_blocking(BlockingCategory.DISK, extractor.read_file, full_path)
         
-        try:
-            # 1. Extract file metadata
-            metadata = extractor.get_file_metadata(full_path)
-            
-            # 2. Extract file content
-            content = extractor.extract_content(full_path)
-            
-            # Skip empty files
-            if content is None or content.strip() == "":
-                logger.debug(f"Skipping empty file: {file_path}")
-                return None
+        if record is None:
+            return None
+        
+        # Binary, empty and whitespace-only files are left out without failing
+        if record.is_binary or not record.text or record.text.strip() == "":
+            logger.debug(f"Skipping binary or empty file: {file_path}")
+            return SKIPPED
+        
+        def git_info() -> Tuple[Optional[str], Optional[str]]:
+            return git_repo.get_file_commit_hash(file_path), git_repo.get_file_blob_sha(file_path)
+        
+        commit_hash, blob_sha = await run_blocking(BlockingCategory.GIT, git_info)
+        
+        # Large data files are analyzed from excerpts and statistics
+        analysis_content = await self._sample_data_content(file_path, record.text)
+        
+        return {
+            "filepath": file_path,
+            "filename": Path(file_path).name,
+            "extension": Path(file_path).suffix.lower(),
+            "content": record.text,
+            "analysis_content": analysis_content,
+            "content_hash": record.content_hash,
+            "commit_hash": commit_hash,
+            "blob_sha": blob_sha,
+            "metadata": record.metadata,
+        }
+    
+    async def _load_analyzed_blobs(
+        self, blob_shas: List[Optional[str]], routes: List[AnalysisRoute]
+    ) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+        """
+        Load existing analyses of the given file contents from any repository.
+        
+        Args:
+            blob_shas: Git blob SHAs of the files about to be processed
+            routes: Analysis routes whose analyses are reusable (each file only
+                reuses an analysis of the route it is given)
             
-            # 3. Get git metadata including commit hash
-            commit_hash = git_repo.get_file_commit_hash(file_path)
+        Returns:
+            Dictionary mapping (blob SHA, model, prompt version) to reusable analysis
+            fields (empty on failure)
+        """
+        shas = [sha for sha in blob_shas if sha]
+        if not shas:
+            return {}
+        
+        analyzed: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        try:
+            async with session_context() as session:
+                file_repo = RepositoryFileRepository(session)
+                for route in routes:
+                    found = await file_repo.get_analyzed_by_blob_shas(shas, route.model, route.prompt_version)
+                    for sha, reused in found.items():
+                        analyzed[(sha, route.model, route.prompt_version)] = reused
+        except Exception as e:
+            logger.warning(f"Failed to look up previously analyzed files: {str(e)}")
+            return {}
+        
+        if analyzed:
+            distinct = len({sha for sha, _, _ in analyzed})
+            logger.info(f"Found existing analyses for {distinct} of {len(set(shas))} distinct file contents")
+        return analyzed
+    
+    async def _sample_data_content(self, file_path: str, content: str) -> Optional[str]:
+        """
+        Sample a large data-dominated file into excerpts and statistics for analysis.
+        
+        Args:
+            file_path: Path to the file relative to the repository root
+            content: File content
             
-            # 4. Generate tsvector for PostgreSQL full-text search
-            content_tsvector = generate_tsvector(content)
+        Returns:
+            Sampled content to analyze instead of the file content, or None to analyze it as is
+        """
+        if len(content) < self.data_sampler.min_chars or self.data_sampler.min_chars <= 0:
+            return None
+        return await run_blocking(BlockingCategory.DISK, self.data_sampler.sample, content, file_path)
+    
+    def _local_analysis(self, file_path: str, content: str) -> Optional[Dict[str, Any]]:
+        """
+        Analyze a structured or stub file by parsing it, without a model request.
+        
+        Args:
+            file_path: Path to the file relative to the repository root
+            content: File content
             
-            # 5. Generate structured analysis using Google Gemini
-            analysis = await embedding_manager.analyze_file_content(content, readme_content)
+        Returns:
+            Analysis dictionary or None if the file needs model analysis
+        """
+        if self.local_analyzers is None:
+            return None
+        return self.local_analyzers.analyze(file_path, content)
+    
+    async def _analysis_stage(
+        self,
+        file_data: Dict[str, Any],
+        embedding_manager: EmbeddingManager,
+        readme_content: Optional[str] = None,
+        analyzed_blobs: Optional[Dict[Tuple[str, str, str], Dict[str, Any]]] = None,
+        repo_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate the structured analysis of a file with retries (pipeline stage 2).
+        
+        Args:
+            file_data: File data from the read stage
+            embedding_manager: EmbeddingManager instance
+            readme_content: Optional README content to include in analysis
+            analyzed_blobs: Optional existing analyses by (blob SHA, model, prompt version),
+                reused instead of the API when they match the route of the file
+            repo_name: Optional repository name, for per-repository analysis routing
             
-            # 6. Extract metadata fields
-            file_type = analysis.get('document_type', 'Unknown')
-            technical_level = analysis.get('technical_level', 'Unknown')
-            tags = extract_tags_from_analysis(analysis)
+        Returns:
+            File data with analysis fields added
+        """
+        file_path = file_data["filepath"]
+        
+        # Structured and stub files are described by parsing them
+        analysis = self._local_analysis(file_path, file_data["content"])
+        if analysis is not None:
+            file_data["analysis"] = analysis
+            file_data["file_type"] = analysis["document_type"]
+            file_data["technical_level"] = analysis["technical_level"]
+            file_data["tags"] = extract_tags_from_analysis(analysis)
+            file_data["analysis_model"] = LOCAL_ANALYSIS_MODEL
+            file_data["analysis_prompt_version"] = LOCAL_ANALYSIS_VERSION
+            return file_data
+        
+        # Pick the model and prompt by size, category and repository
+        analysis_content = file_data.get("analysis_content") or file_data["content"]
+        route = embedding_manager.route_analysis(file_path, len(analysis_content), repo_name)
+        analysis_model = route.model
+        
+        # Identical content was already analyzed with the same model and prompt
+        reused = (analyzed_blobs or {}).get((file_data.get("blob_sha"), route.model, route.prompt_version))
+        if reused is not None:
+            file_data["analysis"] = reused["analysis"]
+            file_data["file_type"] = reused["file_type"]
+            file_data["technical_level"] = reused["technical_level"]
+            file_data["tags"] = reused["tags"]
+            file_data["analysis_model"] = reused["analysis_model"]
+            file_data["analysis_prompt_version"] = reused["analysis_prompt_version"]
+            file_data["reused_from"] = reused
+            return file_data
+        
+        # Generate structured analysis using Google Gemini with retry logic
+        max_retries = 10
+        retry_delay = 2  # Initial delay in seconds
+        
+        for retry_attempt in range(max_retries):
+            try:
+                analysis = await embedding_manager.analyze_file_content(analysis_content, readme_content, route)
+                
+                # Check if required fields exist
+                if not analysis.get('document_type') or not analysis.get('technical_level'):
+                    raise ValueError("Missing required fields in analysis response")
+                    
+                # Successfully got analysis, exit retry loop
+                break
+                
+            except Exception as e:
+                if retry_attempt < max_retries - 1:
+                    # Calculate exponential backoff delay
+                    backoff_delay = retry_delay * (2 ** retry_attempt)
+                    logger.info(f"Retry {retry_attempt+1}/{max_retries} for {file_path}: {str(e)} - waiting {backoff_delay}s")
+                    await asyncio.sleep(backoff_delay)
+                else:
+                    # Last attempt failed, create a basic analysis structure
+                    logger.warning(f"All {max_retries} analysis attempts failed for {file_path}")
+                    analysis_model = None  # Never reuse the placeholder for other copies
+                    analysis = {
+                        "title": f"File: {Path(file_path).name}",
+                        "summary": f"Content from {file_path}",
+                        "document_type": "Unknown",
+                        "technical_level": "Unknown",
+                        "key_concepts": [],
+                        "potential_questions": [],
+                        "keywords": [Path(file_path).stem, Path(file_path).suffix.replace('.', '')],
+                        "related_topics": []
+                    }
+        
+        file_data["analysis"] = analysis
+        file_data["file_type"] = analysis.get('document_type', 'Unknown')
+        file_data["technical_level"] = analysis.get('technical_level', 'Unknown')
+        file_data["tags"] = extract_tags_from_analysis(analysis)
+        file_data["analysis_model"] = analysis_model
+        file_data["analysis_prompt_version"] = route.prompt_version
+        return file_data
+    
+    def _build_embedding_text(self, file_path: str, repo_name: str, analysis: Dict[str, Any]) -> str:
+        """
+        Build the text that is embedded for a file from its analysis.
+        
+        Args:
+            file_path: Path to the file relative to the repository root
+            repo_name: Repository name
+            analysis: Structured analysis of the file
             
-            # 7. Create embedding string from analysis
-            embedding_text = f"""
+        Returns:
+            Embedding text
+        """
+        embedding_text = f"""
             Filename: {Path(file_path).name}
             Filepath: {file_path}
-            Repository: {Path(git_repo.repo.working_dir).name}
+            Repository: {repo_name}
             
             Title: {analysis.get('title', 'No title')}
             
@@ -440,100 +803,136 @@ class RepositoryProcessingService:
             
             Keywords: {', '.join(analysis.get('keywords', []))}
             
-            Document Type: {file_type}
+            Document Type: {analysis.get('document_type', 'Unknown')}
             
-            Technical Level: {technical_level}
+            Technical Level: {analysis.get('technical_level', 'Unknown')}
             
             Related Topics: {', '.join(analysis.get('related_topics', []))}
             
             Prerequisites: {', '.join(analysis.get('prerequisites', []))}
             """
+        
+        # Add code snippets if available
+        if analysis.get('code_snippets') and len(analysis.get('code_snippets', [])) > 0:
+            snippet_texts = []
+            for j, snippet in enumerate(analysis.get('code_snippets', [])):
+                snippet_text = f"Snippet {j+1} ({snippet.get('language', 'unknown')}): {snippet.get('purpose', '')}\n{snippet.get('summary', '')}"
+                snippet_texts.append(snippet_text)
             
-            # Add code snippets if available
-            if analysis.get('code_snippets') and len(analysis.get('code_snippets', [])) > 0:
-                snippet_texts = []
-                for i, snippet in enumerate(analysis.get('code_snippets', [])):
-                    snippet_text = f"Snippet {i+1} ({snippet.get('language', 'unknown')}): {snippet.get('purpose', '')}\n{snippet.get('summary', '')}"
-                    snippet_texts.append(snippet_text)
-                
-                joined_snippets = "\n".join(snippet_texts)
-                embedding_text += f"""
+            joined_snippets = "\n".join(snippet_texts)
+            embedding_text += f"""
             Code Snippets:
             {joined_snippets}
-            """
-                
-                if analysis.get('code_snippets_overview'):
-                    embedding_text += f"""
-            Code Snippets Overview: {analysis.get('code_snippets_overview')}
             """
             
-            # Add component properties if available
-            if analysis.get('component_properties'):
-                cp = analysis.get('component_properties', {})
+            if analysis.get('code_snippets_overview'):
                 embedding_text += f"""
+            Code Snippets Overview: {analysis.get('code_snippets_overview')}
+            """
+        
+        # Add component properties if available
+        if analysis.get('component_properties'):
+            cp = analysis.get('component_properties', {})
+            embedding_text += f"""
             Component Type: {cp.get('component_type', 'Unknown')}
             API Elements: {', '.join(cp.get('api_elements', []))}
             Required Parameters: {', '.join(cp.get('required_parameters', []))}
             Optional Parameters: {', '.join(cp.get('optional_parameters', []))}
             Related Components: {', '.join(cp.get('related_components', []))}
             """
+        
+        return embedding_text
+    
+    async def _embedding_stage(
+        self,
+        file_data: Dict[str, Any],
+        embedding_manager: EmbeddingManager,
+        repo_name: str
+    ) -> Dict[str, Any]:
+        """
+        Embed the analysis text of a file (pipeline stage 3).
+        
+        Args:
+            file_data: File data from the analysis stage
+            embedding_manager: EmbeddingManager instance
+            repo_name: Repository name
             
-            # 8. Generate embedding from the analysis text
-            embedding_vector = await embedding_manager.embed_text(embedding_text)
+        Returns:
+            File data with embedding fields added
+        """
+        embedding_text = self._build_embedding_text(file_data["filepath"], repo_name, file_data["analysis"])
+        
+        # Reuse the stored vector when a copy with a reused analysis embedded the same text
+        embedding_list = None
+        reused = file_data.get("reused_from")
+        if reused is not None and reused.get("embedding_digest") == hashlib.md5(embedding_text.encode("utf-8")).hexdigest():
+            async with session_context() as session:
+                embedding_list = await RepositoryFileRepository(session).get_embedding(reused["id"])
+        
+        if embedding_list is None:
+            # Generate embedding from the analysis text, batched with other files in flight
+            embedding_vector = await embedding_manager.embed_text_batched(embedding_text)
             
             # Convert embedding to list if it's a numpy array
             embedding_list = embedding_vector.vector.tolist() if hasattr(embedding_vector.vector, 'tolist') else list(embedding_vector.vector)
+        
+        file_data["embedding_string"] = embedding_text
+        file_data["embedding"] = embedding_list
+        return file_data
+    
+    async def _save_processed_files(self, repo_id: int, processed_files: List[Dict[str, Any]]) -> None:
+        """
+        Save processed files in a single transaction (pipeline sink).
+        
+        Args:
+            repo_id: Repository ID
+            processed_files: File data from the embedding stage
             
-            # Get repository information for file record
-            async with session_context() as session:
-                repo_repo = RepositoryRepository(session)
-                repository = await repo_repo.get_by_id(repo_id)
-                
-                if not repository:
-                    logger.error(f"Repository with ID {repo_id} not found")
-                    return None
-                
-                # Create a dictionary with all fields except content_tsvector
-                repo_file_data = {
-                    # Repository info
-                    "repo_id": repo_id,
-                    "repo_url": repository.url,
-                    "repo_name": repository.name,
-                    "repo_branch": repository.default_branch,
-                    "repo_commit_hash": commit_hash,
-                    "repo_metadata": {"git_status": "added", "file_type": metadata["file_type"]},
-                    
-                    # File info
-                    "filepath": file_path,
-                    "filename": Path(file_path).name,
-                    "extension": Path(file_path).suffix.lower(),
-                    "file_size": metadata["file_size"],
-                    "last_modified": metadata["last_modified"],
-                    "git_status": "added",
-                    
-                    # Content and analysis (excluding content_tsvector)
-                    "content": content,
-                    "analysis": analysis,
-                    "tags": tags,
-                    "file_type": file_type,
-                    "technical_level": technical_level,
-                    
-                    # Embedding
-                    "embedding_string": embedding_text,
-                    "embedding": embedding_list,
-                    
-                    # Timestamps
-                    "indexed_at": datetime.utcnow(),
-                }
+        Raises:
+            Exception: If the transaction fails; no files of the group are saved
+        """
+        rows = [
+            {
+                "repo_commit_hash": file_data["commit_hash"],
+                "repo_metadata": {"git_status": "added", "file_type": file_data["metadata"]["file_type"]},
                 
-                # Create file object (Don't save to DB yet - that happens in process_file_batch)
-                repo_file = RepositoryFile(**repo_file_data)
+                # File info
+                "filepath": file_data["filepath"],
+                "filename": file_data["filename"],
+                "extension": file_data["extension"],
+                "file_size": file_data["metadata"]["file_size"],
+                "last_modified": file_data["metadata"]["last_modified"],
+                "git_status": "added",
+                "blob_sha": file_data.get("blob_sha"),
                 
-                return repo_file
+                # Content and analysis (content_tsvector is generated by PostgreSQL)
+                "content": file_data["content"],
+                "analysis": file_data["analysis"],
+                "tags": file_data["tags"],
+                "file_type": file_data["file_type"],
+                "technical_level": file_data["technical_level"],
+                "analysis_model": file_data.get("analysis_model"),
+                "analysis_prompt_version": (
+                    file_data.get("analysis_prompt_version", ANALYSIS_PROMPT_VERSION)
+                    if file_data.get("analysis_model") else None
+                ),
                 
-        except Exception as e:
-            logger.error(f"Error processing file {file_path}: {str(e)}")
-            return None
+                # Embedding
+                "embedding_string": file_data["embedding_string"],
+                "embedding": file_data["embedding"],
+            }
+            for file_data in processed_files
+        ]
+        
+        # One multi-row upsert replaces the per-file lookup, delete and insert
+        async with session_context() as session:
+            file_repo = RepositoryFileRepository(session)
+            written = await file_repo.bulk_upsert(repo_id, rows)
+        
+        if written != len(rows):
+            raise RuntimeError(f"Failed to save {len(rows)} files for repository {repo_id}")
+        
+        logger.info(f"Saved {written} files to database")
     
     async def process_file_batch(
         self,
@@ -544,7 +943,7 @@ class RepositoryProcessingService:
         batch_index: int,
         total_batches: int,
         readme_content: Optional[str] = None
-    ) -> Tuple[int, int]:
+    ) -> Tuple[int, int, List[str]]:
         """
         Process a batch of files with a single transaction.
         
@@ -558,7 +957,8 @@ class RepositoryProcessingService:
             readme_content: Optional README content to include in analysis
             
         Returns:
-            Tuple of (success_count, failure_count)
+            Tuple of (success_count, failure_count, failed_files_list); skipped binary
+            and empty files count as neither
         """
         # Process all files in this batch
         logger.info(f"Processing batch {batch_index+1}/{total_batches} with {len(file_paths)} files")
@@ -569,7 +969,13 @@ class RepositoryProcessingService:
             repository = await repo_repo.get_by_id(repo_id)
             if not repository:
                 logger.error(f"Repository with ID {repo_id} not found, cannot process files")
-                return (0, len(file_paths))  # All files failed
+                return (0, len(file_paths), file_paths)  # All files failed
+        
+        # Reuse analyses of contents that were already processed anywhere
+        blob_map = await run_blocking(BlockingCategory.GIT, git_repo.get_blob_sha_map)
+        analyzed_blobs = await self._load_analyzed_blobs(
+            [blob_map.get(path) for path in file_paths], embedding_manager.routing_policy.routes
+        )
         
         # Create a semaphore to limit the number of concurrent API requests
         # This helps avoid overwhelming the API and hitting rate limits
@@ -581,150 +987,15 @@ class RepositoryProcessingService:
             async with semaphore:
                 logger.info(f"Batch {batch_index+1}/{total_batches} - Processing file {file_index+1}/{len(file_paths)}: {file_path}")
                 
-                # Get file metadata and extract content
-                if not git_repo.is_cloned() or not git_repo.repo:
-                    logger.error(f"Repository is not properly cloned")
-                    return None
-                
-                # Get full file path
-                repo_path = Path(git_repo.repo.working_dir)
-                full_path = repo_path / file_path
-                
                 try:
-                    # Initialize file extractor
-                    extractor = FileExtractor(
-                        max_file_size_mb=get_float_env("MAX_FILE_SIZE_MB", 10),
-                    )
+                    file_data = await self._read_file_stage(file_path, git_repo)
+                    if file_data is None or file_data is SKIPPED:
+                        return file_data
                     
-                    # Extract file metadata
-                    metadata = extractor.get_file_metadata(full_path)
-                    
-                    # Extract file content
-                    content = extractor.extract_content(full_path)
-                    
-                    # Skip empty files
-                    if content is None or content.strip() == "":
-                        logger.debug(f"Skipping empty file: {file_path}")
-                        return None
-                    
-                    # Get git metadata including commit hash
-                    commit_hash = git_repo.get_file_commit_hash(file_path)
-                    
-                    # Generate structured analysis using Google Gemini with retry logic
-                    max_retries = 10
-                    retry_delay = 2  # Initial delay in seconds
-                    
-                    for retry_attempt in range(max_retries):
-                        try:
-                            analysis = await embedding_manager.analyze_file_content(content, readme_content)
-                            
-                            # Check if required fields exist
-                            if not analysis.get('document_type') or not analysis.get('technical_level'):
-                                raise ValueError("Missing required fields in analysis response")
-                                
-                            # Successfully got analysis, exit retry loop
-                            break
-                            
-                        except Exception as e:
-                            if retry_attempt < max_retries - 1:
-                                # Calculate exponential backoff delay
-                                backoff_delay = retry_delay * (2 ** retry_attempt)
-                                logger.info(f"Retry {retry_attempt+1}/{max_retries} for {file_path}: {str(e)} - waiting {backoff_delay}s")
-                                await asyncio.sleep(backoff_delay)
-                            else:
-                                # Last attempt failed, create a basic analysis structure
-                                logger.warning(f"All {max_retries} analysis attempts failed for {file_path}")
-                                analysis = {
-                                    "title": f"File: {Path(file_path).name}",
-                                    "summary": f"Content from {file_path}",
-                                    "document_type": "Unknown",
-                                    "technical_level": "Unknown",
-                                    "key_concepts": [],
-                                    "potential_questions": [],
-                                    "keywords": [Path(file_path).stem, Path(file_path).suffix.replace('.', '')],
-                                    "related_topics": []
-                                }
-                    
-                    # Extract metadata fields
-                    file_type = analysis.get('document_type', 'Unknown')
-                    technical_level = analysis.get('technical_level', 'Unknown')
-                    tags = extract_tags_from_analysis(analysis)
-                    
-                    # Create embedding string from analysis
-                    embedding_text = f"""
-                    Filename: {Path(file_path).name}
-                    Filepath: {file_path}
-                    Repository: {repository.name}
-                    
-                    Title: {analysis.get('title', 'No title')}
-                    
-                    Summary: {analysis.get('summary', 'No summary')}
-                    
-                    Key Concepts: {', '.join(analysis.get('key_concepts', []))}
-                    
-                    Potential Questions: {' '.join(analysis.get('potential_questions', []))}
-                    
-                    Keywords: {', '.join(analysis.get('keywords', []))}
-                    
-                    Document Type: {file_type}
-                    
-                    Technical Level: {technical_level}
-                    
-                    Related Topics: {', '.join(analysis.get('related_topics', []))}
-                    
-                    Prerequisites: {', '.join(analysis.get('prerequisites', []))}
-                    """
-                    
-                    # Add code snippets if available
-                    if analysis.get('code_snippets') and len(analysis.get('code_snippets', [])) > 0:
-                        snippet_texts = []
-                        for j, snippet in enumerate(analysis.get('code_snippets', [])):
-                            snippet_text = f"Snippet {j+1} ({snippet.get('language', 'unknown')}): {snippet.get('purpose', '')}\n{snippet.get('summary', '')}"
-                            snippet_texts.append(snippet_text)
-                        
-                        joined_snippets = "\n".join(snippet_texts)
-                        embedding_text += f"""
-                    Code Snippets:
-                    {joined_snippets}
-                    """
-                        
-                        if analysis.get('code_snippets_overview'):
-                            embedding_text += f"""
-                    Code Snippets Overview: {analysis.get('code_snippets_overview')}
-                    """
-                    
-                    # Add component properties if available
-                    if analysis.get('component_properties'):
-                        cp = analysis.get('component_properties', {})
-                        embedding_text += f"""
-                    Component Type: {cp.get('component_type', 'Unknown')}
-                    API Elements: {', '.join(cp.get('api_elements', []))}
-                    Required Parameters: {', '.join(cp.get('required_parameters', []))}
-                    Optional Parameters: {', '.join(cp.get('optional_parameters', []))}
-                    Related Components: {', '.join(cp.get('related_components', []))}
-                    """
-                    
-                    # Generate embedding from the analysis text
-                    embedding_vector = await embedding_manager.embed_text(embedding_text)
-                    
-                    # Convert embedding to list if it's a numpy array
-                    embedding_list = embedding_vector.vector.tolist() if hasattr(embedding_vector.vector, 'tolist') else list(embedding_vector.vector)
-                    
-                    # Return the processed file data
-                    return {
-                        "filepath": file_path,
-                        "filename": Path(file_path).name,
-                        "extension": Path(file_path).suffix.lower(),
-                        "content": content,
-                        "commit_hash": commit_hash,
-                        "metadata": metadata,
-                        "analysis": analysis,
-                        "tags": tags,
-                        "file_type": file_type,
-                        "technical_level": technical_level,
-                        "embedding_string": embedding_text,
-                        "embedding": embedding_list
-                    }
+                    file_data = await self._analysis_stage(
+                        file_data, embedding_manager, readme_content, analyzed_blobs, repository.name
+                    )
+                    return await self._embedding_stage(file_data, embedding_manager, repository.name)
                 
                 except Exception as e:
                     logger.error(f"Error processing file {file_path}: {str(e)}")
@@ -739,91 +1010,146 @@ class RepositoryProcessingService:
         failed_file_paths = []
         
         for i, result in enumerate(file_results):
-            if result is not None:
-                processed_files.append(result)
-            else:
+            if result is None:
                 failed_file_paths.append(file_paths[i])
+            elif result is not SKIPPED:
+                processed_files.append(result)
         
         success_count = len(processed_files)
         failure_count = len(failed_file_paths)
         
         # Save all processed files in a single transaction
         if processed_files:
-            async with session_context() as session:
-                try:
-                    file_repo = RepositoryFileRepository(session)
-                    
-                    # Check for existing files and delete them
-                    for file_data in processed_files:
-                        filepath = file_data["filepath"]
-                        existing_file = await file_repo.get_by_path(repo_id, filepath)
-                        if existing_file:
-                            await file_repo.delete(existing_file.id)
-                            logger.debug(f"Deleted existing file: {filepath}")
-                    
-                    # Get repository for metadata
-                    repo_repo = RepositoryRepository(session)
-                    repository = await repo_repo.get_by_id(repo_id)
-                    
-                    # Verify repository exists
-                    if not repository:
-                        logger.error(f"Repository with ID {repo_id} not found when saving files")
-                        return (0, len(file_paths), file_paths)
-                    
-                    # Create and add new files
-                    for file_data in processed_files:
-                        # Create a dictionary with all fields except content_tsvector
-                        repo_file_data = {
-                            # Repository info
-                            "repo_id": repo_id,
-                            "repo_url": repository.url,
-                            "repo_name": repository.name,
-                            "repo_branch": repository.default_branch,
-                            "repo_commit_hash": file_data["commit_hash"],
-                            "repo_metadata": {"git_status": "added", "file_type": file_data["metadata"]["file_type"]},
-                            
-                            # File info
-                            "filepath": file_data["filepath"],
-                            "filename": file_data["filename"],
-                            "extension": file_data["extension"],
-                            "file_size": file_data["metadata"]["file_size"],
-                            "last_modified": file_data["metadata"]["last_modified"],
-                            "git_status": "added",
-                            
-                            # Content and analysis (excluding content_tsvector)
-                            "content": file_data["content"],
-                            "analysis": file_data["analysis"],
-                            "tags": file_data["tags"],
-                            "file_type": file_data["file_type"],
-                            "technical_level": file_data["technical_level"],
-                            
-                            # Embedding
-                            "embedding_string": file_data["embedding_string"],
-                            "embedding": file_data["embedding"],
-                            
-                            # Timestamps
-                            "indexed_at": datetime.utcnow(),
-                        }
-                        
-                        # Create the RepositoryFile object (content_tsvector will be generated by PostgreSQL)
-                        repo_file = RepositoryFile(**repo_file_data)
-                        
-                        session.add(repo_file)
-                    
-                    # Commit the transaction
-                    await session.commit()
-                    logger.info(f"Saved {len(processed_files)} files to database")
-                except Exception as e:
-                    logger.error(f"Database transaction failed: {str(e)}")
-                    await session.rollback()
-                    # Count all files as failures
-                    failure_count = len(file_paths)
-                    success_count = 0
-                    failed_file_paths = file_paths
+            try:
+                await self._save_processed_files(repo_id, processed_files)
+            except Exception:
+                # Count all files as failures
+                failure_count += success_count
+                success_count = 0
+                failed_file_paths = failed_file_paths + [file_data["filepath"] for file_data in processed_files]
         
         logger.info(f"Batch {batch_index+1}/{total_batches} completed: {success_count} succeeded, {failure_count} failed")
         return (success_count, failure_count, failed_file_paths)
     
+    async def get_incremental_changes(
+        self,
+        repo_id: int,
+        git_repo: GitRepository,
+    ) -> Optional[FileChanges]:
+        """
+        Pull the repository and diff the last indexed commit against the new HEAD.
+        
+        Args:
+            repo_id: Repository ID
+            git_repo: GitRepository instance
+            
+        Returns:
+            FileChanges since the last indexed commit, or None if a full run is needed
+        """
+        async with session_context() as session:
+            repo_repo = RepositoryRepository(session)
+            repository = await repo_repo.get_by_id(repo_id)
+            last_commit_hash = repository.last_commit_hash if repository else None
+        
+        if not last_commit_hash:
+            logger.info("Repository has not been indexed yet, processing all files")
+            return None
+        
+        success, _ = await run_blocking(BlockingCategory.GIT, git_repo.update)
+        if not success:
+            logger.warning("Failed to update repository, using the local checkout")
+        
+        changes = await run_blocking(BlockingCategory.GIT, git_repo.get_changes_since, last_commit_hash)
+        if changes is None:
+            logger.warning(f"Cannot diff against last indexed commit {last_commit_hash}, processing all files")
+            return None
+        
+        logger.info(
+            f"Changes since {last_commit_hash[:8]}: {len(changes.added)} added, "
+            f"{len(changes.modified)} modified, {len(changes.deleted)} deleted, "
+            f"{len(changes.renamed)} renamed"
+        )
+        return changes
+    
+    async def apply_removed_and_renamed_files(
+        self,
+        repo_id: int,
+        git_repo: GitRepository,
+        changes: FileChanges,
+        embedding_manager: EmbeddingManager,
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Delete rows of removed files and move rows of renamed files without re-analysis.
+        
+        Moved rows keep their analysis and are re-embedded, since the embedding text
+        names the file path. Renamed files without a row at their old path, such as
+        files that were excluded, empty or failed before, are processed as new files.
+        
+        Args:
+            repo_id: Repository ID
+            git_repo: GitRepository instance
+            changes: Changes since the last indexed commit
+            embedding_manager: EmbeddingManager instance
+            
+        Returns:
+            Tuple of (new paths of renamed files to process, new paths of moved files
+            that could not be re-embedded)
+        """
+        head_hash = await run_blocking(BlockingCategory.GIT, git_repo.get_last_commit)
+        
+        async with session_context() as session:
+            file_repo = RepositoryFileRepository(session)
+            
+            if changes.deleted:
+                deleted = await file_repo.delete_by_paths(repo_id, changes.deleted)
+                logger.info(f"Removed {deleted} deleted files from the index")
+            
+            moved = []
+            unmoved = []
+            for old_path, new_path in changes.renamed:
+                if await file_repo.rename(repo_id, old_path, new_path, head_hash):
+                    moved.append(new_path)
+                else:
+                    unmoved.append(new_path)
+            if changes.renamed:
+                logger.info(
+                    f"Moved {len(moved)} renamed files without re-analysis, "
+                    f"{len(unmoved)} without a stored row are processed as new files"
+                )
+        
+        if not moved:
+            return (unmoved, [])
+        
+        async with session_context() as session:
+            repository = await RepositoryRepository(session).get_by_id(repo_id)
+            repo_name = repository.name if repository else git_repo.name
+        
+        async def re_embed(file_path: str) -> bool:
+            try:
+                async with session_context() as session:
+                    file_repo = RepositoryFileRepository(session)
+                    repo_file = await file_repo.get_by_path(repo_id, file_path)
+                    if repo_file is None:
+                        return False
+                    
+                    embedding_text = self._build_embedding_text(file_path, repo_name, repo_file.analysis or {})
+                    embedding_vector = await embedding_manager.embed_text_batched(embedding_text)
+                    repo_file.embedding_string = embedding_text
+                    repo_file.embedding = (
+                        embedding_vector.vector.tolist() if hasattr(embedding_vector.vector, 'tolist')
+                        else list(embedding_vector.vector)
+                    )
+                    return await file_repo.update(repo_file) is not None
+            except Exception as e:
+                logger.error(f"Error re-embedding renamed file {file_path}: {str(e)}")
+                return False
+        
+        results = await asyncio.gather(*(re_embed(file_path) for file_path in moved))
+        failed = [file_path for file_path, ok in zip(moved, results, strict=True) if not ok]
+        if failed:
+            logger.warning(f"Failed to re-embed {len(failed)} renamed files, they are listed as missing embeddings")
+        return (unmoved, failed)
+    
     async def process_repository(
         self,
         repo_url: Optional[str] = None,
@@ -832,6 +1158,7 @@ class RepositoryProcessingService:
         limit: Optional[int] = None,
         include_tests: bool = False,
         include_readme: bool = False,
+        incremental: bool = False,
     ) -> Tuple[int, int, List[str]]:
         """
         Process a repository with the complete workflow.
@@ -843,6 +1170,8 @@ class RepositoryProcessingService:
             limit: Optional limit on number of files to process
             include_tests: Whether to include test files and directories (default: False)
             include_readme: Whether to include README.md content in file analysis (default: False)
+            incremental: Whether to only process files changed since the last indexed commit
+                (falls back to a full run when the repository has not been indexed yet)
             
         Returns:
             Tuple of (success_count, failure_count, failed_files_list)
@@ -875,7 +1204,7 @@ class RepositoryProcessingService:
                     return (0, 0, [])
                 
                 # Get the actual branch name
-                actual_branch = git_repo.get_current_branch()
+                actual_branch = await run_blocking(BlockingCategory.GIT, git_repo.get_current_branch)
                 
                 # If repository has null default_branch, update it with the actual branch
                 if actual_branch and (repository.default_branch is None or repository.default_branch == ""):
@@ -901,53 +1230,125 @@ class RepositoryProcessingService:
         # Create embedding manager
         embedding_manager = await self.create_embedding_manager()
         
-        # Extract files from repository
-        file_paths = await self.extract_repository_files(repo_id, git_repo, limit, include_tests)
+        # Condense the README once and reuse it as context of every file analysis
+        readme_content = await embedding_manager.get_readme_context(readme_content, git_repo.name)
+        
+        # In incremental mode, only look at files changed since the last indexed commit
+        changes = None
+        if incremental:
+            changes = await self.get_incremental_changes(repo_id, git_repo)
         
-        if not file_paths:
+        # One file beyond the limit tells whether the limit held files back
+        scan_limit = limit + 1 if limit is not None and limit > 0 else None
+        changed_paths: List[str] = []
+        if changes is not None:
+            unmoved, failed_moves = await self.apply_removed_and_renamed_files(
+                repo_id, git_repo, changes, embedding_manager
+            )
+            failed_files.extend(failed_moves)
+            changed_paths = changes.to_process + unmoved
+            file_paths = await self.extract_repository_files(
+                repo_id, git_repo, scan_limit, include_tests, paths=changed_paths
+            )
+        else:
+            # Extract files from repository
+            file_paths = await self.extract_repository_files(repo_id, git_repo, scan_limit, include_tests)
+        
+        limited = scan_limit is not None and len(file_paths) > limit
+        if limited:
+            file_paths = file_paths[:limit]
+        
+        if not file_paths and changes is None:
             logger.info(f"No files found for repository ID {repo_id}")
+            await embedding_manager.close()
             return (0, 0, [])
         
         total_files = len(file_paths)
         logger.info(f"Found {total_files} files to process")
         
-        # Create batches of files
-        batches = [file_paths[i:i + self.batch_size] for i in range(0, total_files, self.batch_size)]
-        total_batches = len(batches)
-        logger.info(f"Split into {total_batches} batches of {self.batch_size} files (max)")
-        
-        # Process batches in parallel, but limit the number of concurrent batches
-        # This limits the total concurrent processing while still being faster than sequential processing
-        max_concurrent_batches = min(3, total_batches)  # Process up to 3 batches concurrently
-        batch_semaphore = asyncio.Semaphore(max_concurrent_batches)
-        
-        async def process_batch_with_semaphore(batch, batch_index):
-            async with batch_semaphore:
-                return await self.process_file_batch(
-                    batch,
-                    repo_id,
-                    git_repo,
-                    embedding_manager,
-                    batch_index,
-                    total_batches,
-                    readme_content
-                )
+        # Resolve last-commit hashes for every file in one git log pass
+        await run_blocking(BlockingCategory.GIT, git_repo.get_file_commit_map)
+        
+        # Identical contents already analyzed in any repository are not sent to the APIs again
+        blob_map = await run_blocking(BlockingCategory.GIT, git_repo.get_blob_sha_map)
+        analyzed_blobs = await self._load_analyzed_blobs(
+            [blob_map.get(path) for path in file_paths], embedding_manager.routing_policy.routes
+        )
         
-        # Create tasks for all batches
-        batch_tasks = [process_batch_with_semaphore(batch, i) for i, batch in enumerate(batches)]
+        # Get the repository name used in embedding texts
+        async with session_context() as session:
+            repo_repo = RepositoryRepository(session)
+            repository = await repo_repo.get_by_id(repo_id)
+            if not repository:
+                logger.error(f"Repository with ID {repo_id} not found, cannot process files")
+                await embedding_manager.close()
+                return (0, total_files, file_paths)
+            repo_name = repository.name
+        
+        # Stream files through read -> analysis -> embedding -> database stages.
+        # Each stage has its own worker pool, so a slow API call only holds one
+        # slot and the database writer commits in steady groups.
+        pipeline = StagedPipeline(
+            stages=[
+                PipelineStage(
+                    "read",
+                    lambda file_path, _: self._read_file_stage(file_path, git_repo),
+                    concurrency=self.read_workers,
+                ),
+                PipelineStage(
+                    "analysis",
+                    lambda _, file_data: self._analysis_stage(
+                        file_data, embedding_manager, readme_content, analyzed_blobs, repo_name
+                    ),
+                    concurrency=self.analysis_workers,
+                ),
+                PipelineStage(
+                    "embedding",
+                    lambda _, file_data: self._embedding_stage(file_data, embedding_manager, repo_name),
+                    concurrency=self.embedding_workers,
+                ),
+            ],
+            sink=lambda group: self._save_processed_files(repo_id, [file_data for _, file_data in group]),
+            sink_batch_size=self.db_commit_size,
+        )
+        logger.info(
+            f"Processing with {self.read_workers} read, {self.analysis_workers} analysis and "
+            f"{self.embedding_workers} embedding workers, committing up to {self.db_commit_size} files at a time"
+        )
         
-        # Process all batches and gather results
-        batch_results = await asyncio.gather(*batch_tasks)
+        # Measure event loop lag while the pipeline runs; it stays low as long as
+        # all blocking work goes through the disk and git pools
+        async with LoopLagMonitor() as lag_monitor:
+            result = await pipeline.run((file_path, None) for file_path in file_paths)
+        logger.info(f"Pipeline {lag_monitor.stats}")
+        if self.local_analyzers is not None and self.local_analyzers.counts:
+            counts = ", ".join(f"{name}: {count}" for name, count in sorted(self.local_analyzers.counts.items()))
+            logger.info(f"Analyzed files locally without model requests ({counts})")
+        if embedding_manager.routing_policy.counts:
+            counts = ", ".join(f"{tier}: {count}" for tier, count in sorted(embedding_manager.routing_policy.counts.items()))
+            logger.info(f"Files routed to analysis tiers ({counts})")
+        await embedding_manager.close()
+        
+        total_success = result.success_count
+        total_failure = result.failure_count + len(failed_files)
+        failed_files.extend(result.failed)
+        
+        logger.info(
+            f"All files completed: {total_success + total_failure + result.skip_count}/{total_files} files processed "
+            f"({total_success} succeeded, {total_failure} failed, {result.skip_count} skipped as binary or empty)"
+        )
         
-        # Process results
-        for i, (batch_success, batch_failure, batch_failed_files) in enumerate(batch_results):
-            total_success += batch_success
-            total_failure += batch_failure
-            failed_files.extend(batch_failed_files)
-            
-            logger.info(f"Completed batch {i+1}/{total_batches}: {batch_success} succeeded, {batch_failure} failed")
-            
-        logger.info(f"All batches completed: {total_success + total_failure}/{total_files} files processed ({total_success} succeeded, {total_failure} failed)")
+        if changes is not None:
+            # Changed files that are no longer indexed, because they became binary or
+            # empty or the scan now leaves them out, must not keep their old rows
+            stale = list(result.skipped)
+            if not limited:
+                scanned = set(file_paths)
+                stale.extend(path for path in changed_paths if path not in scanned)
+            if stale:
+                async with session_context() as session:
+                    removed = await RepositoryFileRepository(session).delete_by_paths(repo_id, stale)
+                logger.info(f"Removed {removed} changed files that are no longer indexed")
         
         # Update repository status and last indexed time
         async with session_context() as session:
@@ -957,8 +1358,21 @@ class RepositoryProcessingService:
                 # Update repository properties
                 repository.status = RepoStatus.READY.value
                 repository.last_indexed_at = datetime.utcnow()
-                repository.last_commit_hash = git_repo.get_last_commit()
-                repository.file_count = total_success
+                # Incremental runs diff from the last indexed commit, so it only moves
+                # once every file up to HEAD is stored or skipped; otherwise the next run retries
+                if total_failure == 0 and not limited:
+                    repository.last_commit_hash = await run_blocking(BlockingCategory.GIT, git_repo.get_last_commit)
+                else:
+                    logger.warning(
+                        f"Keeping last indexed commit {repository.last_commit_hash or 'unset'}: "
+                        f"{total_failure} files failed"
+                        + (f" and files beyond the limit of {limit} were not processed" if limited else "")
+                    )
+                if changes is not None:
+                    # Unchanged files are kept, so count what is stored
+                    repository.file_count = await RepositoryFileRepository(session).count_by_repository_id(repo_id)
+                else:
+                    repository.file_count = total_success
                 
                 # Save the changes
                 await repo_repo.update(repository)
@@ -1007,7 +1421,7 @@ class RepositoryProcessingService:
                 return False
             
             # Update repository to get latest changes
-            success, changed_files = git_repo.update()
+            success, changed_files = await run_blocking(BlockingCategory.GIT, git_repo.update)
             if not success:
                 logger.error(f"Failed to update repository")
                 return False
@@ -1031,6 +1445,7 @@ class RepositoryProcessingService:
         
         # Create embedding manager
         embedding_manager = await self.create_embedding_manager()
+        readme_content = await embedding_manager.get_readme_context(readme_content, git_repo.name)
         
         # Process the single file
         logger.info(f"Processing file: {filepath}")
@@ -1066,6 +1481,9 @@ class RepositoryProcessingService:
                     existing_file.tags = repo_file.tags
                     existing_file.file_type = repo_file.file_type
                     existing_file.technical_level = repo_file.technical_level
+                    existing_file.blob_sha = repo_file.blob_sha
+                    existing_file.analysis_model = repo_file.analysis_model
+                    existing_file.analysis_prompt_version = repo_file.analysis_prompt_version
                     existing_file.file_size = repo_file.file_size
                     existing_file.last_modified = repo_file.last_modified
                     existing_file.repo_commit_hash = repo_file.repo_commit_hash
@@ -1086,4 +1504,7 @@ class RepositoryProcessingService:
             logger.error(f"Error updating file {filepath}: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
-            return False
\ No newline at end of file
+            return False
+        
+        finally:
+            await embedding_manager.close()
\ No newline at end of file
@@ -9,6 +9,7 @@ from typing import Dict, List, Optional, Tuple, Union
 from mfai_db_repos.lib.database.repository import RepositoryRepository
 from mfai_db_repos.lib.database.repository_file import RepositoryFileRepository
 from mfai_db_repos.lib.git.repository import GitRepository, RepoStatus
+from mfai_db_repos.utils.blocking import BlockingCategory, run_blocking
 from mfai_db_repos.utils.config import Config
 from mfai_db_repos.utils.logger import get_logger
 
@@ -67,7 +68,7 @@ class RepositoryService:
         logger.info(f"Adding repository: {name} ({url})")
         
         # Clone repository
-        if not git_repo.clone():
+        if not await run_blocking(BlockingCategory.GIT, git_repo.clone):
             logger.error(f"Failed to clone repository: {url}")
             return None
         
@@ -126,7 +127,7 @@ class RepositoryService:
         )
         
         # Update repository
-        success, changed_files = git_repo.update()
+        success, changed_files = await run_blocking(BlockingCategory.GIT, git_repo.update)
         
         if not success:
             logger.error(f"Failed to update repository: {repository.name}")
@@ -276,7 +277,7 @@ class RepositoryService:
         )
         
         # Get Git stats
-        stats = git_repo.get_repo_stats()
+        stats = await run_blocking(BlockingCategory.GIT, git_repo.get_repo_stats)
         
         # Get file stats
         if self.file_repo:
@@ -134,6 +134,17 @@ async def init_database_schema() -> Tuple[bool, str]:
             await conn.run_sync(Base.metadata.create_all)
             logger.info("Database schema created successfully")
             
+            # Add columns introduced after the table was first created
+            for column_sql in (
+                "blob_sha VARCHAR(64)",
+                "analysis_model VARCHAR(100)",
+                "analysis_prompt_version VARCHAR(20)",
+            ):
+                await conn.execute(text(f"ALTER TABLE repository_files ADD COLUMN IF NOT EXISTS {column_sql}"))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_blob_sha ON repository_files (blob_sha)"
+            ))
+            
             # Create specialized index for vector operations if using Neon DB
             if config.config.database.is_serverless:
                 try:
@@ -92,6 +92,7 @@ class RepositoryFile(Base):
     extension = Column(String(50))
     file_size = Column(Integer)
     git_status = Column(String(50))  # e.g., "added", "modified", "deleted"
+    blob_sha = Column(String(64))  # Git blob SHA of the content, shared by identical copies
     
     # Content and embedding columns
     content = Column(Text)
@@ -110,6 +111,8 @@ class RepositoryFile(Base):
     tags = Column(ARRAY(Text))
     file_type = Column(String(50))
     technical_level = Column(String(50))
+    analysis_model = Column(String(100))  # Model that produced the analysis (None if not analyzed)
+    analysis_prompt_version = Column(String(20))  # Version of the analysis prompt
     last_modified = Column(DateTime(timezone=True))
     indexed_at = Column(DateTime(timezone=True), default=datetime.datetime.now)
     
@@ -122,6 +125,7 @@ class RepositoryFile(Base):
         Index("idx_repo_url", "repo_url"),
         Index("idx_filepath", "filepath"),
         Index("idx_file_type", "file_type"),
+        Index("idx_blob_sha", "blob_sha"),
         # Enable GIN index for tags array column
         Index("idx_repository_files_tags", "tags", postgresql_using="gin"),
         # Enable GIN index for tsvector column
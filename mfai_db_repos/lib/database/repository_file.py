@@ -3,11 +3,14 @@ Repository file database operations module.
 
 This module provides CRUD operations and queries for the RepositoryFile model.
 """
+import json
 from datetime import datetime
+from pathlib import PurePosixPath
 from typing import Any, Dict, List, Optional, Union, Tuple
 
 import numpy as np
-from sqlalchemy import func, select, and_, or_, text
+from sqlalchemy import and_, delete, func, literal_column, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,6 +19,65 @@ from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Rows per INSERT statement in bulk upserts (keeps bind parameters well below
+# the PostgreSQL limit of 32767 per statement)
+BULK_UPSERT_CHUNK_SIZE = 1000
+
+# Approximate bytes of column values per INSERT statement in bulk upserts. File
+# contents can be several megabytes each, so chunks close early on large rows.
+BULK_UPSERT_MAX_BYTES = 32 * 1024 * 1024
+
+# Columns identifying a row in bulk upserts, never overwritten on conflict
+_UPSERT_KEY_COLUMNS = {"id", "repo_id", "repo_url", "filepath"}
+
+
+def estimate_row_bytes(row: Dict[str, Any]) -> int:
+    """Estimate the bytes a row of column values adds to a statement.
+    
+    Args:
+        row: Column values
+        
+    Returns:
+        Approximate size in bytes
+    """
+    size = 0
+    for value in row.values():
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        elif isinstance(value, (list, tuple)):
+            size += 16 * len(value)  # Embedding vectors and arrays
+        elif isinstance(value, dict):
+            size += len(json.dumps(value, default=str))
+        else:
+            size += 16
+    return size
+
+
+def _chunk_rows(values: List[Dict[str, Any]], chunk_size: int, max_bytes: int) -> List[List[Dict[str, Any]]]:
+    """Split rows into chunks of at most chunk_size rows and about max_bytes bytes.
+    
+    Args:
+        values: Rows of column values
+        chunk_size: Maximum rows per chunk
+        max_bytes: Maximum approximate bytes per chunk (a larger row gets its own chunk)
+        
+    Returns:
+        Chunks of rows in order
+    """
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_bytes = 0
+    for row in values:
+        row_bytes = estimate_row_bytes(row)
+        if current and (len(current) >= max(1, chunk_size) or current_bytes + row_bytes > max_bytes):
+            chunks.append(current)
+            current, current_bytes = [], 0
+        current.append(row)
+        current_bytes += row_bytes
+    if current:
+        chunks.append(current)
+    return chunks
+
 
 class RepositoryFileRepository:
     """Repository pattern for RepositoryFile database operations."""
@@ -126,6 +188,109 @@ class RepositoryFileRepository:
             await self.session.rollback()
             return None
     
+    async def bulk_upsert(
+        self,
+        repository_id: int,
+        rows: List[Dict[str, Any]],
+        conflict_values: Optional[Dict[str, Any]] = None,
+        chunk_size: int = BULK_UPSERT_CHUNK_SIZE,
+        max_bytes: int = BULK_UPSERT_MAX_BYTES,
+    ) -> int:
+        """Insert or update many repository files in one transaction.
+        
+        Rows are written with multi-row INSERT ... ON CONFLICT (repo_url, filepath)
+        DO UPDATE statements, so the number of round-trips depends on the number of
+        chunks rather than the number of files. On conflict, only the columns present
+        in the rows are overwritten, so existing analyses and embeddings are kept when
+        a row does not carry them.
+        
+        Args:
+            repository_id: Repository ID
+            rows: Column values per file; all rows must have the same keys and include
+                "filepath". Repository columns and "indexed_at" are filled in.
+            conflict_values: Optional column values applied only to existing rows; a
+                callable value receives the statement's excluded row and returns an expression
+            chunk_size: Maximum number of rows per statement
+            max_bytes: Maximum approximate bytes of column values per statement
+            
+        Returns:
+            Number of written rows (0 if the write failed)
+        """
+        written, _ = await self.bulk_upsert_counts(repository_id, rows, conflict_values, chunk_size, max_bytes)
+        return written
+    
+    async def bulk_upsert_counts(
+        self,
+        repository_id: int,
+        rows: List[Dict[str, Any]],
+        conflict_values: Optional[Dict[str, Any]] = None,
+        chunk_size: int = BULK_UPSERT_CHUNK_SIZE,
+        max_bytes: int = BULK_UPSERT_MAX_BYTES,
+    ) -> Tuple[int, int]:
+        """Insert or update many repository files, counting new files.
+        
+        Args:
+            repository_id: Repository ID
+            rows: Column values per file (see bulk_upsert)
+            conflict_values: Optional column values applied only to existing rows (see bulk_upsert)
+            chunk_size: Maximum number of rows per statement
+            max_bytes: Maximum approximate bytes of column values per statement
+            
+        Returns:
+            Tuple of (written rows, inserted rows), (0, 0) if the write failed
+        """
+        if not rows:
+            return 0, 0
+        
+        try:
+            repository = await self.session.get(Repository, repository_id)
+            if not repository:
+                logger.warning(f"Repository with ID {repository_id} not found")
+                return 0, 0
+            
+            now = datetime.utcnow()
+            values = [
+                {
+                    "repo_name": repository.name,
+                    "repo_branch": repository.default_branch,
+                    "indexed_at": now,
+                    **row,
+                    "repo_id": repository_id,
+                    "repo_url": repository.url,
+                }
+                for row in rows
+            ]
+            
+            inserted = 0
+            for chunk in _chunk_rows(values, chunk_size, max_bytes):
+                stmt = pg_insert(RepositoryFile).values(chunk)
+                update_values = {
+                    column: stmt.excluded[column]
+                    for column in chunk[0]
+                    if column not in _UPSERT_KEY_COLUMNS
+                }
+                for column, value in (conflict_values or {}).items():
+                    update_values[column] = value(stmt.excluded) if callable(value) else value
+                stmt = stmt.on_conflict_do_update(
+                    constraint="uq_repository_file_path",
+                    set_=update_values,
+                ).returning(literal_column("xmax = 0"))  # True for inserted rows
+                
+                result = await self.session.execute(stmt)
+                inserted += sum(1 for (was_inserted,) in result if was_inserted)
+            
+            # Update repository file count
+            repository.file_count = (repository.file_count or 0) + inserted
+            
+            await self.session.commit()
+            
+            logger.debug(f"Upserted {len(values)} repository files ({inserted} new)")
+            return len(values), inserted
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to upsert repository files: {e}")
+            await self.session.rollback()
+            return 0, 0
+    
     async def get_by_id(self, file_id: int) -> Optional[RepositoryFile]:
         """Get a repository file by ID.
         
@@ -156,6 +321,75 @@ class RepositoryFileRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
+    async def get_analyzed_by_blob_shas(
+        self,
+        blob_shas: List[str],
+        analysis_model: str,
+        prompt_version: str,
+        chunk_size: int = BULK_UPSERT_CHUNK_SIZE,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Get the analysis of files with the given contents, from any path or repository.
+        
+        Embedding vectors are not loaded; an MD5 digest of the embedded text is
+        returned instead so callers can check whether the vector is reusable.
+        
+        Args:
+            blob_shas: Git blob SHAs of the file contents
+            analysis_model: Model that must have produced the analysis
+            prompt_version: Version of the analysis prompt
+            chunk_size: Maximum number of SHAs per query
+            
+        Returns:
+            Dictionary mapping blob SHAs to the most recent analysis fields (id, analysis,
+            tags, file_type, technical_level, analysis_model, analysis_prompt_version,
+            embedding_digest)
+        """
+        unique_shas = sorted({sha for sha in blob_shas if sha})
+        analyzed: Dict[str, Dict[str, Any]] = {}
+        
+        for start in range(0, len(unique_shas), max(1, chunk_size)):
+            stmt = (
+                select(
+                    RepositoryFile.blob_sha,
+                    RepositoryFile.id,
+                    RepositoryFile.analysis,
+                    RepositoryFile.tags,
+                    RepositoryFile.file_type,
+                    RepositoryFile.technical_level,
+                    RepositoryFile.analysis_model,
+                    RepositoryFile.analysis_prompt_version,
+                    func.md5(RepositoryFile.embedding_string).label("embedding_digest"),
+                )
+                .where(
+                    RepositoryFile.blob_sha.in_(unique_shas[start:start + chunk_size]),
+                    RepositoryFile.analysis_model == analysis_model,
+                    RepositoryFile.analysis_prompt_version == prompt_version,
+                )
+                .distinct(RepositoryFile.blob_sha)
+                .order_by(RepositoryFile.blob_sha, RepositoryFile.indexed_at.desc())
+            )
+            result = await self.session.execute(stmt)
+            for row in result.mappings():
+                analyzed[row["blob_sha"]] = dict(row)
+        
+        return analyzed
+    
+    async def get_embedding(self, file_id: int) -> Optional[List[float]]:
+        """Get the embedding vector of a repository file.
+        
+        Args:
+            file_id: Repository file ID
+            
+        Returns:
+            Embedding vector or None if the file has no embedding
+        """
+        stmt = select(RepositoryFile.embedding).where(RepositoryFile.id == file_id)
+        result = await self.session.execute(stmt)
+        embedding = result.scalar_one_or_none()
+        if embedding is None:
+            return None
+        return embedding.tolist() if isinstance(embedding, np.ndarray) else list(embedding)
+    
     async def get_by_repository_id(
         self,
         repository_id: int,
@@ -453,3 +687,87 @@ class RepositoryFileRepository:
             await self.session.rollback()
             return False
     
+    
+    async def delete_by_paths(self, repository_id: int, paths: List[str]) -> int:
+        """Delete repository files by path.
+        
+        Args:
+            repository_id: Repository ID
+            paths: Paths of the files within the repository
+            
+        Returns:
+            Number of deleted files
+        """
+        if not paths:
+            return 0
+        
+        try:
+            stmt = delete(RepositoryFile).where(
+                RepositoryFile.repo_id == repository_id,
+                RepositoryFile.filepath.in_(paths),
+            )
+            result = await self.session.execute(stmt)
+            await self.session.commit()
+            
+            logger.debug(f"Deleted {result.rowcount} repository files")
+            return result.rowcount
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to delete repository files: {e}")
+            await self.session.rollback()
+            return 0
+    
+    async def rename(
+        self,
+        repository_id: int,
+        old_path: str,
+        new_path: str,
+        commit_hash: Optional[str] = None,
+    ) -> bool:
+        """Move a repository file to a new path, keeping its analysis.
+        
+        The embedding text names the file path, so the embedding is cleared and the
+        file is listed by get_files_without_embeddings until it is re-embedded.
+        
+        Args:
+            repository_id: Repository ID
+            old_path: Previous path of the file within the repository
+            new_path: New path of the file within the repository
+            commit_hash: Optional commit hash of the rename
+            
+        Returns:
+            True if a file was moved, False otherwise
+        """
+        path = PurePosixPath(new_path)
+        values: Dict[str, Any] = {
+            "filepath": new_path,
+            "filename": path.name,
+            "extension": path.suffix.lower(),
+            "git_status": "renamed",
+            "embedding_string": None,
+            "embedding": None,
+        }
+        if commit_hash:
+            values["repo_commit_hash"] = commit_hash
+        
+        try:
+            # Drop any stale row already stored at the destination path
+            await self.session.execute(
+                delete(RepositoryFile).where(
+                    RepositoryFile.repo_id == repository_id,
+                    RepositoryFile.filepath == new_path,
+                )
+            )
+            stmt = update(RepositoryFile).where(
+                RepositoryFile.repo_id == repository_id,
+                RepositoryFile.filepath == old_path,
+            ).values(**values)
+            result = await self.session.execute(stmt)
+            await self.session.commit()
+            
+            if result.rowcount:
+                logger.debug(f"Renamed repository file: {old_path} -> {new_path}")
+            return bool(result.rowcount)
+        except SQLAlchemyError as e:
+            logger.error(f"Failed to rename repository file: {e}")
+            await self.session.rollback()
+            return False
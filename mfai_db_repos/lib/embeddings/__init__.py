@@ -4,9 +4,24 @@ Package for handling vector embeddings in the GitContext system.
 
 from mfai_db_repos.lib.embeddings.base import EmbeddingConfig, EmbeddingProvider, EmbeddingVector
 from mfai_db_repos.lib.embeddings.batch import BatchProcessor, BatchProcessingResult
-from mfai_db_repos.lib.embeddings.google_genai import GoogleGenAIEmbeddingConfig, GoogleGenAIEmbeddingProvider
+from mfai_db_repos.lib.embeddings.cache import AnalysisCache
+from mfai_db_repos.lib.embeddings.google_genai import (
+    AnalysisContentMode,
+    AnalysisPromptVariant,
+    GoogleGenAIEmbeddingConfig,
+    GoogleGenAIEmbeddingProvider,
+)
+from mfai_db_repos.lib.embeddings.local_analysis import (
+    LocalAnalyzer,
+    LocalAnalyzerRegistry,
+    get_local_analyzer_registry,
+)
 from mfai_db_repos.lib.embeddings.manager import EmbeddingManager, ProviderType
+from mfai_db_repos.lib.embeddings.microbatch import MicroBatchEmbedder
 from mfai_db_repos.lib.embeddings.openai import OpenAIEmbeddingConfig, OpenAIEmbeddingProvider
+from mfai_db_repos.lib.embeddings.ratelimit import RateLimiter, get_rate_limiter
+from mfai_db_repos.lib.embeddings.routing import AnalysisRoute, AnalysisRoutingPolicy, AnalysisTier
+from mfai_db_repos.lib.embeddings.tokens import ModelTokenLimits, TokenBudget, get_model_limits
 
 __all__ = [
     'EmbeddingConfig',
@@ -18,6 +33,21 @@ __all__ = [
     'OpenAIEmbeddingProvider',
     'GoogleGenAIEmbeddingConfig',
     'GoogleGenAIEmbeddingProvider',
+    'AnalysisContentMode',
+    'AnalysisPromptVariant',
+    'AnalysisRoute',
+    'AnalysisRoutingPolicy',
+    'AnalysisTier',
     'BatchProcessor',
     'BatchProcessingResult',
+    'MicroBatchEmbedder',
+    'AnalysisCache',
+    'LocalAnalyzer',
+    'LocalAnalyzerRegistry',
+    'get_local_analyzer_registry',
+    'RateLimiter',
+    'get_rate_limiter',
+    'ModelTokenLimits',
+    'TokenBudget',
+    'get_model_limits',
 ]
\ No newline at end of file
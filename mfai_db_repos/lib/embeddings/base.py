@@ -8,6 +8,8 @@ from typing import Any, Dict, List, Optional
 import numpy as np
 from pydantic import BaseModel
 
+from mfai_db_repos.lib.embeddings.tokens import TokenBudget
+
 
 class EmbeddingVector(BaseModel):
     """Representation of an embedding vector with metadata."""
@@ -55,13 +57,14 @@ class EmbeddingProvider(abc.ABC):
             config: EmbeddingConfig instance with provider settings
         """
         self.config = config
+        self.token_budget = TokenBudget(config.model)
     
     @abc.abstractmethod
     async def embed_text(self, text: str) -> EmbeddingVector:
         """Generate an embedding for a single text input.
         
         Args:
-            text: Text to embed
+            text: Text to embed, within the model's input limit (see TokenBudget.fit)
             
         Returns:
             EmbeddingVector with the generated embedding
@@ -72,7 +75,7 @@ class EmbeddingProvider(abc.ABC):
         """Generate embeddings for a batch of text inputs.
         
         Args:
-            texts: List of texts to embed
+            texts: List of texts to embed, each within the model's input limit (see TokenBudget.pack)
             
         Returns:
             List of EmbeddingVector objects
@@ -83,7 +86,7 @@ class EmbeddingProvider(abc.ABC):
         """Generate an embedding for file content.
         
         Args:
-            content: File content to embed
+            content: File content to embed, within the model's input limit (see TokenBudget.fit)
             metadata: Optional metadata about the file
             
         Returns:
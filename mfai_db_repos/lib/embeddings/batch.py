@@ -3,10 +3,10 @@ Batch processing utilities for embedding generation.
 Provides tools for efficient parallel processing of embedding tasks.
 """
 import asyncio
-import time
 from dataclasses import dataclass
 from typing import Callable, Dict, Generic, List, Optional, TypeVar, Union
 
+from mfai_db_repos.lib.embeddings.ratelimit import RateLimiter
 from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -49,6 +49,7 @@ class BatchProcessor(Generic[T, R]):
         batch_size: int = 20,
         rate_limit_per_minute: Optional[int] = None,
         is_async: bool = True,
+        rate_limiter: Optional[RateLimiter] = None,
     ):
         """Initialize the batch processor.
         
@@ -58,6 +59,8 @@ class BatchProcessor(Generic[T, R]):
             batch_size: Number of items in a batch
             rate_limit_per_minute: Optional rate limit
             is_async: Whether the process function is async
+            rate_limiter: Optional limiter shared with other callers of the same API
+                (takes precedence over rate_limit_per_minute)
         """
         self.process_func = process_func
         self.max_concurrency = max_concurrency
@@ -66,37 +69,15 @@ class BatchProcessor(Generic[T, R]):
         self.is_async = is_async
         
         # Rate limiting state
-        self.request_count = 0
-        self.last_reset = time.time()
+        self.rate_limiter = rate_limiter
+        if self.rate_limiter is None and rate_limit_per_minute:
+            self.rate_limiter = RateLimiter(requests_per_minute=rate_limit_per_minute, name="batch")
         
         logger.info(
             f"BatchProcessor initialized with concurrency={max_concurrency}, "
             f"batch_size={batch_size}, rate_limit={rate_limit_per_minute}"
         )
     
-    async def _check_rate_limit(self):
-        """Check and enforce rate limiting."""
-        if not self.rate_limit_per_minute:
-            return
-            
-        current_time = time.time()
-        time_passed = current_time - self.last_reset
-        
-        # Reset counter if a minute has passed
-        if time_passed > 60:
-            self.request_count = 0
-            self.last_reset = current_time
-            return
-        
-        # Check if we've hit the rate limit
-        if self.request_count >= self.rate_limit_per_minute:
-            # Calculate sleep time needed to respect rate limit
-            sleep_time = 60 - time_passed
-            logger.warning(f"Rate limit reached, sleeping for {sleep_time:.2f} seconds")
-            await asyncio.sleep(sleep_time)
-            self.request_count = 0
-            self.last_reset = time.time()
-    
     async def _process_item(self, item: T, index: int) -> tuple[int, Union[R, Exception]]:
         """Process a single item and return the result with its index.
         
@@ -107,17 +88,18 @@ class BatchProcessor(Generic[T, R]):
         Returns:
             Tuple of (index, result or exception)
         """
-        try:
-            await self._check_rate_limit()
-            if self.rate_limit_per_minute:
-                self.request_count += 1
-                
+        async def call() -> R:
             if self.is_async:
-                result = await self.process_func(item)
+                return await self.process_func(item)
+            # Run synchronous function in executor
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.process_func, item)
+        
+        try:
+            if self.rate_limiter is not None:
+                result = await self.rate_limiter.call(call)
             else:
-                # Run synchronous function in executor
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(None, self.process_func, item)
+                result = await call()
                 
             return index, result
         except Exception as e:
@@ -0,0 +1,220 @@
+"""
+Persistent cache for structured analyses, embeddings and README contexts.
+Stores API results in a local SQLite file keyed by content hashes so unchanged
+inputs are never sent to the API twice.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    content_hash TEXT NOT NULL,
+    readme_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    created_at REAL NOT NULL DEFAULT (julianday('now')),
+    PRIMARY KEY (content_hash, readme_hash, model, prompt_version)
+);
+CREATE TABLE IF NOT EXISTS embeddings (
+    text_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL DEFAULT (julianday('now')),
+    PRIMARY KEY (text_hash, model)
+);
+CREATE TABLE IF NOT EXISTS readme_contexts (
+    readme_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    context TEXT NOT NULL,
+    created_at REAL NOT NULL DEFAULT (julianday('now')),
+    PRIMARY KEY (readme_hash, model, prompt_version)
+);
+"""
+
+
+def content_hash(text: Optional[str]) -> str:
+    """Compute the cache hash of a text.
+
+    Args:
+        text: Text to hash (None hashes as the empty string)
+
+    Returns:
+        Hex digest
+    """
+    return hashlib.sha256((text or "").encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class AnalysisCache:
+    """SQLite-backed cache of structured analyses and embedding vectors."""
+
+    def __init__(self, path: Union[str, Path]):
+        """Open (or create) a cache file.
+
+        Args:
+            path: Path to the SQLite file, or ":memory:" for an in-memory cache
+        """
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+            self.path = str(Path(self.path).expanduser())
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"Using analysis cache at {self.path}")
+
+    def get_analysis(
+        self,
+        content_digest: str,
+        readme_digest: str,
+        model: str,
+        prompt_version: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Look up a cached analysis.
+
+        Args:
+            content_digest: Hash of the file content
+            readme_digest: Hash of the README context
+            model: Analysis model name
+            prompt_version: Version of the analysis prompt
+
+        Returns:
+            Analysis dictionary or None if not cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM analyses WHERE content_hash = ? AND readme_hash = ? "
+                "AND model = ? AND prompt_version = ?",
+                (content_digest, readme_digest, model, prompt_version),
+            ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put_analysis(
+        self,
+        content_digest: str,
+        readme_digest: str,
+        model: str,
+        prompt_version: str,
+        analysis: Dict[str, Any],
+    ) -> None:
+        """Store an analysis.
+
+        Args:
+            content_digest: Hash of the file content
+            readme_digest: Hash of the README context
+            model: Analysis model name
+            prompt_version: Version of the analysis prompt
+            analysis: Analysis dictionary
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses "
+                "(content_hash, readme_hash, model, prompt_version, analysis) VALUES (?, ?, ?, ?, ?)",
+                (content_digest, readme_digest, model, prompt_version, json.dumps(analysis)),
+            )
+
+    def get_embedding(self, text_digest: str, model: str) -> Optional[List[float]]:
+        """Look up a cached embedding vector.
+
+        Args:
+            text_digest: Hash of the embedded text
+            model: Embedding model name
+
+        Returns:
+            Vector or None if not cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE text_hash = ? AND model = ?",
+                (text_digest, model),
+            ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return array("d", row[0]).tolist()
+
+    def put_embedding(self, text_digest: str, model: str, vector: List[float]) -> None:
+        """Store an embedding vector.
+
+        Args:
+            text_digest: Hash of the embedded text
+            model: Embedding model name
+            vector: Embedding vector
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (text_hash, model, vector) VALUES (?, ?, ?)",
+                (text_digest, model, array("d", vector).tobytes()),
+            )
+
+    def get_readme_context(self, readme_digest: str, model: str, prompt_version: str) -> Optional[str]:
+        """Look up a condensed README context.
+
+        Args:
+            readme_digest: Hash of the README content
+            model: Model that condensed the README
+            prompt_version: Version of the condensing prompt
+
+        Returns:
+            Context text or None if not cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT context FROM readme_contexts WHERE readme_hash = ? AND model = ? AND prompt_version = ?",
+                (readme_digest, model, prompt_version),
+            ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0]
+
+    def put_readme_context(self, readme_digest: str, model: str, prompt_version: str, context: str) -> None:
+        """Store a condensed README context.
+
+        Args:
+            readme_digest: Hash of the README content
+            model: Model that condensed the README
+            prompt_version: Version of the condensing prompt
+            context: Context text
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO readme_contexts (readme_hash, model, prompt_version, context) "
+                "VALUES (?, ?, ?, ?)",
+                (readme_digest, model, prompt_version, context),
+            )
+
+    def close(self) -> None:
+        """Close the cache file."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,584 @@
+"""
+Rule-based local analysis of structured files.
+
+Some files need no language model to be described: MODFLOW name files list
+the packages of a model, PEST control files declare their parameters and
+observations, JSON/YAML/TOML configurations are a set of keys, and stub files
+hold next to nothing. This module parses such files and produces an analysis
+with the same fields as the Gemini structured analysis, so they bypass the
+rate-limited analysis requests.
+
+Analyzers are registered by file extension, file name and content signature.
+An analyzer returns None when a file does not parse as expected, in which case
+the file is analyzed by the model as usual.
+"""
+import json
+import re
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from mfai_db_repos.lib.embeddings.google_genai import StructuredResponseSchema
+from mfai_db_repos.lib.file_processor.languages import language_for_filename
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Recorded as the analysis model of locally analyzed files
+LOCAL_ANALYSIS_MODEL = "local-rules"
+
+# Bump whenever an analyzer changes its output, like ANALYSIS_PROMPT_VERSION
+LOCAL_ANALYSIS_VERSION = "1"
+
+# Files with at most this many non-blank characters are described as stubs
+STUB_MAX_CHARS = 160
+
+# Languages that make a stub file documentation rather than code
+_TEXT_LANGUAGES = {"Text only", "Markdown", "reStructuredText"}
+
+# MODFLOW package and file types found in name files
+MODFLOW_FILE_TYPES: Dict[str, str] = {
+    "BAS": "basic package",
+    "BCF": "block-centered flow package",
+    "LPF": "layer-property flow package",
+    "UPW": "upstream weighting package",
+    "NPF": "node property flow package",
+    "DIS": "structured discretization",
+    "DISV": "vertex discretization",
+    "DISU": "unstructured discretization",
+    "TDIS": "temporal discretization",
+    "IC": "initial conditions",
+    "STO": "storage package",
+    "OC": "output control",
+    "IMS": "iterative model solution",
+    "PCG": "preconditioned conjugate-gradient solver",
+    "NWT": "Newton solver",
+    "GMG": "geometric multigrid solver",
+    "SIP": "strongly implicit procedure solver",
+    "CHD": "constant-head package",
+    "WEL": "well package",
+    "MAW": "multi-aquifer well package",
+    "MNW": "multi-node well package",
+    "RCH": "recharge package",
+    "EVT": "evapotranspiration package",
+    "RIV": "river package",
+    "DRN": "drain package",
+    "GHB": "general-head boundary package",
+    "SFR": "streamflow routing package",
+    "LAK": "lake package",
+    "UZF": "unsaturated zone flow package",
+    "HFB": "horizontal flow barrier package",
+    "CSUB": "skeletal storage, compaction and subsidence package",
+    "BUY": "buoyancy package",
+    "MVR": "water mover package",
+    "OBS": "observation utility",
+    "HOB": "head observation package",
+    "GWF": "groundwater flow model",
+    "GWT": "groundwater transport model",
+    "GWE": "groundwater energy transport model",
+    "ADV": "advection package",
+    "DSP": "dispersion package",
+    "MST": "mobile storage and transfer package",
+    "SSM": "source and sink mixing package",
+    "CNC": "constant concentration package",
+    "FMI": "flow model interface",
+    "LIST": "listing file",
+    "DATA": "data file",
+}
+
+
+class LocalAnalyzer:
+    """Base class of rule-based analyzers for one kind of file."""
+
+    name = "local"
+    extensions: Tuple[str, ...] = ()  # Lowercase extensions with the dot
+    filenames: Tuple[str, ...] = ()  # Lowercase exact file names
+
+    def matches_content(self, content: str) -> bool:
+        """Check whether content is of this kind regardless of its file name.
+
+        Args:
+            content: File content
+
+        Returns:
+            True if the content signature matches
+        """
+        return False
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        """Analyze a file.
+
+        Args:
+            filepath: Path of the file relative to the repository root
+            content: File content
+
+        Returns:
+            Analysis dictionary, or None if the file does not parse as expected
+        """
+        raise NotImplementedError
+
+
+def build_local_analysis(
+    title: str,
+    summary: str,
+    key_concepts: Iterable[str],
+    potential_questions: Iterable[str],
+    keywords: Iterable[str],
+    document_type: str,
+    technical_level: str,
+    related_topics: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """Build an analysis dictionary with the fields of the Gemini analysis.
+
+    Args:
+        title: Title of the file
+        summary: Summary of the file
+        key_concepts: Core concepts
+        potential_questions: Questions the file answers
+        keywords: Keywords
+        document_type: Document type (e.g. configuration)
+        technical_level: beginner, intermediate or advanced
+        related_topics: Related topics
+
+    Returns:
+        Analysis dictionary
+    """
+    return StructuredResponseSchema(
+        title=title,
+        summary=summary,
+        key_concepts=_unique(key_concepts),
+        potential_questions=list(potential_questions),
+        keywords=_unique(keywords),
+        document_type=document_type,
+        technical_level=technical_level,
+        related_topics=_unique(related_topics),
+    ).model_dump()
+
+
+def _unique(values: Iterable[str]) -> List[str]:
+    """Drop empty and repeated values, keeping the first occurrence."""
+    seen = set()
+    result = []
+    for value in values:
+        key = value.lower()
+        if value and key not in seen:
+            seen.add(key)
+            result.append(value)
+    return result
+
+
+def _join(values: List[str], limit: int = 12) -> str:
+    """Join values for a summary sentence, eliding the rest beyond a limit."""
+    if len(values) <= limit:
+        return ", ".join(values)
+    return f"{', '.join(values[:limit])} and {len(values) - limit} more"
+
+
+class ModflowNameFileAnalyzer(LocalAnalyzer):
+    """Analyzer of MODFLOW name files (.nam), both MODFLOW 6 blocks and MODFLOW-2005 lists."""
+
+    name = "modflow-name-file"
+    extensions = (".nam",)
+
+    _BLOCK_PATTERN = re.compile(r"^\s*BEGIN\s+(\w+)", re.IGNORECASE | re.MULTILINE)
+
+    # MODFLOW 6 blocks whose lines are (file type, file name, ...) entries
+    _ENTRY_BLOCKS = ("PACKAGES", "MODELS", "EXCHANGES", "SOLUTIONGROUP", "TIMING")
+
+    def matches_content(self, content: str) -> bool:
+        blocks = {block.upper() for block in self._BLOCK_PATTERN.findall(content[:4096])}
+        return "PACKAGES" in blocks or {"MODELS", "TIMING"} <= blocks
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        entries: List[Tuple[str, str]] = []  # (file type, file name)
+        blocks: List[str] = []
+        block = None
+        for raw_line in content.splitlines():
+            line = raw_line.split("#", 1)[0].split("!", 1)[0].strip()
+            if not line:
+                continue
+            tokens = line.split()
+            keyword = tokens[0].upper()
+            if keyword == "BEGIN" and len(tokens) > 1:
+                block = tokens[1].upper()
+                blocks.append(block)
+            elif keyword == "END":
+                block = None
+            elif block in self._ENTRY_BLOCKS and len(tokens) > 1 and keyword != "MXITER":
+                entries.append((keyword, tokens[1]))
+            elif block is None and len(tokens) >= 3 and tokens[1].lstrip("-").isdigit():
+                # MODFLOW-2005: Ftype Nunit Fname
+                entries.append((keyword, tokens[2]))
+            elif block is None:
+                return None
+
+        if not entries:
+            return None
+
+        stem = Path(filepath).stem
+        is_mf6 = bool(blocks)
+        is_simulation = "MODELS" in blocks
+        version = "MODFLOW 6" if is_mf6 else "MODFLOW-2005"
+        types = _unique(file_type for file_type, _ in entries)
+        described = [self._describe(file_type) for file_type in types]
+        files = _unique(fname for _, fname in entries)
+
+        if is_simulation:
+            title = f"{version} Simulation Name File: {stem}"
+            summary = (
+                f"{version} simulation name file {Path(filepath).name} that defines the simulation "
+                f"{stem}. It lists {len(entries)} entries of type {_join(types)} "
+                f"({_join(described, 8)}), which refer to the files {_join(files)}."
+            )
+        else:
+            title = f"{version} Model Name File: {stem}"
+            summary = (
+                f"{version} model name file {Path(filepath).name} for the model {stem}. It "
+                f"activates {len(types)} packages and files ({_join(described, 8)}), read from "
+                f"{_join(files)}."
+            )
+        if blocks:
+            summary += f" Blocks: {_join(_unique(blocks))}."
+
+        return build_local_analysis(
+            title=title,
+            summary=summary,
+            key_concepts=[version, "name file", "groundwater model", *described[:7]],
+            potential_questions=[
+                f"Which packages does the {stem} model use?",
+                f"Which input files make up the {stem} {'simulation' if is_simulation else 'model'}?",
+                f"How is the {version} name file {Path(filepath).name} structured?",
+            ],
+            keywords=["MODFLOW", version, "name file", *types, *files[:10]],
+            document_type="configuration",
+            technical_level="intermediate",
+            related_topics=["groundwater modeling", "MODFLOW packages"],
+        )
+
+    @staticmethod
+    def _describe(file_type: str) -> str:
+        """Describe a MODFLOW file type such as DIS6 or BAS6."""
+        base = re.sub(r"\d+$", "", file_type.split("(")[0])
+        return MODFLOW_FILE_TYPES.get(base, f"{file_type} file")
+
+
+class PestControlFileAnalyzer(LocalAnalyzer):
+    """Analyzer of PEST and PEST++ control files (.pst)."""
+
+    name = "pest-control-file"
+    extensions = (".pst",)
+
+    def matches_content(self, content: str) -> bool:
+        return content.lstrip()[:3].lower() == "pcf"
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        lines = content.splitlines()
+        if not lines or not self.matches_content(content):
+            return None
+
+        sections: Dict[str, List[str]] = {}
+        section = None
+        options = []
+        for line in lines[1:]:
+            stripped = line.strip()
+            if stripped.startswith("*"):
+                section = stripped.lstrip("* ").lower()
+                sections.setdefault(section, [])
+            elif stripped.startswith("++"):
+                options.append(stripped[2:].split("(")[0].strip())
+            elif section is not None and stripped:
+                sections[section].append(stripped)
+
+        control = sections.get("control data", [])
+        mode = control[0].split()[1].lower() if control and len(control[0].split()) > 1 else "estimation"
+        counts = control[1].split() if len(control) > 1 else []
+        parameters = [line.split()[0] for line in sections.get("parameter data", [])]
+        groups = [line.split()[0] for line in sections.get("observation groups", [])]
+        commands = sections.get("model command line", [])
+        n_par = counts[0] if counts else str(len(parameters))
+        n_obs = counts[1] if len(counts) > 1 else str(len(sections.get("observation data", [])))
+
+        stem = Path(filepath).stem
+        flavor = "PEST++" if options else "PEST"
+        summary = (
+            f"{flavor} control file {Path(filepath).name} that sets up parameter {mode} for the "
+            f"case {stem}, with {n_par} parameters and {n_obs} observations."
+        )
+        if parameters:
+            summary += f" Parameters include {_join(parameters)}."
+        if groups:
+            summary += f" Observation groups: {_join(groups)}."
+        if commands:
+            summary += f" The model is run with: {commands[0]}."
+        if options:
+            summary += f" PEST++ options: {_join(options)}."
+        summary += f" Sections: {_join(list(sections))}."
+
+        return build_local_analysis(
+            title=f"{flavor} Control File: {stem}",
+            summary=summary,
+            key_concepts=["parameter estimation", f"{mode} mode", "observation groups", "model calibration"],
+            potential_questions=[
+                f"Which parameters are estimated in the {stem} PEST setup?",
+                f"Which observations and observation groups does {Path(filepath).name} define?",
+                f"How is the model run by PEST for {stem}?",
+            ],
+            keywords=[flavor, "PEST", "control file", mode, *parameters[:10], *groups[:5], *options[:5]],
+            document_type="configuration",
+            technical_level="advanced",
+            related_topics=["parameter estimation", "model calibration", "uncertainty analysis"],
+        )
+
+
+class _KeyedConfigAnalyzer(LocalAnalyzer):
+    """Shared description of configuration files from their top-level keys."""
+
+    format_name = ""
+
+    def describe(
+        self, filepath: str, keys: List[str], sections: List[str], details: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """Describe a configuration file.
+
+        Args:
+            filepath: Path of the file relative to the repository root
+            keys: Top-level keys
+            sections: Nested sections or tables
+            details: Optional extra summary sentence
+
+        Returns:
+            Analysis dictionary, or None without any keys
+        """
+        if not keys and not sections:
+            return None
+
+        name = Path(filepath).name
+        summary = f"{self.format_name} configuration file {filepath}."
+        if keys:
+            summary += f" Top-level keys: {_join(keys, 20)}."
+        if sections:
+            summary += f" Sections: {_join(sections, 20)}."
+        if details:
+            summary += f" {details}"
+
+        return build_local_analysis(
+            title=f"{self.format_name} Configuration: {name}",
+            summary=summary,
+            key_concepts=["configuration", f"{self.format_name} format", *keys[:5]],
+            potential_questions=[
+                f"Which settings does {name} configure?",
+                f"What keys are defined in {filepath}?",
+            ],
+            keywords=[self.format_name, "configuration", name, *keys[:15], *sections[:5]],
+            document_type="configuration",
+            technical_level="beginner",
+        )
+
+
+class JsonConfigAnalyzer(_KeyedConfigAnalyzer):
+    """Analyzer of JSON files."""
+
+    name = "json"
+    format_name = "JSON"
+    extensions = (".json",)
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return None
+
+        if isinstance(data, dict):
+            keys = [str(key) for key in data]
+            sections = [key for key, value in data.items() if isinstance(value, (dict, list)) and value]
+            described = [
+                f"{key}: {data[key]}" for key in ("name", "title", "description", "version")
+                if isinstance(data.get(key), str)
+            ]
+            details = f"{'; '.join(described)}." if described else ""
+            return self.describe(filepath, keys, sections, details)
+
+        if isinstance(data, list) and data:
+            keys = _unique(str(key) for item in data[:100] if isinstance(item, dict) for key in item)
+            return self.describe(filepath, keys, [], f"An array of {len(data)} entries.")
+        return None
+
+
+class YamlConfigAnalyzer(_KeyedConfigAnalyzer):
+    """Analyzer of YAML files from their unindented keys."""
+
+    name = "yaml"
+    format_name = "YAML"
+    extensions = (".yml", ".yaml")
+
+    _KEY_PATTERN = re.compile(r"^([A-Za-z_][\w.-]*)\s*:(.*)$")
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        keys = []
+        sections = []
+        name = None
+        for line in content.splitlines():
+            match = self._KEY_PATTERN.match(line)
+            if not match:
+                continue
+            key, value = match.group(1), match.group(2).split(" #", 1)[0].strip()
+            keys.append(key)
+            if not value:
+                sections.append(key)
+            elif key in ("name", "title", "description") and name is None:
+                name = value.strip("'\"")
+        details = f"Name: {name}." if name else ""
+        return self.describe(filepath, _unique(keys), _unique(sections), details)
+
+
+class TomlConfigAnalyzer(_KeyedConfigAnalyzer):
+    """Analyzer of TOML files from their tables and top-level keys."""
+
+    name = "toml"
+    format_name = "TOML"
+    extensions = (".toml",)
+
+    _TABLE_PATTERN = re.compile(r"^\s*\[\[?\s*([^\]]+?)\s*\]\]?\s*(?:#.*)?$")
+    _KEY_PATTERN = re.compile(r"^([A-Za-z0-9_.\"'-]+)\s*=")
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        keys = []
+        tables = []
+        in_table = False
+        for line in content.splitlines():
+            match = self._TABLE_PATTERN.match(line)
+            if match:
+                tables.append(match.group(1))
+                in_table = True
+                continue
+            match = self._KEY_PATTERN.match(line)
+            if match and not in_table:
+                keys.append(match.group(1).strip("\"'"))
+        return self.describe(filepath, _unique(keys), _unique(tables))
+
+
+class StubFileAnalyzer(LocalAnalyzer):
+    """Analyzer of files too small to be worth a model request, such as empty __init__.py files."""
+
+    name = "stub"
+
+    def matches_content(self, content: str) -> bool:
+        return len("".join(content.split())) <= STUB_MAX_CHARS
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        if not self.matches_content(content):
+            return None
+
+        path = PurePosixPath(filepath)
+        language = language_for_filename(path.name)
+        is_code = bool(language) and language not in _TEXT_LANGUAGES
+        text = " ".join(content.split())
+        what = f"{language} " if language else ""
+
+        lines = len(content.splitlines())
+        summary = f"Small {what}file {filepath} with {lines} line{'' if lines == 1 else 's'}."
+        summary += f" Content: {text}" if text else " The file is empty."
+        if path.parent.name:
+            summary += f" It belongs to the {path.parent.name} directory."
+
+        return build_local_analysis(
+            title=f"Stub File: {path.name}",
+            summary=summary,
+            key_concepts=[path.stem, path.parent.name] if path.parent.name else [path.stem],
+            potential_questions=[f"What does {filepath} contain?"],
+            keywords=[path.name, path.stem, language or "", path.parent.name],
+            document_type="code" if is_code else "documentation",
+            technical_level="beginner",
+        )
+
+
+class LocalAnalyzerRegistry:
+    """Registry of local analyzers, looked up by file name, extension and content signature."""
+
+    def __init__(self, analyzers: Optional[Iterable[LocalAnalyzer]] = None):
+        """Initialize the registry.
+
+        Args:
+            analyzers: Analyzers in order of precedence (defaults to the built-in analyzers)
+        """
+        self._analyzers: List[LocalAnalyzer] = []
+        self._by_filename: Dict[str, List[LocalAnalyzer]] = {}
+        self._by_extension: Dict[str, List[LocalAnalyzer]] = {}
+        self.counts: Dict[str, int] = {}
+
+        if analyzers is None:
+            analyzers = (
+                ModflowNameFileAnalyzer(),
+                PestControlFileAnalyzer(),
+                JsonConfigAnalyzer(),
+                YamlConfigAnalyzer(),
+                TomlConfigAnalyzer(),
+                StubFileAnalyzer(),
+            )
+        for analyzer in analyzers:
+            self.register(analyzer)
+
+    def register(self, analyzer: LocalAnalyzer) -> None:
+        """Register an analyzer after the existing ones.
+
+        Args:
+            analyzer: Analyzer to register
+        """
+        self._analyzers.append(analyzer)
+        for filename in analyzer.filenames:
+            self._by_filename.setdefault(filename.lower(), []).append(analyzer)
+        for extension in analyzer.extensions:
+            self._by_extension.setdefault(extension.lower(), []).append(analyzer)
+
+    def candidates(self, filepath: str, content: str) -> List[LocalAnalyzer]:
+        """Get the analyzers that apply to a file, by name, extension and then content.
+
+        Args:
+            filepath: Path of the file relative to the repository root
+            content: File content
+
+        Returns:
+            Matching analyzers in order of precedence
+        """
+        name = PurePosixPath(filepath).name.lower()
+        matched = self._by_filename.get(name, []) + self._by_extension.get(PurePosixPath(name).suffix, [])
+        for analyzer in self._analyzers:
+            if analyzer not in matched and analyzer.matches_content(content):
+                matched.append(analyzer)
+        return matched
+
+    def analyze(self, filepath: str, content: str) -> Optional[Dict[str, Any]]:
+        """Analyze a file with the first matching analyzer that can parse it.
+
+        Args:
+            filepath: Path of the file relative to the repository root
+            content: File content
+
+        Returns:
+            Analysis dictionary, or None if the file needs model analysis
+        """
+        for analyzer in self.candidates(filepath, content):
+            try:
+                analysis = analyzer.analyze(filepath, content)
+            except Exception as e:
+                logger.warning(f"Local analyzer {analyzer.name} failed for {filepath}: {str(e)}")
+                continue
+            if analysis is not None:
+                self.counts[analyzer.name] = self.counts.get(analyzer.name, 0) + 1
+                logger.debug(f"Analyzed {filepath} locally with {analyzer.name}")
+                return analysis
+        return None
+
+
+_default_registry: Optional[LocalAnalyzerRegistry] = None
+
+
+def get_local_analyzer_registry() -> LocalAnalyzerRegistry:
+    """Get the process-wide registry of built-in local analyzers.
+
+    Returns:
+        Shared LocalAnalyzerRegistry instance
+    """
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = LocalAnalyzerRegistry()
+    return _default_registry
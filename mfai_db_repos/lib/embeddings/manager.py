@@ -3,16 +3,30 @@ Embedding manager for coordinating embedding generation across providers.
 Handles batching, parallel processing, and rate limiting.
 """
 import asyncio
-import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
 
 from mfai_db_repos.lib.embeddings.base import EmbeddingConfig, EmbeddingProvider, EmbeddingVector
-from mfai_db_repos.lib.embeddings.google_genai import GoogleGenAIEmbeddingConfig, GoogleGenAIEmbeddingProvider
+from mfai_db_repos.lib.embeddings.cache import AnalysisCache, content_hash
+from mfai_db_repos.lib.embeddings.google_genai import (
+    MAX_README_SUMMARY_INPUT_TOKENS,
+    MAX_README_TOKENS,
+    README_CONTEXT_PROMPT_VERSION,
+    README_CONTEXT_TOKENS,
+    GoogleGenAIEmbeddingConfig,
+    GoogleGenAIEmbeddingProvider,
+    fit_analysis_content,
+)
+from mfai_db_repos.lib.embeddings.microbatch import MicroBatchEmbedder
 from mfai_db_repos.lib.embeddings.openai import OpenAIEmbeddingConfig, OpenAIEmbeddingProvider
+from mfai_db_repos.lib.embeddings.ratelimit import RateLimiter, get_rate_limiter
+from mfai_db_repos.lib.embeddings.routing import AnalysisRoute, AnalysisRoutingPolicy
+from mfai_db_repos.utils.blocking import BlockingCategory, run_blocking
 from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+R = TypeVar('R')  # Result type
+
 
 class ProviderType:
     """Enum-like constants for embedding provider types."""
@@ -33,6 +47,12 @@ class EmbeddingManager:
         max_parallel_requests: int = 5,
         batch_size: int = 20,
         rate_limit_per_minute: int = 100,
+        tokens_per_minute: Optional[int] = None,
+        micro_batch_size: int = 64,
+        micro_batch_tokens: int = 200_000,
+        micro_batch_wait: float = 0.5,
+        cache: Optional[AnalysisCache] = None,
+        routing_policy: Optional[AnalysisRoutingPolicy] = None,
     ):
         """Initialize the embedding manager.
         
@@ -43,13 +63,35 @@ class EmbeddingManager:
             secondary_config: Configuration for secondary provider
             max_parallel_requests: Maximum number of parallel API requests
             batch_size: Number of texts to batch into a single API request
-            rate_limit_per_minute: Maximum number of API requests per minute
+            rate_limit_per_minute: Maximum number of API requests per minute, per provider and model
+            tokens_per_minute: Optional maximum number of tokens per minute, per provider and model
+            micro_batch_size: Maximum texts per request when coalescing single-text calls
+            micro_batch_tokens: Maximum estimated tokens per coalesced request
+            micro_batch_wait: Maximum seconds a text waits for its coalesced request
+            cache: Optional persistent cache consulted before any API call
+            routing_policy: Optional policy choosing the analysis model and prompt per file
+                (defaults to the standard model and full prompt for every file)
         """
         self.max_parallel_requests = max_parallel_requests
         self.batch_size = batch_size
         self.rate_limit_per_minute = rate_limit_per_minute
+        self.tokens_per_minute = tokens_per_minute
         self.request_count = 0
-        self.last_reset = time.time()
+        self.cache = cache
+        self.routing_policy = routing_policy or AnalysisRoutingPolicy(light_model="")
+        
+        # Condensed README contexts by README hash, computed once per repository
+        self._readme_contexts: Dict[str, str] = {}
+        self._readme_lock: Optional[asyncio.Lock] = None
+        
+        # Coalesces concurrent embed_text_batched calls into batch requests
+        self.micro_batcher = MicroBatchEmbedder(
+            self.embed_batch,
+            max_batch_size=micro_batch_size,
+            max_batch_tokens=micro_batch_tokens,
+            max_wait=micro_batch_wait,
+            max_concurrent_requests=max_parallel_requests,
+        )
         
         # Set up the primary provider
         self.primary_provider_type = primary_provider
@@ -97,28 +139,103 @@ class EmbeddingManager:
         else:
             raise ValueError(f"Unsupported embedding provider type: {provider_type}")
     
-    async def _check_rate_limit(self):
-        """Check and enforce rate limiting.
+    def _get_provider(self, use_secondary: bool = False) -> Tuple[str, EmbeddingProvider]:
+        """Get the provider type and instance to use for a request.
+        
+        Args:
+            use_secondary: Whether to use the secondary provider
+            
+        Returns:
+            Tuple of (provider type, provider)
+        """
+        if use_secondary and self.secondary_provider:
+            return self.secondary_provider_type, self.secondary_provider
+        return self.primary_provider_type, self.primary_provider
+    
+    def get_rate_limiter(self, provider_type: str, model: str) -> RateLimiter:
+        """Get the rate limiter shared by all requests to a provider and model.
+        
+        Args:
+            provider_type: Type of provider
+            model: Model name
+            
+        Returns:
+            Shared RateLimiter
+        """
+        return get_rate_limiter(provider_type, model, self.rate_limit_per_minute, self.tokens_per_minute)
+    
+    async def _rate_limited(
+        self,
+        provider_type: str,
+        model: str,
+        func: Callable[[], Awaitable[R]],
+        tokens: int = 0,
+    ) -> R:
+        """Send a request within the provider's rate limits.
         
-        Implements a simple token bucket rate limiter.
+        Args:
+            provider_type: Type of provider
+            model: Model name
+            func: Coroutine function performing the request
+            tokens: Estimated tokens of the request
+            
+        Returns:
+            Result of the request
         """
-        current_time = time.time()
-        time_passed = current_time - self.last_reset
+        self.request_count += 1
+        return await self.get_rate_limiter(provider_type, model).call(func, tokens)
+    
+    async def _get_cached_embedding(self, text: str, provider: EmbeddingProvider) -> Optional[EmbeddingVector]:
+        """Look up an embedding in the cache.
         
-        # Reset counter if a minute has passed
-        if time_passed > 60:
-            self.request_count = 0
-            self.last_reset = current_time
-            return
+        Args:
+            text: Embedded text
+            provider: Provider that would generate the embedding
+            
+        Returns:
+            Cached EmbeddingVector or None
+        """
+        if self.cache is None:
+            return None
         
-        # Check if we've hit the rate limit
-        if self.request_count >= self.rate_limit_per_minute:
-            # Calculate sleep time needed to respect rate limit
-            sleep_time = 60 - time_passed
-            logger.warning(f"Rate limit reached, sleeping for {sleep_time:.2f} seconds")
-            await asyncio.sleep(sleep_time)
-            self.request_count = 0
-            self.last_reset = time.time()
+        # SQLite reads block, so they run on the disk pool
+        vector = await run_blocking(
+            BlockingCategory.DISK, self.cache.get_embedding, content_hash(text), provider.config.model
+        )
+        if vector is None:
+            return None
+        return EmbeddingVector(vector=vector, model=provider.config.model)
+    
+    async def _put_cached_embedding(self, text: str, embedding: EmbeddingVector) -> None:
+        """Store an embedding in the cache.
+        
+        Args:
+            text: Embedded text
+            embedding: Generated embedding
+        """
+        if self.cache is not None:
+            await run_blocking(
+                BlockingCategory.DISK,
+                self.cache.put_embedding,
+                content_hash(text),
+                embedding.model,
+                list(embedding.vector),
+            )
+    
+    def _fit_input(self, text: str, provider: EmbeddingProvider) -> Tuple[str, int]:
+        """Truncate a text to a provider's per-input limit and count its tokens.
+        
+        Args:
+            text: Text to embed
+            provider: Provider the text is sent to
+            
+        Returns:
+            Tuple of (the text or its longest prefix the model accepts, its token count)
+        """
+        fitted, tokens = provider.token_budget.fit(text)
+        if len(fitted) < len(text):
+            logger.warning(f"Text truncated from {len(text)} to {len(fitted)} characters for {provider.config.model}")
+        return fitted, tokens
     
     async def embed_text(self, text: str, use_secondary: bool = False) -> EmbeddingVector:
         """Generate an embedding for a single text input.
@@ -130,11 +247,19 @@ class EmbeddingManager:
         Returns:
             EmbeddingVector with the generated embedding
         """
-        await self._check_rate_limit()
-        self.request_count += 1
+        provider_type, provider = self._get_provider(use_secondary)
+        
+        cached = await self._get_cached_embedding(text, provider)
+        if cached is not None:
+            return cached
         
-        provider = self.secondary_provider if use_secondary and self.secondary_provider else self.primary_provider
-        return await provider.embed_text(text)
+        await provider.token_budget.load()
+        fitted, tokens = self._fit_input(text, provider)
+        embedding = await self._rate_limited(
+            provider_type, provider.config.model, lambda: provider.embed_text(fitted), tokens
+        )
+        await self._put_cached_embedding(text, embedding)
+        return embedding
     
     async def embed_batch(self, texts: List[str], use_secondary: bool = False) -> List[EmbeddingVector]:
         """Generate embeddings for a batch of text inputs.
@@ -149,11 +274,51 @@ class EmbeddingManager:
         if not texts:
             return []
         
-        await self._check_rate_limit()
-        self.request_count += 1
+        provider_type, provider = self._get_provider(use_secondary)
+        await provider.token_budget.load()
+        
+        # Truncate each text to the model's input limit and pack requests up to its request limit
+        fitted, batches, batch_tokens = provider.token_budget.pack_with_counts(texts)
+        
+        async def send(indices: List[int], tokens: int) -> List[EmbeddingVector]:
+            batch = [fitted[i] for i in indices]
+            vectors = await self._rate_limited(
+                provider_type,
+                provider.config.model,
+                lambda: provider.embed_batch(batch),
+                tokens,
+            )
+            if len(vectors) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+            return vectors
         
-        provider = self.secondary_provider if use_secondary and self.secondary_provider else self.primary_provider
-        return await provider.embed_batch(texts)
+        if len(batches) == 1:
+            return await send(batches[0], batch_tokens[0])
+        
+        results = []
+        for batch_result in await asyncio.gather(*(send(*batch) for batch in zip(batches, batch_tokens, strict=True))):
+            results.extend(batch_result)
+        return results
+    
+    async def embed_text_batched(self, text: str) -> EmbeddingVector:
+        """Generate an embedding for a single text, batched with concurrent callers.
+        
+        Texts submitted by concurrent tasks are sent together in one request to the
+        primary provider, trading a short delay for far fewer API requests.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            EmbeddingVector with the generated embedding
+        """
+        cached = await self._get_cached_embedding(text, self.primary_provider)
+        if cached is not None:
+            return cached
+        
+        embedding = await self.micro_batcher.embed(text)
+        await self._put_cached_embedding(text, embedding)
+        return embedding
     
     async def embed_texts_parallel(self, texts: List[str], use_secondary: bool = False) -> List[EmbeddingVector]:
         """Generate embeddings for multiple texts in parallel batches.
@@ -168,22 +333,31 @@ class EmbeddingManager:
         if not texts:
             return []
         
-        # Prepare batches
-        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        provider_type, provider = self._get_provider(use_secondary)
+        await provider.token_budget.load()
+        
+        # Prepare batches of at most batch_size texts within the model's request token limit
+        fitted, packed, batch_tokens = provider.token_budget.pack_with_counts(texts, max_batch_size=self.batch_size)
+        batches = [[fitted[i] for i in indices] for indices in packed]
         logger.info(f"Processing {len(texts)} texts in {len(batches)} batches")
         
         # Process batches with concurrency limit
         semaphore = asyncio.Semaphore(self.max_parallel_requests)
-        provider = self.secondary_provider if use_secondary and self.secondary_provider else self.primary_provider
         
-        async def process_batch(batch):
+        async def process_batch(batch, tokens):
             async with semaphore:
-                await self._check_rate_limit()
-                self.request_count += 1
-                return await provider.embed_batch(batch)
+                vectors = await self._rate_limited(
+                    provider_type,
+                    provider.config.model,
+                    lambda: provider.embed_batch(batch),
+                    tokens,
+                )
+            if len(vectors) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+            return vectors
         
         # Process all batches and gather results
-        tasks = [process_batch(batch) for batch in batches]
+        tasks = [process_batch(batch, tokens) for batch, tokens in zip(batches, batch_tokens, strict=True)]
         batch_results = await asyncio.gather(*tasks)
         
         # Flatten results
@@ -209,35 +383,199 @@ class EmbeddingManager:
         Returns:
             EmbeddingVector with the generated embedding
         """
-        await self._check_rate_limit()
-        self.request_count += 1
+        provider_type, provider = self._get_provider(use_secondary)
+        await provider.token_budget.load()
+        fitted, tokens = self._fit_input(content, provider)
+        return await self._rate_limited(
+            provider_type,
+            provider.config.model,
+            lambda: provider.embed_file_content(fitted, metadata),
+            tokens,
+        )
+    
+    def _get_analysis_provider(self) -> Optional[GoogleGenAIEmbeddingProvider]:
+        """Get the Google GenAI provider used for structured analysis.
+        
+        Returns:
+            GoogleGenAIEmbeddingProvider or None if neither provider is one
+        """
+        provider = None
+        if self.primary_provider_type == ProviderType.GOOGLE_GENAI:
+            provider = self.primary_provider
+        elif self.secondary_provider_type == ProviderType.GOOGLE_GENAI:
+            provider = self.secondary_provider
+        return provider if isinstance(provider, GoogleGenAIEmbeddingProvider) else None
+    
+    def route_analysis(self, filepath: str, content_length: int, repo_name: Optional[str] = None) -> AnalysisRoute:
+        """Choose the analysis model and prompt variant of a file.
+        
+        Args:
+            filepath: Path of the file relative to the repository root
+            content_length: Characters of the content sent for analysis
+            repo_name: Optional repository name, for per-repository overrides
+            
+        Returns:
+            AnalysisRoute to pass to analyze_file_content
+        """
+        return self.routing_policy.route(filepath, content_length, repo_name)
+    
+    async def get_readme_context(self, readme_content: Optional[str], repo_name: str = "") -> Optional[str]:
+        """Condense a README into the repository context sent with every file analysis.
+        
+        The context is generated once per README content and reused by all
+        analyses of the repository, from memory and from the persistent cache.
+        Short READMEs, and READMEs that cannot be condensed, are used as they are.
+        
+        Args:
+            readme_content: Optional README content
+            repo_name: Repository name (for logging)
+            
+        Returns:
+            Repository context to pass to analyze_file_content, or None without a README
+        """
+        if not readme_content:
+            return readme_content
+        
+        provider = self._get_analysis_provider()
+        if provider is None:
+            return readme_content
+        await provider.analysis_budget.load()
+        if provider.analysis_budget.count(readme_content) <= README_CONTEXT_TOKENS:
+            return readme_content
         
-        provider = self.secondary_provider if use_secondary and self.secondary_provider else self.primary_provider
-        return await provider.embed_file_content(content, metadata)
+        if self._readme_lock is None:
+            self._readme_lock = asyncio.Lock()
+        
+        readme_digest = content_hash(readme_content)
+        model = self.routing_policy.standard_model
+        async with self._readme_lock:
+            context = self._readme_contexts.get(readme_digest)
+            if context is not None:
+                return context
+            
+            if self.cache is not None:
+                context = await run_blocking(
+                    BlockingCategory.DISK,
+                    self.cache.get_readme_context,
+                    readme_digest,
+                    model,
+                    README_CONTEXT_PROMPT_VERSION,
+                )
+            
+            if context is None:
+                try:
+                    await provider.get_analysis_budget(model).load()
+                    context = await self._rate_limited(
+                        ProviderType.GOOGLE_GENAI,
+                        model,
+                        lambda: provider.generate_readme_context(readme_content, model),
+                        min(provider.get_analysis_budget(model).count(readme_content), MAX_README_SUMMARY_INPUT_TOKENS),
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to condense README of {repo_name or 'repository'}, using it as is: {str(e)}")
+                    return readme_content
+                
+                if self.cache is not None:
+                    await run_blocking(
+                        BlockingCategory.DISK,
+                        self.cache.put_readme_context,
+                        readme_digest,
+                        model,
+                        README_CONTEXT_PROMPT_VERSION,
+                        context,
+                    )
+                logger.info(
+                    f"Condensed README of {repo_name or 'repository'} from {len(readme_content)} "
+                    f"to {len(context)} characters of context"
+                )
+            
+            self._readme_contexts[readme_digest] = context
+            return context
     
-    async def analyze_file_content(self, content: str, readme_content: Optional[str] = None) -> Dict[str, Any]:
+    async def _fit_analysis_input(
+        self,
+        provider: GoogleGenAIEmbeddingProvider,
+        model: str,
+        content: str,
+        readme_content: Optional[str] = None,
+    ) -> Tuple[str, int, int]:
+        """Cap the content of an analysis request and count the tokens it is charged for.
+        
+        The content is tokenized once, in a worker thread; the count charges the
+        rate limiter and spares the prompt builder a second tokenization.
+        
+        Args:
+            provider: Google GenAI provider sending the request
+            model: Analysis model
+            content: File content to analyze
+            readme_content: Optional repository context
+            
+        Returns:
+            Tuple of (capped content, its tokens, tokens of the content and README
+            within their prompt caps)
+        """
+        budget = provider.get_analysis_budget(model)
+        await budget.load()
+        
+        def fit() -> Tuple[str, int, int]:
+            fitted, content_tokens = fit_analysis_content(content, budget)
+            tokens = content_tokens
+            if readme_content:
+                tokens += min(budget.count(readme_content), MAX_README_TOKENS)
+            return fitted, content_tokens, tokens
+        
+        return await run_blocking(BlockingCategory.DISK, fit)
+    
+    async def analyze_file_content(
+        self,
+        content: str,
+        readme_content: Optional[str] = None,
+        route: Optional[AnalysisRoute] = None,
+    ) -> Dict[str, Any]:
         """Generate a structured analysis of file content using Gemini model if available.
         
         Args:
             content: File content to analyze
-            readme_content: Optional README content to provide context
+            readme_content: Optional README content to provide context (ideally condensed
+                once per repository with get_readme_context)
+            route: Optional model and prompt variant from route_analysis (defaults to the
+                standard model and full prompt)
             
         Returns:
             Dictionary containing structured analysis of the content
         """
         # Only use Google GenAI provider for structured analysis
-        provider = None
-        if self.primary_provider_type == ProviderType.GOOGLE_GENAI:
-            provider = self.primary_provider
-        elif self.secondary_provider_type == ProviderType.GOOGLE_GENAI:
-            provider = self.secondary_provider
+        provider = self._get_analysis_provider()
         
-        if provider and isinstance(provider, GoogleGenAIEmbeddingProvider):
-            await self._check_rate_limit()
-            self.request_count += 1
+        if provider is not None:
+            route = route or self.routing_policy.standard
+            cache_key = None
+            if self.cache is not None:
+                cache_key = (
+                    content_hash(content),
+                    content_hash(readme_content),
+                    route.model,
+                    route.prompt_version,
+                )
+                cached = await run_blocking(BlockingCategory.DISK, self.cache.get_analysis, *cache_key)
+                if cached is not None:
+                    return cached
             
-            analysis = await provider.generate_structured_analysis(content, readme_content)
-            return analysis.model_dump()
+            fitted, content_tokens, tokens = await self._fit_analysis_input(
+                provider, route.model, content, readme_content
+            )
+            response = await self._rate_limited(
+                ProviderType.GOOGLE_GENAI,
+                route.model,
+                lambda: provider.generate_structured_analysis(
+                    fitted, readme_content, route.model, route.variant, content_tokens
+                ),
+                tokens,
+            )
+            analysis = response.model_dump()
+            if cache_key is not None:
+                await run_blocking(BlockingCategory.DISK, self.cache.put_analysis, *cache_key, analysis)
+            return analysis
         else:
             logger.warning("Structured analysis requested but no Google GenAI provider available")
             return {
@@ -245,4 +583,13 @@ class EmbeddingManager:
                 "summary": "Google GenAI provider not configured for structured analysis",
                 "key_concepts": [],
                 "keywords": []
-            }
\ No newline at end of file
+            }
+    
+    async def close(self) -> None:
+        """Close the analysis cache, if any.
+        
+        The manager can still send requests afterwards, without the cache.
+        """
+        if self.cache is not None:
+            cache, self.cache = self.cache, None
+            await run_blocking(BlockingCategory.DISK, cache.close)
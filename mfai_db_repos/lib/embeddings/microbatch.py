@@ -0,0 +1,143 @@
+"""
+Micro-batching for embedding requests.
+Coalesces single-text embedding calls from concurrent tasks into batch requests.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from mfai_db_repos.lib.embeddings.base import EmbeddingVector
+from mfai_db_repos.lib.embeddings.ratelimit import get_retry_after
+from mfai_db_repos.lib.embeddings.tokens import estimate_text_tokens
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MicroBatchEmbedder:
+    """Collects texts from concurrent callers and embeds them in batch requests.
+
+    A batch is sent when it reaches the size or token budget, or when the oldest
+    waiting text has waited for the maximum delay. Each caller receives its own vector.
+    A failed batch is re-sent in halves, so only the callers whose texts still fail
+    on their own receive the error.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], Awaitable[List[EmbeddingVector]]],
+        max_batch_size: int = 64,
+        max_batch_tokens: int = 200_000,
+        max_wait: float = 0.5,
+        max_concurrent_requests: int = 5,
+    ):
+        """Initialize the micro-batching embedder.
+
+        Args:
+            embed_batch: Coroutine function embedding a list of texts in one request
+            max_batch_size: Maximum number of texts per request
+            max_batch_tokens: Maximum estimated tokens per request
+            max_wait: Maximum seconds a text waits before its batch is sent
+            max_concurrent_requests: Maximum number of batch requests in flight
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait
+        self.max_concurrent_requests = max_concurrent_requests
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: set = set()
+
+        # Statistics
+        self.request_count = 0
+        self.text_count = 0
+
+    async def embed(self, text: str) -> EmbeddingVector:
+        """Embed a single text as part of the next batch request.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            EmbeddingVector for the text
+        """
+        loop = asyncio.get_running_loop()
+        tokens = estimate_text_tokens(text)
+
+        # Send what is pending first if this text would exceed the token budget
+        if self._pending and self._pending_tokens + tokens > self.max_batch_tokens:
+            self._flush()
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_batch_size or self._pending_tokens >= self.max_batch_tokens:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    async def flush(self) -> None:
+        """Send any pending texts and wait for all in-flight requests."""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def _flush(self) -> None:
+        """Send the pending texts as one batch request."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = []
+        self._pending_tokens = 0
+
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Embed a batch and fan the vectors out to the waiting callers.
+
+        Args:
+            batch: List of (text, future) pairs
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        texts = [text for text, _ in batch]
+        try:
+            async with self._semaphore:
+                vectors = await self.embed_batch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            # Rate limit errors were already retried by the limiter and would hit
+            # the halves too; other errors may come from a single bad text
+            if len(batch) > 1 and get_retry_after(e) is None:
+                logger.warning(f"Embedding request for {len(batch)} texts failed, retrying in halves: {str(e)}")
+                middle = len(batch) // 2
+                await asyncio.gather(self._send(batch[:middle]), self._send(batch[middle:]))
+                return
+
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.request_count += 1
+        self.text_count += len(texts)
+        logger.debug(f"Embedded {len(texts)} texts in one request")
+
+        for (_, future), vector in zip(batch, vectors, strict=True):
+            if not future.done():
+                future.set_result(vector)
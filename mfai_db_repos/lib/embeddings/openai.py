@@ -48,7 +48,7 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
         """Generate an embedding for a single text input.
         
         Args:
-            text: Text to embed
+            text: Text to embed, within the model's input limit (see TokenBudget.fit)
             
         Returns:
             EmbeddingVector with the generated embedding
@@ -70,7 +70,7 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
         """Generate embeddings for a batch of text inputs.
         
         Args:
-            texts: List of texts to embed
+            texts: List of texts to embed, each within the model's input limit (see TokenBudget.pack)
             
         Returns:
             List of EmbeddingVector objects
@@ -102,17 +102,11 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
         """Generate an embedding for file content.
         
         Args:
-            content: File content to embed
+            content: File content to embed, within the model's input limit (see TokenBudget.fit)
             metadata: Optional metadata about the file
             
         Returns:
             EmbeddingVector with the generated embedding
         """
-        # For OpenAI, we simply embed the content directly
-        # Truncate content if it's too long (OpenAI has token limits)
-        max_chars = 60000  # Approximate limit to stay within token limits
-        if len(content) > max_chars:
-            logger.warning(f"File content truncated from {len(content)} to {max_chars} characters for embedding")
-            content = content[:max_chars]
-            
+        # The content is embedded directly, truncated to the model's token limit
         return await self.embed_text(content)
\ No newline at end of file
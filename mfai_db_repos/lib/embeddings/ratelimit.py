@@ -0,0 +1,231 @@
+"""
+Async rate limiting for API requests.
+Provides a GCRA (generic cell rate algorithm) limiter with separate request and
+token budgets, shared per provider and model, that backs off on 429 responses.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+R = TypeVar('R')  # Result type
+
+# Seconds of budget that may be spent at once after an idle period
+DEFAULT_BURST_SECONDS = 5.0
+
+# Pause applied after a 429 response without a Retry-After header
+DEFAULT_RETRY_AFTER = 10.0
+
+# Limiters shared by every caller of the same provider and model
+_limiters: Dict[Tuple[str, str], "RateLimiter"] = {}
+
+
+class _Budget:
+    """GCRA state of a single per-minute budget."""
+
+    def __init__(self, per_minute: int, burst_seconds: float):
+        """Initialize a budget.
+
+        Args:
+            per_minute: Units allowed per minute
+            burst_seconds: Seconds of budget that may be spent at once
+        """
+        self.interval = 60.0 / per_minute  # Seconds per unit
+        self.tolerance = max(burst_seconds, self.interval)
+        self.tat = 0.0  # Theoretical arrival time of the next unit
+
+    def reserve(self, now: float, cost: float) -> float:
+        """Reserve units and get the time at which they may be used.
+
+        Args:
+            now: Current monotonic time
+            cost: Number of units
+
+        Returns:
+            Monotonic time at which the units are available
+        """
+        tat = max(self.tat, now)
+        self.tat = tat + cost * self.interval
+        return self.tat - self.tolerance
+
+
+class RateLimiter:
+    """Async limiter with request-per-minute and token-per-minute budgets.
+
+    Callers reserve capacity in arrival order and sleep only until their own slot,
+    so concurrent tasks are spread evenly instead of bursting and then stalling.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        burst_seconds: float = DEFAULT_BURST_SECONDS,
+        name: str = "",
+    ):
+        """Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: Optional maximum number of requests per minute
+            tokens_per_minute: Optional maximum number of tokens per minute
+            burst_seconds: Seconds of budget that may be spent at once after an idle period
+            name: Name used in log messages
+        """
+        self.name = name
+        self.burst_seconds = burst_seconds
+        self.requests: Optional[_Budget] = None
+        self.tokens: Optional[_Budget] = None
+        self.blocked_until = 0.0
+        self.configure(requests_per_minute, tokens_per_minute)
+
+        # Statistics
+        self.wait_seconds = 0.0
+        self.throttled_count = 0
+
+    def configure(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None) -> None:
+        """Set the budgets, keeping the state of budgets whose limit is unchanged.
+
+        Args:
+            requests_per_minute: Optional maximum number of requests per minute
+            tokens_per_minute: Optional maximum number of tokens per minute
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = self._budget(self.requests, requests_per_minute)
+        self.tokens = self._budget(self.tokens, tokens_per_minute)
+
+    def _budget(self, current: Optional[_Budget], per_minute: Optional[int]) -> Optional[_Budget]:
+        """Create a budget unless the current one already has the given limit.
+
+        Args:
+            current: Current budget
+            per_minute: Units allowed per minute
+
+        Returns:
+            Budget or None if unlimited
+        """
+        if not per_minute or per_minute <= 0:
+            return None
+        if current is not None and abs(current.interval - 60.0 / per_minute) < 1e-12:
+            return current
+        return _Budget(per_minute, self.burst_seconds)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until a request with the given token count may be sent.
+
+        Args:
+            tokens: Estimated tokens of the request
+        """
+        now = time.monotonic()
+        ready = max(now, self.blocked_until)
+
+        # Reservation happens without awaiting, so it is atomic within the event loop
+        if self.requests is not None:
+            ready = max(ready, self.requests.reserve(now, 1))
+        if self.tokens is not None and tokens > 0:
+            ready = max(ready, self.tokens.reserve(now, tokens))
+
+        delay = ready - now
+        if delay > 0:
+            self.wait_seconds += delay
+            if delay > 1:
+                logger.debug(f"Rate limiter {self.name} waiting {delay:.2f} seconds")
+            await asyncio.sleep(delay)
+
+    def penalize(self, seconds: float) -> None:
+        """Pause all requests after the provider reported a rate limit error.
+
+        Args:
+            seconds: Seconds to pause (e.g. from a Retry-After header)
+        """
+        self.throttled_count += 1
+        until = time.monotonic() + seconds
+        if until > self.blocked_until:
+            self.blocked_until = until
+            logger.warning(f"Rate limited by {self.name or 'provider'}, pausing requests for {seconds:.1f} seconds")
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[R]],
+        tokens: int = 0,
+        max_retries: int = 3,
+    ) -> R:
+        """Call an API function within the budgets, retrying on rate limit errors.
+
+        Args:
+            func: Coroutine function performing one request
+            tokens: Estimated tokens of the request
+            max_retries: Maximum number of retries after rate limit errors
+
+        Returns:
+            Result of the function
+        """
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            try:
+                return await func()
+            except Exception as e:
+                retry_after = get_retry_after(e)
+                if retry_after is None or attempt >= max_retries:
+                    raise
+                attempt += 1
+                self.penalize(retry_after)
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Get the pause requested by a rate limit error.
+
+    Args:
+        error: Exception raised by an API client
+
+    Returns:
+        Seconds to wait, or None if the error is not a rate limit error
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status != 429:
+        return None
+
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass  # HTTP-date values fall back to the default pause
+
+    return DEFAULT_RETRY_AFTER
+
+
+def get_rate_limiter(
+    provider: str,
+    model: str,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+) -> RateLimiter:
+    """Get the limiter shared by all callers of a provider and model.
+
+    Args:
+        provider: Provider name
+        model: Model name
+        requests_per_minute: Optional maximum number of requests per minute
+        tokens_per_minute: Optional maximum number of tokens per minute
+
+    Returns:
+        Shared RateLimiter (its budgets are updated to the given limits)
+    """
+    key = (provider, model)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute, name=f"{provider}/{model}")
+        _limiters[key] = limiter
+    else:
+        limiter.configure(requests_per_minute, tokens_per_minute)
+    return limiter
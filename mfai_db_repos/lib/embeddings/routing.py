@@ -0,0 +1,145 @@
+"""
+Analysis model routing.
+
+Not every file deserves the same analysis: a short script or a data table is
+described as well by a cheaper, faster model with a shorter prompt as by the
+standard model with the full prompt. This module decides per file which model
+and prompt variant analyze it, from the size of the content, the category of
+the file and per-repository overrides.
+"""
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Dict, FrozenSet, List, Optional
+
+from mfai_db_repos.lib.embeddings.google_genai import (
+    ANALYSIS_MODEL,
+    AnalysisPromptVariant,
+    get_analysis_prompt_version,
+)
+from mfai_db_repos.lib.file_processor.filter import FileTypeDetector
+from mfai_db_repos.utils.env import get_env, get_int_env
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Cheaper, faster model of the light tier
+LIGHT_ANALYSIS_MODEL = "gemini-2.0-flash-lite"
+
+
+class AnalysisTier:
+    """Enum-like constants for the analysis tiers."""
+
+    STANDARD = "standard"  # Standard model with the full prompt
+    LIGHT = "light"  # Light model with the brief prompt
+
+
+# File categories (from FileTypeDetector) analyzed in the light tier at any size;
+# scripts and configuration often carry model setups, so only data is light by default
+DEFAULT_LIGHT_CATEGORIES = frozenset({"data"})
+
+
+@dataclass(frozen=True)
+class AnalysisRoute:
+    """Model and prompt variant chosen to analyze a file."""
+
+    tier: str
+    model: str
+    variant: str
+
+    @property
+    def prompt_version(self) -> str:
+        """Prompt version recorded with analyses of this route."""
+        return get_analysis_prompt_version(self.variant)
+
+
+@dataclass
+class AnalysisRoutingPolicy:
+    """Route files to analysis tiers by size, category and repository."""
+
+    standard_model: str = ANALYSIS_MODEL
+    light_model: str = LIGHT_ANALYSIS_MODEL
+    light_max_chars: int = 2000  # Content up to this size goes to the light tier, 0 disables
+    light_categories: FrozenSet[str] = DEFAULT_LIGHT_CATEGORIES
+    repo_tiers: Dict[str, str] = field(default_factory=dict)  # Repository name -> forced tier
+    detector: FileTypeDetector = field(default_factory=FileTypeDetector, repr=False)
+    counts: Dict[str, int] = field(default_factory=dict, repr=False)  # Files routed per tier
+
+    @property
+    def standard(self) -> AnalysisRoute:
+        """Route of the standard tier."""
+        return AnalysisRoute(AnalysisTier.STANDARD, self.standard_model, AnalysisPromptVariant.FULL)
+
+    @property
+    def light(self) -> AnalysisRoute:
+        """Route of the light tier."""
+        return AnalysisRoute(AnalysisTier.LIGHT, self.light_model, AnalysisPromptVariant.BRIEF)
+
+    @property
+    def routes(self) -> List[AnalysisRoute]:
+        """Distinct routes files can get, the standard route first."""
+        routes = [self.standard]
+        if self.light_model and self.light != self.standard:
+            routes.append(self.light)
+        return routes
+
+    def route(self, filepath: str, content_length: int, repo_name: Optional[str] = None) -> AnalysisRoute:
+        """Choose the analysis route of a file.
+
+        Args:
+            filepath: Path of the file relative to the repository root
+            content_length: Characters of the content sent for analysis
+            repo_name: Optional repository name, for per-repository overrides
+
+        Returns:
+            AnalysisRoute of the file
+        """
+        route = self.light if self._is_light(filepath, content_length, repo_name) else self.standard
+        self.counts[route.tier] = self.counts.get(route.tier, 0) + 1
+        return route
+
+    def _is_light(self, filepath: str, content_length: int, repo_name: Optional[str]) -> bool:
+        """Check whether a file belongs to the light tier."""
+        forced = self.repo_tiers.get(repo_name) if repo_name else None
+        if forced is not None:
+            return forced == AnalysisTier.LIGHT and bool(self.light_model)
+        if not self.light_model:
+            return False
+        if content_length <= self.light_max_chars:
+            return True
+        return self.detector.detect_file_type(PurePosixPath(filepath)) in self.light_categories
+
+    @classmethod
+    def from_env(
+        cls, standard_model: Optional[str] = None, light_model: Optional[str] = None
+    ) -> "AnalysisRoutingPolicy":
+        """Create a policy with thresholds from the environment.
+
+        Args:
+            standard_model: Standard analysis model (defaults to ANALYSIS_MODEL)
+            light_model: Light analysis model (defaults to LIGHT_ANALYSIS_MODEL, empty disables the tier)
+
+        Returns:
+            AnalysisRoutingPolicy configured by ANALYSIS_LIGHT_MAX_CHARS, ANALYSIS_LIGHT_CATEGORIES
+            and ANALYSIS_REPO_TIERS ("repo=light,other=standard")
+        """
+        categories = get_env("ANALYSIS_LIGHT_CATEGORIES")
+        repo_tiers = {}
+        for entry in (get_env("ANALYSIS_REPO_TIERS") or "").split(","):
+            name, _, tier = entry.partition("=")
+            if not name.strip():
+                continue
+            if tier.strip() not in (AnalysisTier.STANDARD, AnalysisTier.LIGHT):
+                logger.warning(f"Ignoring analysis tier override {entry.strip()!r}")
+                continue
+            repo_tiers[name.strip()] = tier.strip()
+
+        return cls(
+            standard_model=standard_model or ANALYSIS_MODEL,
+            light_model=LIGHT_ANALYSIS_MODEL if light_model is None else light_model,
+            light_max_chars=get_int_env("ANALYSIS_LIGHT_MAX_CHARS", 2000),
+            light_categories=(
+                frozenset(c.strip() for c in categories.split(",") if c.strip())
+                if categories is not None else DEFAULT_LIGHT_CATEGORIES
+            ),
+            repo_tiers=repo_tiers,
+        )
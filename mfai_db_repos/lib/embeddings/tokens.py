@@ -0,0 +1,359 @@
+"""
+Token budgets for embedding and analysis requests.
+
+This module counts tokens with a local BPE vocabulary (tiktoken, cached on disk
+after the first download and loaded on first use) and falls back to a fast
+estimator when the vocabulary is not available. Texts are truncated to the per-input limit of a
+model and batches are packed up to its per-request limit, so requests are not
+rejected as too long and each call carries as many texts as allowed.
+"""
+import math
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from mfai_db_repos.utils.blocking import BlockingCategory, run_blocking
+from mfai_db_repos.utils.env import get_env
+from mfai_db_repos.utils.logger import get_logger
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+logger = get_logger(__name__)
+
+# Vocabulary used to approximate models without a tiktoken encoding (e.g. Gemini)
+APPROXIMATE_ENCODING = "cl100k_base"
+
+# Share of a limit used when tokens are counted approximately
+APPROXIMATE_MARGIN = 0.9
+
+# Pre-tokenizer pieces of the estimator: words with a leading space, short
+# numbers, whitespace runs and single other characters
+_PIECE_PATTERN = re.compile(r" ?[A-Za-z]+| ?[0-9]{1,3}|\s+|[^\sA-Za-z0-9]")
+
+# Texts longer than this are estimated from evenly spaced samples
+_ESTIMATE_SAMPLE_CHARS = 2048
+_ESTIMATE_SAMPLES = 16
+
+# Guards TIKTOKEN_CACHE_DIR while a vocabulary loads
+_CACHE_DIR_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ModelTokenLimits:
+    """Token limits of a model."""
+
+    max_input_tokens: int  # Tokens per input text
+    max_request_tokens: int  # Tokens of all texts in one request
+    max_batch_size: int  # Texts per request
+
+
+MODEL_TOKEN_LIMITS: Dict[str, ModelTokenLimits] = {
+    "text-embedding-ada-002": ModelTokenLimits(8191, 300_000, 2048),
+    "text-embedding-3-small": ModelTokenLimits(8191, 300_000, 2048),
+    "text-embedding-3-large": ModelTokenLimits(8191, 300_000, 2048),
+    "text-embedding-004": ModelTokenLimits(2048, 204_800, 100),
+    "gemini-embedding-001": ModelTokenLimits(2048, 204_800, 100),
+    "gemini-2.0-flash": ModelTokenLimits(1_048_576, 1_048_576, 1),
+    "gemini-2.0-flash-lite": ModelTokenLimits(1_048_576, 1_048_576, 1),
+    "gemini-2.5-flash": ModelTokenLimits(1_048_576, 1_048_576, 1),
+    "gemini-2.5-pro": ModelTokenLimits(1_048_576, 1_048_576, 1),
+}
+
+# Limits assumed for unknown models
+DEFAULT_TOKEN_LIMITS = ModelTokenLimits(2048, 204_800, 100)
+
+# Limits assumed for unknown Gemini generation models (e.g. gemini-1.5-*, previews)
+DEFAULT_GEMINI_TOKEN_LIMITS = ModelTokenLimits(1_048_576, 1_048_576, 1)
+
+
+def get_model_limits(model: str) -> ModelTokenLimits:
+    """Get the token limits of a model.
+
+    Args:
+        model: Model name, optionally with a "models/" prefix
+
+    Returns:
+        ModelTokenLimits of the model, or defaults if unknown (the context window
+        of Gemini generation models, conservative embedding limits otherwise)
+    """
+    name = model.split("/")[-1]
+    limits = MODEL_TOKEN_LIMITS.get(name)
+    if limits is not None:
+        return limits
+    if name.startswith("gemini-") and "embedding" not in name:
+        return DEFAULT_GEMINI_TOKEN_LIMITS
+    return DEFAULT_TOKEN_LIMITS
+
+
+def _count_pieces(text: str) -> int:
+    """Estimate tokens from pre-tokenizer pieces, one token per four letters.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Estimated token count
+    """
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        tokens += (len(piece) + 3) // 4 if piece[-1].isalpha() else 1
+    return tokens
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text without a vocabulary.
+
+    Letters count as one token per four, digits per three and every other
+    character as one token, which errs on the high side for prose and code and
+    stays close for dense text such as base64. Long texts are estimated from
+    evenly spaced samples.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Estimated token count
+    """
+    length = len(text)
+    if length <= _ESTIMATE_SAMPLE_CHARS * _ESTIMATE_SAMPLES:
+        return _count_pieces(text)
+
+    step = length // _ESTIMATE_SAMPLES
+    sampled = sum(
+        _count_pieces(text[start:start + _ESTIMATE_SAMPLE_CHARS])
+        for start in range(0, step * _ESTIMATE_SAMPLES, step)
+    )
+    return math.ceil(length * sampled / (_ESTIMATE_SAMPLE_CHARS * _ESTIMATE_SAMPLES))
+
+
+@contextmanager
+def _tiktoken_cache_dir() -> Iterator[None]:
+    """Point tiktoken's download cache at TOKENIZER_CACHE_PATH while loading.
+
+    tiktoken reads TIKTOKEN_CACHE_DIR from the environment when it loads a
+    vocabulary, so the variable is set for the duration of the load and then
+    restored. Loads are serialized so concurrent loads never see each other's
+    setting.
+    """
+    cache_dir = get_env("TOKENIZER_CACHE_PATH")
+    with _CACHE_DIR_LOCK:
+        if not cache_dir:
+            yield
+            return
+
+        previous = os.environ.get("TIKTOKEN_CACHE_DIR")
+        os.environ["TIKTOKEN_CACHE_DIR"] = os.path.expanduser(cache_dir)
+        try:
+            yield
+        finally:
+            if previous is None:
+                os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+            else:
+                os.environ["TIKTOKEN_CACHE_DIR"] = previous
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model: str) -> Tuple[Optional["tiktoken.Encoding"], bool]:
+    """Load the BPE vocabulary of a model.
+
+    tiktoken downloads the vocabulary once into TOKENIZER_CACHE_PATH and reads
+    it from there on later runs.
+
+    Args:
+        model: Model name
+
+    Returns:
+        Tuple of (encoding or None, whether the encoding is the model's own)
+    """
+    if tiktoken is None:
+        return None, False
+
+    try:
+        encoding_name, exact = tiktoken.encoding_name_for_model(model), True
+    except KeyError:
+        encoding_name, exact = APPROXIMATE_ENCODING, False
+
+    try:
+        with _tiktoken_cache_dir():
+            encoding = tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"Tokenizer vocabulary unavailable for {model}, estimating tokens: {e}")
+        return None, False
+
+    return encoding, exact
+
+
+class TokenBudget:
+    """Counts, truncates and packs texts within the token limits of a model."""
+
+    def __init__(self, model: str, limits: Optional[ModelTokenLimits] = None, use_tokenizer: bool = True):
+        """Initialize the token budget.
+
+        Args:
+            model: Model name
+            limits: Optional limits overriding the known limits of the model
+            use_tokenizer: Whether to count with a BPE vocabulary when available
+        """
+        self.model = model
+        self.limits = limits or get_model_limits(model)
+        self._vocabulary: Optional[Tuple[Optional["tiktoken.Encoding"], bool]] = (
+            None if use_tokenizer else (None, False)
+        )
+
+    @property
+    def encoding(self) -> Optional["tiktoken.Encoding"]:
+        """BPE vocabulary used for counting, or None to estimate (loaded on first use)."""
+        if self._vocabulary is None:
+            self._vocabulary = _load_encoding(self.model)
+        return self._vocabulary[0]
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts use the model's own vocabulary (loaded on first use)."""
+        if self._vocabulary is None:
+            self._vocabulary = _load_encoding(self.model)
+        return self._vocabulary[1]
+
+    async def load(self) -> None:
+        """Load the vocabulary in a worker thread, keeping the event loop free.
+
+        Async callers await this before counting; synchronous callers load the
+        vocabulary on first use instead.
+        """
+        if self._vocabulary is None:
+            self._vocabulary = await run_blocking(BlockingCategory.DISK, _load_encoding, self.model)
+
+    def usable(self, tokens: int) -> int:
+        """Get the part of a limit that can be filled given the counting accuracy.
+
+        Args:
+            tokens: Token limit
+
+        Returns:
+            Limit, reduced by a safety margin when counts are approximate
+        """
+        return tokens if self.exact else int(tokens * APPROXIMATE_MARGIN)
+
+    def count(self, text: str) -> int:
+        """Count the tokens of a text.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Token count (exact for the model's own vocabulary, otherwise approximate)
+        """
+        if self.encoding is None:
+            return estimate_text_tokens(text)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: Optional[int] = None) -> str:
+        """Truncate a text to a number of tokens.
+
+        Args:
+            text: Input text
+            max_tokens: Maximum tokens (defaults to the model's per-input limit)
+
+        Returns:
+            The text, or its longest prefix within the budget
+        """
+        budget = max(0, self.usable(max_tokens if max_tokens is not None else self.limits.max_input_tokens))
+
+        # Every token covers at least one byte, so short texts always fit
+        if len(text) <= budget and len(text.encode("utf-8", errors="surrogatepass")) <= budget:
+            return text
+
+        return self.fit(text, max_tokens)[0]
+
+    def fit(self, text: str, max_tokens: Optional[int] = None) -> Tuple[str, int]:
+        """Truncate a text to a number of tokens and count the tokens kept.
+
+        Args:
+            text: Input text
+            max_tokens: Maximum tokens (defaults to the model's per-input limit)
+
+        Returns:
+            Tuple of (the text or its longest prefix within the budget, its token
+            count), from a single tokenization of the text
+        """
+        budget = max(0, self.usable(max_tokens if max_tokens is not None else self.limits.max_input_tokens))
+
+        if self.encoding is None:
+            tokens = estimate_text_tokens(text)
+            if tokens <= budget:
+                return text, tokens
+            # Cut at the estimated ratio, then shrink until the estimate fits
+            end = int(len(text) * budget / tokens)
+            tokens = estimate_text_tokens(text[:end])
+            while end > 0 and tokens > budget:
+                end = int(end * 0.95)
+                tokens = estimate_text_tokens(text[:end])
+            return text[:end], tokens
+
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= budget:
+            return text, len(tokens)
+        return self.encoding.decode_bytes(tokens[:budget]).decode("utf-8", errors="ignore"), budget
+
+    def pack(self, texts: List[str], max_batch_size: Optional[int] = None) -> Tuple[List[str], List[List[int]]]:
+        """Truncate texts to the per-input limit and pack them into requests.
+
+        Args:
+            texts: Input texts
+            max_batch_size: Optional cap on texts per request below the model's own
+
+        Returns:
+            Tuple of (truncated texts, lists of text indices per request in order)
+        """
+        truncated, batches, _ = self.pack_with_counts(texts, max_batch_size)
+        return truncated, batches
+
+    def pack_with_counts(
+        self, texts: List[str], max_batch_size: Optional[int] = None
+    ) -> Tuple[List[str], List[List[int]], List[int]]:
+        """Truncate texts and pack them into requests, counting tokens per request.
+
+        Each text is tokenized once, and the truncated texts are ready to send as is.
+
+        Args:
+            texts: Input texts
+            max_batch_size: Optional cap on texts per request below the model's own
+
+        Returns:
+            Tuple of (truncated texts, lists of text indices per request in order,
+            tokens of each request)
+        """
+        max_size = self.limits.max_batch_size
+        if max_batch_size:
+            max_size = min(max_size, max_batch_size)
+        request_budget = self.usable(self.limits.max_request_tokens)
+
+        truncated = []
+        batches: List[List[int]] = []
+        batch_tokens: List[int] = []
+        current: List[int] = []
+        current_tokens = 0
+        for index, text in enumerate(texts):
+            fitted, tokens = self.fit(text)
+            if len(fitted) < len(text):
+                logger.warning(f"Text truncated from {len(text)} to {len(fitted)} characters for {self.model}")
+            truncated.append(fitted)
+
+            if current and (len(current) >= max_size or current_tokens + tokens > request_budget):
+                batches.append(current)
+                batch_tokens.append(current_tokens)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+            batch_tokens.append(current_tokens)
+        return truncated, batches, batch_tokens
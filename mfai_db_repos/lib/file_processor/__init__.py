@@ -4,19 +4,27 @@ File processor module for the GitContext application.
 This module provides functionality for processing files from Git repositories,
 including extracting content, filtering by type, and analyzing metadata.
 """
-from mfai_db_repos.lib.file_processor.extractor import FileExtractor
+from mfai_db_repos.lib.file_processor.extractor import FileExtractor, FileRecord
 from mfai_db_repos.lib.file_processor.filter import FileFilter, FileTypeDetector
+from mfai_db_repos.lib.file_processor.matcher import PatternMatcher
 from mfai_db_repos.lib.file_processor.metadata import MetadataExtractor
 from mfai_db_repos.lib.file_processor.patterns import PatternManager, PatternSet, PatternConfig
 from mfai_db_repos.lib.file_processor.processor import FileProcessor
+from mfai_db_repos.lib.file_processor.sampler import DataSampler
+from mfai_db_repos.lib.file_processor.scanner import FileCandidate, RepositoryScanner
 
 __all__ = [
     "FileExtractor",
+    "FileRecord",
     "FileFilter",
     "FileTypeDetector",
+    "PatternMatcher",
     "MetadataExtractor",
     "PatternManager",
     "PatternSet",
     "PatternConfig",
     "FileProcessor",
+    "DataSampler",
+    "FileCandidate",
+    "RepositoryScanner",
 ]
@@ -5,10 +5,11 @@ This module provides functionality for detecting and handling different file enc
 for reliable content extraction and processing.
 """
 import codecs
-import os
+import re
+import threading
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import chardet
 from mfai_db_repos.utils.config import Config
@@ -16,6 +17,22 @@ from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Maximum number of bytes given to statistical (chardet) detection
+DETECTION_SAMPLE_BYTES = 64 * 1024
+
+# Maximum share of non-ASCII bytes for text to be taken as Western single-byte (cp1252)
+WESTERN_HIGH_BYTE_RATIO = 0.3
+
+# Maximum number of (extension, directory) entries kept in the encoding cache
+ENCODING_CACHE_SIZE = 4096
+
+_HIGH_BYTE = re.compile(rb"[\x80-\xff]")
+_HIGH_BYTES = bytes(range(0x80, 0x100))
+
+# Encodings detected for sibling files, shared by all detectors
+_encoding_cache: Dict[Tuple[str, str], str] = {}
+_encoding_cache_lock = threading.Lock()
+
 
 class EncodingConfidence(Enum):
     """Confidence levels for encoding detection."""
@@ -127,6 +144,155 @@ class EncodingDetector:
         self.default_encoding = default_encoding
         self.strict_mode = strict_mode
     
+    @staticmethod
+    def _cache_key(filepath: Optional[Union[str, Path]]) -> Optional[Tuple[str, str]]:
+        """Build the encoding cache key of a file.
+        
+        Args:
+            filepath: Optional path to the file
+            
+        Returns:
+            Tuple of (extension, directory), or None without a path
+        """
+        if filepath is None:
+            return None
+        filepath = Path(filepath)
+        return filepath.suffix.lower(), str(filepath.parent)
+    
+    @staticmethod
+    def _confidence_level(confidence: float) -> EncodingConfidence:
+        """Map a detector confidence score to a confidence level.
+        
+        Args:
+            confidence: Confidence between 0 and 1
+            
+        Returns:
+            Confidence level
+        """
+        if confidence >= 0.9:
+            return EncodingConfidence.HIGH
+        elif confidence >= 0.6:
+            return EncodingConfidence.MEDIUM
+        return EncodingConfidence.LOW
+    
+    def detect_bytes_encoding(
+        self,
+        data: bytes,
+        filepath: Optional[Union[str, Path]] = None,
+    ) -> EncodingResult:
+        """Detect the encoding of file contents already in memory.
+        
+        Checks run from cheapest to most expensive: BOMs, strict UTF-8 on the full
+        buffer, the encoding cached for sibling files (same extension and directory),
+        a Western single-byte heuristic, and finally chardet on a bounded sample
+        around the first non-ASCII byte.
+        
+        Args:
+            data: Raw file contents
+            filepath: Optional path of the file, used as the cache key
+            
+        Returns:
+            EncodingResult with detected encoding and confidence
+        """
+        for bom, encoding in self.BOM_SIGNATURES.items():
+            if data.startswith(bom):
+                return EncodingResult(encoding=encoding, confidence=EncodingConfidence.HIGH, bom_detected=True)
+        
+        # Most files are ASCII or UTF-8; the C decoder validates them in one pass
+        first_high = _HIGH_BYTE.search(data)
+        if first_high is None:
+            return EncodingResult(encoding="utf-8", confidence=EncodingConfidence.HIGH)
+        try:
+            data.decode("utf-8")
+            return EncodingResult(encoding="utf-8", confidence=EncodingConfidence.HIGH)
+        except UnicodeDecodeError:
+            pass
+        
+        # Sibling files usually share a legacy encoding
+        key = self._cache_key(filepath)
+        cached = _encoding_cache.get(key) if key is not None else None
+        if cached is not None and self._decodes(data, cached):
+            return EncodingResult(encoding=cached, confidence=EncodingConfidence.MEDIUM)
+        
+        # Mostly-ASCII text with a few accented characters is Western single-byte
+        high_bytes = len(data) - len(data.translate(None, _HIGH_BYTES))
+        if high_bytes <= len(data) * WESTERN_HIGH_BYTE_RATIO and self._decodes(data, "cp1252"):
+            result = EncodingResult(encoding="cp1252", confidence=EncodingConfidence.MEDIUM)
+        else:
+            start = max(0, first_high.start() - 1024)
+            detection = chardet.detect(data[start:start + DETECTION_SAMPLE_BYTES])
+            encoding = detection["encoding"]
+            if not encoding:
+                return EncodingResult(
+                    encoding=self.default_encoding,
+                    confidence=EncodingConfidence.UNKNOWN,
+                    fallback_used=True,
+                )
+            result = EncodingResult(
+                encoding=encoding.lower().replace("-", "_"),
+                confidence=self._confidence_level(detection["confidence"] or 0.0),
+            )
+        
+        if key is not None and result.confidence != EncodingConfidence.LOW:
+            with _encoding_cache_lock:
+                if len(_encoding_cache) >= ENCODING_CACHE_SIZE:
+                    _encoding_cache.clear()
+                _encoding_cache[key] = result.encoding
+        
+        return result
+    
+    @staticmethod
+    def _decodes(data: bytes, encoding: str) -> bool:
+        """Check whether data decodes strictly with an encoding.
+        
+        Args:
+            data: Raw bytes
+            encoding: Encoding name
+            
+        Returns:
+            True if decoding succeeds
+        """
+        try:
+            data.decode(encoding)
+            return True
+        except (UnicodeDecodeError, LookupError):
+            return False
+    
+    def decode_bytes(
+        self,
+        data: bytes,
+        filepath: Optional[Union[str, Path]] = None,
+    ) -> Tuple[str, EncodingResult]:
+        """Detect the encoding of file contents and decode them.
+        
+        Args:
+            data: Raw file contents
+            filepath: Optional path of the file, used as the cache key
+            
+        Returns:
+            Tuple of (text, encoding_result)
+        """
+        result = self.detect_bytes_encoding(data, filepath)
+        try:
+            return data.decode(result.encoding), result
+        except (UnicodeDecodeError, LookupError):
+            pass
+        
+        # The sample did not represent the whole file
+        for fallback_encoding in self.fallback_encodings:
+            if fallback_encoding != result.encoding and self._decodes(data, fallback_encoding):
+                return data.decode(fallback_encoding), EncodingResult(
+                    encoding=fallback_encoding,
+                    confidence=EncodingConfidence.LOW,
+                    fallback_used=True,
+                )
+        
+        return data.decode(self.default_encoding, errors="replace"), EncodingResult(
+            encoding=self.default_encoding,
+            confidence=EncodingConfidence.LOW,
+            fallback_used=True,
+        )
+    
     def detect_file_encoding(self, filepath: Union[str, Path]) -> EncodingResult:
         """Detect the encoding of a file.
         
@@ -147,51 +313,12 @@ class EncodingDetector:
             )
         
         try:
-            # First check for BOM
             with open(filepath, "rb") as f:
-                raw_data = f.read(4)  # Read first 4 bytes to check for BOM
-                
-                for bom, encoding in self.BOM_SIGNATURES.items():
-                    if raw_data.startswith(bom):
-                        logger.debug(f"BOM detected for {filepath}: {encoding}")
-                        return EncodingResult(
-                            encoding=encoding,
-                            confidence=EncodingConfidence.HIGH,
-                            bom_detected=True,
-                        )
+                raw_data = f.read()
             
-            # Read file and detect encoding using chardet
-            with open(filepath, "rb") as f:
-                raw_data = f.read(min(1024 * 1024, os.path.getsize(filepath)))  # Read up to 1MB
-                
-                detection = chardet.detect(raw_data)
-                encoding = detection["encoding"]
-                confidence = detection["confidence"]
-                
-                if not encoding:
-                    logger.warning(f"Could not detect encoding for {filepath}, using default")
-                    return EncodingResult(
-                        encoding=self.default_encoding,
-                        confidence=EncodingConfidence.UNKNOWN,
-                        fallback_used=True,
-                    )
-                
-                # Normalize encoding name
-                encoding = encoding.lower().replace("-", "_")
-                
-                # Determine confidence level
-                if confidence >= 0.9:
-                    confidence_level = EncodingConfidence.HIGH
-                elif confidence >= 0.6:
-                    confidence_level = EncodingConfidence.MEDIUM
-                else:
-                    confidence_level = EncodingConfidence.LOW
-                
-                logger.debug(f"Detected encoding for {filepath}: {encoding} ({confidence})")
-                return EncodingResult(
-                    encoding=encoding,
-                    confidence=confidence_level,
-                )
+            result = self.detect_bytes_encoding(raw_data, filepath)
+            logger.debug(f"Detected encoding for {filepath}: {result}")
+            return result
                 
         except (IOError, OSError) as e:
             logger.warning(f"Error detecting encoding for {filepath}: {e}")
@@ -227,10 +354,19 @@ class EncodingDetector:
                 fallback_used=True,
             )
         
-        # If encoding is not specified, detect it
+        # If encoding is not specified, detect it from the same read
         if not encoding:
-            encoding_result = self.detect_file_encoding(filepath)
-            encoding = encoding_result.encoding
+            try:
+                with open(filepath, "rb") as f:
+                    raw_data = f.read()
+            except (IOError, OSError) as e:
+                logger.error(f"Error reading {filepath}: {e}")
+                return None, EncodingResult(
+                    encoding=self.default_encoding,
+                    confidence=EncodingConfidence.UNKNOWN,
+                    fallback_used=True,
+                )
+            return self.decode_bytes(raw_data, filepath)
         else:
             encoding_result = EncodingResult(
                 encoding=encoding,
@@ -3,17 +3,53 @@ File extraction and content parsing module.
 
 This module provides functionality for extracting and processing file content from repositories.
 """
+import hashlib
+import os
+import stat
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
-import chardet
 import magic
+from mfai_db_repos.lib.file_processor.encoding import EncodingDetector
+from mfai_db_repos.lib.file_processor.matcher import PatternMatcher, glob_match
 from mfai_db_repos.utils.env import get_float_env
 from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Number of bytes inspected to detect binary content and MIME types
+SNIFF_BYTES = 1024
+
+
+@dataclass(slots=True)
+class FileRecord:
+    """File contents and metadata collected from a single read of a file."""
+
+    path: str  # Path the file was read from
+    data: bytes  # Raw file contents
+    text: Optional[str]  # Decoded (and trimmed) text, None for binary files
+    encoding: Optional[str]  # Encoding used to decode the text
+    size: int  # File size in bytes
+    mtime: float  # Last modification time (seconds since epoch)
+    is_binary: bool  # Whether the file looks binary
+    file_type: str  # Detected file type (see FileExtractor.get_file_type)
+    content_hash: str  # SHA-256 hex digest of the raw contents
+
+    @property
+    def metadata(self) -> Dict[str, Union[str, int, datetime]]:
+        """File metadata in the format returned by FileExtractor.get_file_metadata."""
+        path = Path(self.path)
+        return {
+            "filename": path.name,
+            "filepath": self.path,
+            "extension": path.suffix.lower(),
+            "file_size": self.size,
+            "last_modified": datetime.fromtimestamp(self.mtime),
+            "file_type": self.file_type,
+        }
+
 
 class FileExtractor:
     """File content extraction and processing class."""
@@ -98,6 +134,7 @@ class FileExtractor:
         """
         self.max_file_size_bytes = (max_file_size_mb or get_float_env("MAX_FILE_SIZE_MB", 10)) * 1024 * 1024
         self.max_content_length = max_content_length or 1000000  # Default to 1M characters
+        self.encoding_detector = EncodingDetector()
 
     def get_file_type(self, filepath: Union[str, Path]) -> str:
         """Determine the file type based on extension and content.
@@ -146,6 +183,37 @@ class FileExtractor:
             # Unknown extension, treat as text by default
             return "text"
 
+    def _detect_file_type(self, extension: str, head: bytes) -> str:
+        """Determine the file type from the extension and the first bytes of the file.
+
+        Args:
+            extension: Lowercase file extension
+            head: First bytes of the file
+
+        Returns:
+            File type string
+        """
+        if extension in self.BINARY_EXTENSIONS:
+            return "binary"
+        
+        if extension in self.TEXT_EXTENSIONS:
+            return self.TEXT_EXTENSIONS[extension]
+        
+        try:
+            mime_type = magic.from_buffer(head, mime=True)
+            if mime_type.startswith("text/"):
+                return "text"
+            elif "xml" in mime_type:
+                return "xml"
+            elif "json" in mime_type:
+                return "json"
+            else:
+                return "binary"
+        except Exception:
+            if not extension:
+                return "binary" if b"\x00" in head else "text"
+            return "text"
+
     def is_binary_file(self, filepath: Union[str, Path]) -> bool:
         """Check if a file is binary.
 
@@ -189,40 +257,8 @@ class FileExtractor:
         Returns:
             True if the file should be included, False otherwise
         """
-        # Normalize to Path object and convert to string for pattern matching
-        filepath = str(Path(filepath))
-        
-        # Use config patterns if not provided
-        from mfai_db_repos.utils.config import config
-        file_filter_config = config.config.file_filter
-        
-        # Use config patterns if not provided
-        include_patterns = include_patterns or file_filter_config.include_patterns
-        
-        # Start with base exclude patterns
-        if exclude_patterns is None:
-            exclude_patterns = list(file_filter_config.exclude_patterns)
-            
-            # Add test patterns to exclude list if not including tests
-            if not include_tests and hasattr(file_filter_config, 'test_patterns'):
-                exclude_patterns.extend(file_filter_config.test_patterns)
-        
-        # Check exclude patterns
-        for pattern in exclude_patterns:
-            if self._matches_glob_pattern(filepath, pattern):
-                return False
-        
-        # If no include patterns, include all files
-        if not include_patterns:
-            return True
-        
-        # Check include patterns
-        for pattern in include_patterns:
-            if self._matches_glob_pattern(filepath, pattern):
-                return True
-        
-        # No match found
-        return False
+        matcher = PatternMatcher.from_config(include_patterns, exclude_patterns, include_tests)
+        return matcher.matches(str(Path(filepath)))
 
     def _matches_glob_pattern(self, filepath: str, pattern: str) -> bool:
         """Check if a filepath matches a glob pattern.
@@ -234,32 +270,7 @@ class FileExtractor:
         Returns:
             True if the path matches the pattern, False otherwise
         """
-        import fnmatch
-        
-        # First, try with simple fnmatch which handles basic globs
-        if fnmatch.fnmatch(filepath, pattern):
-            return True
-            
-        # Special handling for directory matching with **
-        if "**" in pattern:
-            # For pattern like **/tests/** - check if 'tests' is anywhere in the path
-            if pattern == "**/tests/**" or pattern == "**/test/**":
-                dir_name = pattern.split("**/")[1].split("/**")[0]
-                path_parts = Path(filepath).parts
-                return dir_name in path_parts
-                
-            # Special check for test_*.py, *_test.py, etc.
-            if pattern.endswith(".py"):
-                basename = Path(filepath).name
-                if pattern == "**/test_*.py" and basename.startswith("test_"):
-                    return True
-                if pattern == "**/*_test.py" and basename.endswith("_test.py"):
-                    return True
-                if pattern == "**/*_tests.py" and basename.endswith("_tests.py"):
-                    return True
-                
-        # No match found
-        return False
+        return glob_match(filepath, pattern)
 
     def should_process_file(
         self,
@@ -302,6 +313,74 @@ class FileExtractor:
         
         return True
 
+    def decode_content(self, data: bytes, filepath: Optional[Union[str, Path]] = None) -> Tuple[str, str]:
+        """Decode file contents, detecting the encoding if they are not UTF-8.
+
+        Args:
+            data: Raw file contents
+            filepath: Optional path of the file, lets sibling files share a detected encoding
+
+        Returns:
+            Tuple of (text, encoding)
+        """
+        text, result = self.encoding_detector.decode_bytes(data, filepath)
+        return text, result.encoding
+
+    def read_file(self, filepath: Union[str, Path]) -> Optional[FileRecord]:
+        """Read a file once and collect everything ingestion needs about it.
+
+        The file is opened a single time: size and modification time come from
+        fstat on the open descriptor, and binary detection, type detection,
+        decoding and hashing all work on the bytes already in memory. Pattern
+        checks are left to the scanner that produced the path.
+
+        Args:
+            filepath: Path to the file
+
+        Returns:
+            FileRecord, or None if the file cannot be read or exceeds the size limit
+        """
+        filepath = Path(filepath)
+        
+        try:
+            with open(filepath, "rb") as f:
+                file_stat = os.fstat(f.fileno())
+                if not stat.S_ISREG(file_stat.st_mode):
+                    return None
+                if file_stat.st_size > self.max_file_size_bytes:
+                    logger.debug(f"Skipping {filepath} due to size ({file_stat.st_size} bytes)")
+                    return None
+                data = f.read()
+        except OSError as e:
+            logger.warning(f"Failed to read file {filepath}: {e}")
+            return None
+        
+        extension = filepath.suffix.lower()
+        head = data[:SNIFF_BYTES]
+        is_binary = extension in self.BINARY_EXTENSIONS or b"\x00" in head
+        
+        text = None
+        encoding = None
+        if not is_binary:
+            text, encoding = self.decode_content(data, filepath)
+            
+            # Trim content if it's too long
+            if len(text) > self.max_content_length:
+                logger.debug(f"Trimming content of {filepath} to {self.max_content_length} characters")
+                text = text[:self.max_content_length]
+        
+        return FileRecord(
+            path=str(filepath),
+            data=data,
+            text=text,
+            encoding=encoding,
+            size=file_stat.st_size,
+            mtime=file_stat.st_mtime,
+            is_binary=is_binary,
+            file_type=self._detect_file_type(extension, head),
+            content_hash=hashlib.sha256(data).hexdigest(),
+        )
+
     def extract_content(self, filepath: Union[str, Path]) -> Optional[str]:
         """Extract content from a file.
 
@@ -318,23 +397,9 @@ class FileExtractor:
             return None
         
         try:
-            # First try to read with UTF-8
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                # If UTF-8 fails, detect encoding
-                with open(filepath, "rb") as f:
-                    raw_content = f.read()
-                encoding_result = chardet.detect(raw_content)
-                encoding = encoding_result["encoding"] or "utf-8"
-                
-                # Try again with detected encoding
-                try:
-                    content = raw_content.decode(encoding)
-                except UnicodeDecodeError:
-                    # If all else fails, decode with errors ignored
-                    content = raw_content.decode("utf-8", errors="replace")
+            # Read once and decode in memory, detecting the encoding if needed
+            with open(filepath, "rb") as f:
+                content, _ = self.decode_content(f.read(), filepath)
             
             # Trim content if it's too long
             if len(content) > self.max_content_length:
@@ -4,11 +4,10 @@ File type selection and filtering module.
 This module provides functionality for selecting and filtering files based on
 various criteria such as file type, extension, and content patterns.
 """
-import fnmatch
-import re
 from pathlib import Path
 from typing import Dict, List, Optional, Union
 
+from mfai_db_repos.lib.file_processor.matcher import PatternMatcher, get_pattern_matcher, glob_match
 from mfai_db_repos.utils.config import config
 from mfai_db_repos.utils.logger import get_logger
 
@@ -264,25 +263,15 @@ class FileFilter:
         Returns:
             True if the file should be included, False otherwise
         """
-        # Convert to string for pattern matching
-        filepath_str = str(filepath)
-        
-        # Check exclude patterns
-        for pattern in self.exclude_patterns:
-            if self._matches_glob_pattern(filepath_str, pattern):
-                return False
-        
-        # If no include patterns, include all files
-        if not self.include_patterns:
-            return True
-        
-        # Check include patterns
-        for pattern in self.include_patterns:
-            if self._matches_glob_pattern(filepath_str, pattern):
-                return True
-        
-        # No match found
-        return False
+        return self.matcher.matches(str(filepath))
+
+    @property
+    def matcher(self) -> PatternMatcher:
+        """Get the compiled matcher for the current include/exclude patterns."""
+        return get_pattern_matcher(
+            tuple(self.include_patterns or ()),
+            tuple(self.exclude_patterns or ()),
+        )
 
     def _matches_glob_pattern(self, filepath: str, pattern: str) -> bool:
         """Check if a filepath matches a glob pattern.
@@ -294,15 +283,7 @@ class FileFilter:
         Returns:
             True if the path matches the pattern, False otherwise
         """
-        # Handle recursive glob patterns (**, which isn't natively supported in fnmatch)
-        if "**" in pattern:
-            # Convert ** to a regex pattern
-            regex_pattern = pattern.replace(".", r"\.").replace("**", ".*").replace("*", "[^/]*").replace("?", ".")
-            regex_pattern = f"^{regex_pattern}$"
-            return bool(re.match(regex_pattern, filepath))
-        else:
-            # Use fnmatch for simple patterns
-            return fnmatch.fnmatch(filepath, pattern)
+        return glob_match(filepath, pattern)
 
     def filter_files(
         self,
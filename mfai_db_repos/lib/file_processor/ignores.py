@@ -1,15 +1,20 @@
 """
 Ignore pattern management module.
 
-This module provides functionality for managing and applying ignore patterns for 
+This module provides functionality for managing and applying ignore patterns for
 repository processing, similar to how .gitignore works.
+
+Patterns are kept per directory, the way git reads nested .gitignore files. Each
+directory's rules are precompiled into a single regex, directory decisions are
+cached so that an ignored directory excludes its whole subtree, and lookups for
+files reuse the cached state of their parent directory.
 """
-import fnmatch
 import os
 import re
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Pattern, Tuple, Union
 
+from mfai_db_repos.lib.file_processor.matcher import glob_to_regex, normalize_path
 from mfai_db_repos.utils.config import Config
 from mfai_db_repos.utils.logger import get_logger
 
@@ -49,31 +54,20 @@ class IgnorePattern:
         # Handle directory-only patterns
         if pattern.endswith('/'):
             self.directory_only = True
-            pattern = pattern[:-1]
-        
-        # Convert glob pattern to regex
-        regex = fnmatch.translate(pattern)
-        
-        # Handle anchoring
-        if pattern.startswith('/'):
-            # Anchored to repo root
-            regex = f"^{regex[1:]}"
-        elif '/' in pattern:
-            # Contains a slash but not anchored, should match anywhere in the path
-            regex = f".*{regex}"
-        else:
-            # Simple filename pattern, should match the end of the path
-            regex = f".*{os.path.sep}{regex}"
+            pattern = pattern.rstrip('/')
         
-        self._regex = re.compile(regex)
+        # Patterns with a leading or middle slash are anchored to the directory
+        # containing them; bare names match at any depth (gitignore semantics)
+        self.regex_source = glob_to_regex(pattern)
+        self._regex = re.compile(f"(?:{self.regex_source})\\Z")
     
     def matches(self, path: Union[str, Path], is_dir: bool = False) -> bool:
         """Check if the pattern matches a path.
         
         Args:
-            path: Path to check
+            path: Path to check, relative to the directory the pattern belongs to
             is_dir: Whether the path is a directory
-            
+        
         Returns:
             True if the pattern matches the path
         """
@@ -81,14 +75,8 @@ class IgnorePattern:
         if self.directory_only and not is_dir:
             return False
         
-        # Convert path to string for matching
-        path_str = str(path)
-        
-        # Replace backslashes with forward slashes for consistent matching
-        path_str = path_str.replace('\\', '/')
-        
         # Check if the pattern matches
-        return bool(self._regex.match(path_str))
+        return bool(self._regex.match(normalize_path(str(path)).lstrip('/')))
     
     def __str__(self) -> str:
         """String representation of the pattern.
@@ -111,6 +99,66 @@ class IgnorePattern:
         return "".join(parts)
 
 
+class IgnoreRuleSet:
+    """Precompiled ignore patterns belonging to a single directory."""
+    
+    def __init__(self, base: str, patterns: List[IgnorePattern]):
+        """Initialize a rule set.
+        
+        Args:
+            base: Directory the patterns are relative to ("" for the root)
+            patterns: Patterns in file order
+        """
+        self.base = base
+        self.patterns = list(patterns)
+        self._file_regex = self._compile(for_directories=False)
+        self._dir_regex = self._compile(for_directories=True)
+    
+    def _compile(self, for_directories: bool) -> Optional[Pattern[str]]:
+        """Combine the patterns into one regex.
+        
+        Alternatives are emitted in reverse file order so that the first
+        alternative to match is the last matching pattern ("last match wins").
+        
+        Args:
+            for_directories: Whether to include directory-only patterns
+        
+        Returns:
+            Compiled regex or None if no pattern applies
+        """
+        sources = []
+        for index in range(len(self.patterns) - 1, -1, -1):
+            pattern = self.patterns[index]
+            if pattern.directory_only and not for_directories:
+                continue
+            sources.append(f"(?P<p{index}>{pattern.regex_source})")
+        
+        if not sources:
+            return None
+        return re.compile("(?:" + "|".join(sources) + r")\Z")
+    
+    def match(self, rel_path: str, is_dir: bool = False) -> Optional[bool]:
+        """Find the decision of the last matching pattern.
+        
+        Args:
+            rel_path: Normalized path relative to the rule set's base directory
+            is_dir: Whether the path is a directory
+        
+        Returns:
+            True if ignored, False if re-included by a negated pattern,
+            None if no pattern matches
+        """
+        regex = self._dir_regex if is_dir else self._file_regex
+        if regex is None:
+            return None
+        
+        match = regex.match(rel_path)
+        if match is None:
+            return None
+        
+        return not self.patterns[int(match.lastgroup[1:])].negated
+
+
 class IgnoreManager:
     """Manager for ignore patterns."""
     
@@ -230,6 +278,7 @@ class IgnoreManager:
         config: Optional[Config] = None,
         default_ignores: Optional[List[str]] = None,
         ignore_case: bool = True,
+        root: Optional[Union[str, Path]] = None,
     ):
         """Initialize an ignore manager.
         
@@ -237,10 +286,23 @@ class IgnoreManager:
             config: Optional Config instance
             default_ignores: List of default ignore patterns
             ignore_case: Whether to ignore case when matching
+            root: Optional repository root that paths are resolved against
         """
         self.config = config or Config()
         self.patterns: List[IgnorePattern] = []
         self.ignore_case = ignore_case
+        self.root: Optional[str] = None
+        
+        # Patterns loaded from .gitignore files, keyed by directory relative to root
+        self.directory_patterns: Dict[str, List[IgnorePattern]] = {}
+        
+        self._rule_sets: Optional[Dict[str, IgnoreRuleSet]] = None
+        self._global_rules: Optional[IgnoreRuleSet] = None
+        self._chain_cache: Dict[str, Tuple[IgnoreRuleSet, ...]] = {}
+        self._directory_cache: Dict[str, bool] = {}
+        
+        if root is not None:
+            self.set_root(root)
         
         # Add default ignore patterns
         if default_ignores:
@@ -249,37 +311,65 @@ class IgnoreManager:
             # Add commonly ignored files by default
             self.add_common_ignores(["git", "ide"])
     
-    def add_pattern(self, pattern: str, comment: Optional[str] = None) -> None:
-        """Add an ignore pattern.
+    def set_root(self, root: Union[str, Path]) -> None:
+        """Set the repository root that paths are resolved against.
         
         Args:
-            pattern: Glob pattern
+            root: Repository root directory
+        """
+        self.root = normalize_path(os.path.abspath(str(root))).rstrip('/')
+        self._invalidate()
+    
+    def _invalidate(self) -> None:
+        """Drop compiled rule sets and cached directory decisions."""
+        self._rule_sets = None
+        self._global_rules = None
+        self._chain_cache.clear()
+        self._directory_cache.clear()
+    
+    @staticmethod
+    def _parse_pattern(pattern: str, comment: Optional[str] = None) -> Optional[IgnorePattern]:
+        """Parse a single ignore line into a pattern.
+        
+        Args:
+            pattern: Glob pattern line
             comment: Optional comment about the pattern
+        
+        Returns:
+            IgnorePattern or None for empty lines and comments
         """
         # Skip empty lines and comments
         pattern = pattern.strip()
         if not pattern or pattern.startswith('#'):
-            return
+            return None
         
         # Handle negated patterns
         negated = pattern.startswith('!')
         if negated:
             pattern = pattern[1:].strip()
             if not pattern:
-                return
-        
-        # Handle directory-only patterns
-        directory_only = pattern.endswith('/')
+                return None
         
-        # Add pattern
-        ignore_pattern = IgnorePattern(
+        return IgnorePattern(
             pattern=pattern,
             negated=negated,
-            directory_only=directory_only,
+            directory_only=pattern.endswith('/'),
             comment=comment,
         )
+    
+    def add_pattern(self, pattern: str, comment: Optional[str] = None) -> None:
+        """Add an ignore pattern.
+        
+        Args:
+            pattern: Glob pattern
+            comment: Optional comment about the pattern
+        """
+        ignore_pattern = self._parse_pattern(pattern, comment)
+        if ignore_pattern is None:
+            return
         
         self.patterns.append(ignore_pattern)
+        self._invalidate()
         logger.debug(f"Added ignore pattern: {ignore_pattern}")
     
     def add_patterns(self, patterns: List[str]) -> None:
@@ -304,95 +394,269 @@ class IgnoreManager:
             else:
                 logger.warning(f"Unknown ignore category: {category}")
     
+    def _read_gitignore(self, gitignore_path: Path) -> List[IgnorePattern]:
+        """Read the patterns of a .gitignore file.
+        
+        Args:
+            gitignore_path: Path to .gitignore file
+        
+        Returns:
+            List of patterns in file order
+        """
+        patterns = []
+        with open(gitignore_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                
+                # Skip empty lines and comments
+                if not line or line.startswith('#'):
+                    continue
+                
+                # Extract comment if present
+                comment = None
+                if '#' in line:
+                    line, comment = line.split('#', 1)
+                    line = line.strip()
+                    comment = comment.strip()
+                
+                pattern = self._parse_pattern(line, comment)
+                if pattern is not None:
+                    patterns.append(pattern)
+        
+        return patterns
+    
     def parse_gitignore(self, gitignore_path: Union[str, Path]) -> None:
         """Parse patterns from a .gitignore file.
         
+        When a root is set and the file lives under it, its patterns apply
+        relative to the file's directory; otherwise they are added globally.
+        
         Args:
             gitignore_path: Path to .gitignore file
         """
         gitignore_path = Path(gitignore_path)
-        if not gitignore_path.exists() or not gitignore_path.is_file():
+        if not gitignore_path.is_file():
             logger.warning(f"Cannot parse .gitignore: {gitignore_path} does not exist")
             return
         
         try:
-            with open(gitignore_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    
-                    # Skip empty lines and comments
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    # Extract comment if present
-                    comment = None
-                    if '#' in line:
-                        line, comment = line.split('#', 1)
-                        line = line.strip()
-                        comment = comment.strip()
-                    
-                    # Add pattern
-                    self.add_pattern(line, comment)
-                    
-            logger.info(f"Parsed ignore patterns from {gitignore_path}")
+            patterns = self._read_gitignore(gitignore_path)
         except Exception as e:
             logger.error(f"Error parsing .gitignore {gitignore_path}: {e}")
+            return
+        
+        base = self._relative(os.path.abspath(str(gitignore_path.parent)))
+        if base is None:
+            self.patterns.extend(patterns)
+        else:
+            self.directory_patterns[base] = patterns
+        self._invalidate()
+        
+        logger.info(f"Parsed ignore patterns from {gitignore_path}")
     
     def parse_gitignore_in_repo(self, repo_path: Union[str, Path]) -> None:
         """Parse all .gitignore files in a repository.
         
+        The repository becomes the manager's root. Directories that are already
+        ignored are not descended into, as their .gitignore files cannot apply.
+        
         Args:
             repo_path: Path to repository
         """
         repo_path = Path(repo_path)
-        if not repo_path.exists() or not repo_path.is_dir():
+        if not repo_path.is_dir():
             logger.warning(f"Cannot parse .gitignore files: {repo_path} does not exist")
             return
         
-        # Parse root .gitignore
-        root_gitignore = repo_path / ".gitignore"
-        if root_gitignore.exists():
-            self.parse_gitignore(root_gitignore)
+        self.set_root(repo_path)
+        pending = [""]
         
-        # Parse subdirectory .gitignore files
-        for root, _, files in os.walk(repo_path):
-            # Skip .git directory
-            if ".git" in Path(root).parts:
+        while pending:
+            rel_dir = pending.pop()
+            abs_dir = f"{self.root}/{rel_dir}" if rel_dir else self.root
+            
+            try:
+                with os.scandir(abs_dir) as entries:
+                    subdirs = []
+                    for entry in entries:
+                        if entry.name == ".git":
+                            continue
+                        if entry.name == ".gitignore" and entry.is_file():
+                            self.parse_gitignore(entry.path)
+                        elif entry.is_dir(follow_symlinks=False):
+                            subdirs.append(f"{rel_dir}/{entry.name}" if rel_dir else entry.name)
+            except OSError as e:
+                logger.warning(f"Failed to scan directory {abs_dir}: {e}")
                 continue
             
-            for filename in files:
-                if filename == ".gitignore" and root != str(repo_path):
-                    gitignore_path = Path(root) / filename
-                    self.parse_gitignore(gitignore_path)
+            # The directory's own .gitignore must be loaded before judging its children
+            pending.extend(d for d in subdirs if not self.is_directory_ignored(d))
+    
+    def _relative(self, path: Union[str, Path]) -> Optional[str]:
+        """Convert a path to a normalized path relative to the root.
+        
+        Args:
+            path: Absolute or root-relative path
+        
+        Returns:
+            Relative path, or None if the path is absolute and outside the root
+        """
+        path_str = normalize_path(str(path))
+        if not os.path.isabs(path_str):
+            return path_str.rstrip('/')
+        
+        if self.root is not None:
+            if path_str == self.root:
+                return ""
+            if path_str.startswith(self.root + '/'):
+                return path_str[len(self.root) + 1:].rstrip('/')
+        
+        return None
+    
+    def _compile_rules(self) -> Dict[str, IgnoreRuleSet]:
+        """Compile per-directory rule sets on first use.
+        
+        Returns:
+            Rule sets keyed by directory
+        """
+        if self._rule_sets is None:
+            self._rule_sets = {
+                base: IgnoreRuleSet(base, patterns)
+                for base, patterns in self.directory_patterns.items()
+                if patterns
+            }
+            self._global_rules = IgnoreRuleSet("", self.patterns)
+        return self._rule_sets
+    
+    def _rules_for(self, parent: str) -> Tuple[IgnoreRuleSet, ...]:
+        """Get the rule sets that apply inside a directory, deepest first.
+        
+        Args:
+            parent: Directory relative to the root
+        
+        Returns:
+            Tuple of rule sets ordered from highest to lowest precedence
+        """
+        chain = self._chain_cache.get(parent)
+        if chain is not None:
+            return chain
+        
+        rule_sets = self._compile_rules()
+        applicable = []
+        current = parent
+        while True:
+            rule_set = rule_sets.get(current)
+            if rule_set is not None:
+                applicable.append(rule_set)
+            if not current:
+                break
+            current = current.rpartition('/')[0]
+        
+        # Manually added patterns have the lowest precedence, like core.excludesFile
+        applicable.append(self._global_rules)
+        
+        chain = tuple(applicable)
+        self._chain_cache[parent] = chain
+        return chain
+    
+    def _match(self, rel_path: str, parent: str, is_dir: bool) -> bool:
+        """Decide a path using the rule sets of its parent directory.
+        
+        Args:
+            rel_path: Path relative to the root
+            parent: Parent directory of the path relative to the root
+            is_dir: Whether the path is a directory
+        
+        Returns:
+            True if the path is ignored
+        """
+        for rule_set in self._rules_for(parent):
+            sub_path = rel_path[len(rule_set.base) + 1:] if rule_set.base else rel_path
+            decision = rule_set.match(sub_path, is_dir)
+            if decision is not None:
+                return decision
+        return False
+    
+    def _match_outside_root(self, path: Union[str, Path], is_dir: bool) -> bool:
+        """Decide an absolute path that is not under the root.
+        
+        Only manually added patterns apply, matched against the full path
+        without checking its ancestors.
+        
+        Args:
+            path: Absolute path
+            is_dir: Whether the path is a directory
+            
+        Returns:
+            True if the path is ignored
+        """
+        self._compile_rules()
+        decision = self._global_rules.match(normalize_path(str(path)).strip('/'), is_dir)
+        return bool(decision)
+    
+    def is_directory_ignored(self, path: Union[str, Path]) -> bool:
+        """Check if a whole directory is ignored.
+        
+        A directory is ignored if it or any of its ancestors matches; files below
+        an ignored directory cannot be re-included, so walkers can skip it.
+        
+        Args:
+            path: Directory path (absolute or relative to the root)
+        
+        Returns:
+            True if the directory is ignored
+        """
+        rel_path = self._relative(path)
+        if rel_path is None:
+            return self._match_outside_root(path, True)
+        return self._is_directory_ignored(rel_path)
+    
+    def _is_directory_ignored(self, rel_path: str) -> bool:
+        """Check a normalized relative directory, caching the decision.
+        
+        Args:
+            rel_path: Directory path relative to the root
+        
+        Returns:
+            True if the directory is ignored
+        """
+        if not rel_path:
+            return False
+        
+        cached = self._directory_cache.get(rel_path)
+        if cached is not None:
+            return cached
+        
+        parent = rel_path.rpartition('/')[0]
+        ignored = self._is_directory_ignored(parent) or self._match(rel_path, parent, True)
+        self._directory_cache[rel_path] = ignored
+        return ignored
     
     def should_ignore(self, path: Union[str, Path], is_dir: bool = False) -> bool:
         """Check if a path should be ignored.
         
         Args:
-            path: Path to check
+            path: Path to check (absolute or relative to the root)
             is_dir: Whether the path is a directory
-            
+        
         Returns:
             True if the path should be ignored
         """
-        path = Path(path)
+        rel_path = self._relative(path)
+        if rel_path is None:
+            return self._match_outside_root(path, is_dir)
         
-        # Get parts of the path for accurate matching
-        parts = path.parts
+        if not rel_path:
+            return False
         
-        # Iterate through patterns in reverse (last one wins)
-        should_ignore = False
+        if is_dir:
+            return self._is_directory_ignored(rel_path)
         
-        for pattern in reversed(self.patterns):
-            if pattern.matches(path, is_dir):
-                if pattern.negated:
-                    # Found a negated pattern that matches, don't ignore
-                    return False
-                else:
-                    # Found a pattern that matches, should ignore unless negated later
-                    should_ignore = True
+        parent = rel_path.rpartition('/')[0]
+        if self._is_directory_ignored(parent):
+            return True
         
-        return should_ignore
+        return self._match(rel_path, parent, False)
     
     def filter_paths(
         self,
@@ -401,30 +665,24 @@ class IgnoreManager:
     ) -> List[Path]:
         """Filter a list of paths using ignore patterns.
         
+        Paths are treated as files unless given as strings ending in a path
+        separator, so no filesystem calls are made per path.
+        
         Args:
             paths: List of paths to filter
             repo_path: Repository root path for relative paths
-            
+        
         Returns:
             List of non-ignored paths
         """
+        if repo_path is not None and self.root is None:
+            self.set_root(repo_path)
+        
         filtered_paths = []
         
         for path in paths:
-            path = Path(path)
-            
-            # Make absolute path if repo_path is provided
-            if repo_path:
-                if not path.is_absolute():
-                    abs_path = Path(repo_path) / path
-                else:
-                    abs_path = path
-            else:
-                abs_path = path.absolute()
-            
-            # Check if path should be ignored
-            is_dir = abs_path.is_dir() if abs_path.exists() else False
+            is_dir = isinstance(path, str) and path.endswith(('/', os.sep))
             if not self.should_ignore(path, is_dir):
-                filtered_paths.append(path)
+                filtered_paths.append(Path(path))
         
-        return filtered_paths
\ No newline at end of file
+        return filtered_paths
@@ -0,0 +1,185 @@
+"""
+Language detection module.
+
+This module maps file names to Pygments language names through tables built
+once from the Pygments lexer registry, so detecting the language of a file is a
+dictionary lookup instead of a search through every lexer. Guessing from
+content is only a fallback and looks at a short prefix of the text.
+"""
+import fnmatch
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import pygments.lexers
+from pygments.lexer import Lexer
+from pygments.lexers import get_lexer_for_filename, guess_lexer
+from pygments.lexers._mapping import LEXERS
+from pygments.util import ClassNotFound
+
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Number of characters of content used when the language has to be guessed
+GUESS_PREFIX_CHARS = 4096
+
+# Languages of extensions that Pygments assigns to an unexpected lexer or not at all
+PREFERRED_EXTENSION_LANGUAGES: Dict[str, str] = {
+    ".m": "Matlab",
+    ".pl": "Perl",
+    ".for": "FortranFixed",
+    ".fpp": "Fortran",
+    ".f95": "Fortran",
+}
+
+_WILDCARD_CHARS = ("*", "?", "[")
+
+
+class _LexerTables:
+    """Lookup tables derived from the Pygments lexer registry."""
+
+    def __init__(self):
+        """Build the tables without importing any lexer module."""
+        self.filenames: Dict[str, List[str]] = {}  # Exact file name -> lexer names
+        self.extensions: Dict[str, List[str]] = {}  # Extension -> lexer names
+        self.patterns: List[Tuple[str, str]] = []  # Other filename patterns
+        self.classes: Dict[str, str] = {}  # Lowercase lexer name or alias -> class name
+
+        for class_name, (_, name, aliases, filenames, _) in LEXERS.items():
+            self.classes.setdefault(name.lower(), class_name)
+            for alias in aliases:
+                self.classes.setdefault(alias.lower(), class_name)
+
+            for pattern in filenames:
+                if not any(char in pattern for char in _WILDCARD_CHARS):
+                    self.filenames.setdefault(pattern, []).append(name)
+                elif pattern.startswith("*.") and not any(char in pattern[2:] for char in _WILDCARD_CHARS):
+                    self.extensions.setdefault(pattern[1:], []).append(name)
+                else:
+                    self.patterns.append((pattern, name))
+
+
+@lru_cache(maxsize=1)
+def _tables() -> _LexerTables:
+    """Get the lexer lookup tables, building them on first use.
+
+    Returns:
+        Lexer lookup tables
+    """
+    return _LexerTables()
+
+
+@lru_cache(maxsize=4096)
+def _resolve_filename(filename: str) -> Optional[str]:
+    """Resolve a file name claimed by several lexers the way Pygments does.
+
+    Args:
+        filename: File name (or "file" plus an extension)
+
+    Returns:
+        Lexer name or None
+    """
+    try:
+        return get_lexer_for_filename(filename).name
+    except ClassNotFound:
+        return None
+
+
+def language_for_filename(filepath: Union[str, Path]) -> Optional[str]:
+    """Get the language of a file from its name.
+
+    Args:
+        filepath: File name or path
+
+    Returns:
+        Pygments language name (e.g. "Python", "FortranFixed"), or None if unknown
+    """
+    tables = _tables()
+    name = os.path.basename(str(filepath))
+
+    languages = tables.filenames.get(name)
+    if languages:
+        return languages[0] if len(languages) == 1 else _resolve_filename(name)
+
+    suffix = os.path.splitext(name)[1]
+    if suffix:
+        preferred = PREFERRED_EXTENSION_LANGUAGES.get(suffix.lower())
+        if preferred:
+            return preferred
+
+        languages = tables.extensions.get(suffix) or tables.extensions.get(suffix.lower())
+        if languages:
+            return languages[0] if len(languages) == 1 else _resolve_filename("file" + suffix)
+
+    for pattern, language in tables.patterns:
+        if fnmatch.fnmatchcase(name, pattern):
+            return language
+
+    return None
+
+
+def guess_language(content: str) -> Optional[str]:
+    """Guess the language of text from a short prefix.
+
+    Args:
+        content: Text content
+
+    Returns:
+        Pygments language name, or None if no lexer matches
+    """
+    if not content:
+        return None
+    try:
+        return guess_lexer(content[:GUESS_PREFIX_CHARS]).name
+    except ClassNotFound:
+        return None
+
+
+def detect_language(
+    filepath: Optional[Union[str, Path]] = None,
+    content: Optional[str] = None,
+    default: str = "text",
+) -> str:
+    """Detect the language of a file, by name first and by content as a fallback.
+
+    Args:
+        filepath: Optional file name or path
+        content: Optional text content
+        default: Language returned when detection fails
+
+    Returns:
+        Pygments language name or the default
+    """
+    language = language_for_filename(filepath) if filepath else None
+    if language is None and content:
+        language = guess_language(content)
+    return language or default
+
+
+def get_lexer(language: str) -> Optional[Lexer]:
+    """Get a shared lexer instance for a language.
+
+    Args:
+        language: Lexer name or alias (case-insensitive)
+
+    Returns:
+        Lexer instance or None if the language is unknown
+    """
+    return _lexer_by_class(_tables().classes.get(language.lower()))
+
+
+@lru_cache(maxsize=256)
+def _lexer_by_class(class_name: Optional[str]) -> Optional[Lexer]:
+    """Instantiate a lexer class once.
+
+    Args:
+        class_name: Pygments lexer class name
+
+    Returns:
+        Lexer instance or None without a class name
+    """
+    if class_name is None:
+        return None
+    return getattr(pygments.lexers, class_name)()
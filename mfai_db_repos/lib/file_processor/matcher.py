@@ -0,0 +1,390 @@
+"""
+Compiled glob pattern matching module.
+
+This module provides a single matcher object that compiles include, exclude and
+test glob patterns once, with consistent `**` semantics, so that matching cost per
+path stays roughly constant regardless of how many patterns are configured.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Pattern, Sequence, Tuple
+
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Matches a single simple extension pattern such as "**/*.py" or "*.py"
+_EXTENSION_PATTERN = re.compile(r"^(?:\*\*/)?\*(\.[^*?\[/]+)$")
+# Matches a directory-anywhere pattern such as "**/node_modules/**"
+_DIRECTORY_PATTERN = re.compile(r"^\*\*/([^*?\[/]+)/\*\*$")
+# Matches a literal basename-anywhere pattern such as "**/Makefile"
+_BASENAME_PATTERN = re.compile(r"^(?:\*\*/)?([^*?\[/]+)$")
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a glob pattern into a regular expression.
+
+    Semantics follow .gitignore-style globs:
+    - `**/` matches zero or more directories
+    - a trailing `/**` matches everything inside a directory
+    - `*` and `?` never match a path separator
+    - patterns without a slash match the basename at any depth
+
+    Args:
+        pattern: Glob pattern
+
+    Returns:
+        Regular expression source (without anchors)
+    """
+    pattern = pattern.replace("\\", "/")
+    anchored = pattern.startswith("/")
+    pattern = pattern.lstrip("/")
+
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == "*":
+            if pattern.startswith("**", i):
+                at_segment_start = i == 0 or pattern[i - 1] == "/"
+                if at_segment_start and pattern.startswith("**/", i):
+                    parts.append("(?:.*/)?")
+                    i += 3
+                    continue
+                parts.append(".*")
+                i += 2
+                continue
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = end + 1
+                continue
+        else:
+            parts.append(re.escape(char))
+        i += 1
+
+    regex = "".join(parts)
+    if not anchored and "/" not in pattern:
+        # Basename pattern: match at any depth
+        regex = f"(?:.*/)?{regex}"
+    return regex
+
+
+def normalize_path(path: str) -> str:
+    """Normalize a path string for pattern matching.
+
+    Args:
+        path: File or directory path
+
+    Returns:
+        Path using forward slashes without a leading "./"
+    """
+    if os.sep != "/":
+        path = path.replace(os.sep, "/")
+    path = path.replace("\\", "/")
+    while path.startswith("./"):
+        path = path[2:]
+    return path
+
+
+class _PatternGroup:
+    """A set of glob patterns compiled for fast membership tests.
+
+    Common pattern shapes are decomposed into hash lookups (extensions, directory
+    names, literal basenames); everything else is combined into one regex.
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        """Compile a group of patterns.
+
+        Args:
+            patterns: Glob patterns
+        """
+        self.patterns: Tuple[str, ...] = tuple(patterns)
+        self.extensions = set()
+        self.directory_names = set()
+        self.basenames = set()
+        regex_sources: List[str] = []
+        prefix_sources: List[str] = []
+
+        for pattern in self.patterns:
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+
+            match = _EXTENSION_PATTERN.match(pattern)
+            if match:
+                self.extensions.add(match.group(1))
+                continue
+
+            match = _DIRECTORY_PATTERN.match(pattern)
+            if match:
+                self.directory_names.add(match.group(1))
+                continue
+
+            match = _BASENAME_PATTERN.match(pattern)
+            if match:
+                self.basenames.add(match.group(1))
+                continue
+
+            regex_sources.append(glob_to_regex(pattern))
+            if pattern.endswith("/**"):
+                prefix_sources.append(glob_to_regex(pattern[:-3]))
+
+        self._regex: Optional[Pattern[str]] = (
+            re.compile("(?:" + "|".join(f"(?:{source})" for source in regex_sources) + r")\Z")
+            if regex_sources else None
+        )
+        self._prefix_regex: Optional[Pattern[str]] = (
+            re.compile("(?:" + "|".join(f"(?:{source})" for source in prefix_sources) + r")\Z")
+            if prefix_sources else None
+        )
+
+    def __bool__(self) -> bool:
+        """Whether the group contains any patterns."""
+        return bool(
+            self.extensions or self.directory_names or self.basenames or self._regex
+        )
+
+    def matches(self, path: str) -> bool:
+        """Check if a normalized path matches any pattern in the group.
+
+        Args:
+            path: Normalized path
+
+        Returns:
+            True if any pattern matches
+        """
+        basename = path.rsplit("/", 1)[-1]
+
+        if self.extensions:
+            dot = basename.find(".")
+            # Check every dotted suffix so "*.tar.gz" style patterns also work
+            while dot != -1:
+                if basename[dot:] in self.extensions:
+                    return True
+                dot = basename.find(".", dot + 1)
+
+        if self.basenames and basename in self.basenames:
+            return True
+
+        if self.directory_names and "/" in path:
+            for part in path.split("/")[:-1]:
+                if part in self.directory_names:
+                    return True
+
+        if self._regex is not None and self._regex.match(path):
+            return True
+
+        return False
+
+    def matches_directory(self, dir_path: str) -> bool:
+        """Check if every path inside a directory is matched by the group.
+
+        Args:
+            dir_path: Normalized directory path (without trailing slash)
+
+        Returns:
+            True if the whole directory subtree matches
+        """
+        if self.directory_names:
+            for part in dir_path.split("/"):
+                if part in self.directory_names:
+                    return True
+
+        if self._prefix_regex is not None and self._prefix_regex.match(dir_path):
+            return True
+
+        return False
+
+
+class PatternMatcher:
+    """Compiled include/exclude/test glob matcher shared by the file filters."""
+
+    def __init__(
+        self,
+        include_patterns: Optional[Iterable[str]] = None,
+        exclude_patterns: Optional[Iterable[str]] = None,
+        test_patterns: Optional[Iterable[str]] = None,
+        include_tests: bool = True,
+    ):
+        """Initialize a pattern matcher.
+
+        Args:
+            include_patterns: Glob patterns to include (empty means include all)
+            exclude_patterns: Glob patterns to exclude
+            test_patterns: Glob patterns identifying test files
+            include_tests: Whether test files are included (otherwise excluded)
+        """
+        self.include_patterns = tuple(include_patterns or ())
+        self.exclude_patterns = tuple(exclude_patterns or ())
+        self.test_patterns = tuple(test_patterns or ())
+        self.include_tests = include_tests
+
+        self._include = _PatternGroup(self.include_patterns)
+        self._exclude = _PatternGroup(self.exclude_patterns)
+        self._tests = _PatternGroup(self.test_patterns)
+
+    @classmethod
+    def from_config(
+        cls,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        include_tests: bool = False,
+    ) -> "PatternMatcher":
+        """Build a matcher, filling unspecified pattern lists from the configuration.
+
+        Test patterns are only applied when the exclude list comes from the
+        configuration, matching the behaviour of explicit exclude lists elsewhere.
+
+        Args:
+            include_patterns: Glob patterns to include (defaults to config)
+            exclude_patterns: Glob patterns to exclude (defaults to config)
+            include_tests: Whether to include test files and directories
+
+        Returns:
+            Cached PatternMatcher instance
+        """
+        from mfai_db_repos.utils.config import config
+        file_filter_config = config.config.file_filter
+
+        include = include_patterns or file_filter_config.include_patterns
+        test_patterns: Sequence[str] = ()
+        if exclude_patterns is None:
+            exclude_patterns = file_filter_config.exclude_patterns
+            test_patterns = getattr(file_filter_config, "test_patterns", ())
+
+        return get_pattern_matcher(
+            tuple(include),
+            tuple(exclude_patterns),
+            tuple(test_patterns),
+            include_tests,
+        )
+
+    def is_excluded(self, path: str) -> bool:
+        """Check if a path matches the exclude (or, when excluded, test) patterns.
+
+        Args:
+            path: File path
+
+        Returns:
+            True if the path is excluded
+        """
+        path = normalize_path(str(path))
+        if self._exclude.matches(path):
+            return True
+        return not self.include_tests and self._tests.matches(path)
+
+    def is_included(self, path: str) -> bool:
+        """Check if a path matches the include patterns.
+
+        Args:
+            path: File path
+
+        Returns:
+            True if there are no include patterns or one of them matches
+        """
+        if not self._include:
+            return True
+        return self._include.matches(normalize_path(str(path)))
+
+    def is_test(self, path: str) -> bool:
+        """Check if a path matches the test patterns.
+
+        Args:
+            path: File path
+
+        Returns:
+            True if the path looks like a test file
+        """
+        return self._tests.matches(normalize_path(str(path)))
+
+    def matches(self, path: str) -> bool:
+        """Check if a file path passes the include/exclude/test rules.
+
+        Args:
+            path: File path
+
+        Returns:
+            True if the file should be included
+        """
+        path = normalize_path(str(path))
+        if self._exclude.matches(path):
+            return False
+        if not self.include_tests and self._tests.matches(path):
+            return False
+        if not self._include:
+            return True
+        return self._include.matches(path)
+
+    def should_prune_directory(self, dir_path: str) -> bool:
+        """Check if a whole directory can be skipped without descending into it.
+
+        Args:
+            dir_path: Directory path
+
+        Returns:
+            True if every file under the directory would be excluded
+        """
+        dir_path = normalize_path(str(dir_path)).rstrip("/")
+        if self._exclude.matches_directory(dir_path):
+            return True
+        return not self.include_tests and self._tests.matches_directory(dir_path)
+
+
+@lru_cache(maxsize=64)
+def get_pattern_matcher(
+    include_patterns: Tuple[str, ...] = (),
+    exclude_patterns: Tuple[str, ...] = (),
+    test_patterns: Tuple[str, ...] = (),
+    include_tests: bool = True,
+) -> PatternMatcher:
+    """Get a cached compiled matcher for the given pattern lists.
+
+    Args:
+        include_patterns: Glob patterns to include
+        exclude_patterns: Glob patterns to exclude
+        test_patterns: Glob patterns identifying test files
+        include_tests: Whether test files are included
+
+    Returns:
+        PatternMatcher instance
+    """
+    return PatternMatcher(include_patterns, exclude_patterns, test_patterns, include_tests)
+
+
+@lru_cache(maxsize=1024)
+def _compile_single(pattern: str) -> _PatternGroup:
+    """Compile and cache a single glob pattern.
+
+    Args:
+        pattern: Glob pattern
+
+    Returns:
+        Compiled pattern group
+    """
+    return _PatternGroup((pattern,))
+
+
+def glob_match(path: str, pattern: str) -> bool:
+    """Check if a path matches a single glob pattern.
+
+    Args:
+        path: File path
+        pattern: Glob pattern
+
+    Returns:
+        True if the path matches
+    """
+    return _compile_single(pattern).matches(normalize_path(str(path)))
@@ -12,11 +12,9 @@ from typing import Dict, List, Optional, Tuple, Union
 
 import git
 import pygments
-import pygments.lexers
-from pygments.lexers import get_lexer_for_filename
 from pygments.token import Token
-from pygments.util import ClassNotFound
 
+from mfai_db_repos.lib.file_processor.languages import get_lexer, guess_language, language_for_filename
 from mfai_db_repos.lib.git.repository import GitRepository
 from mfai_db_repos.utils.logger import get_logger
 
@@ -101,22 +99,18 @@ class MetadataExtractor:
         repo_path = Path(git_repo.repo.working_dir)
         language_counts = Counter()
         
-        for root, _, files in os.walk(repo_path):
-            # Skip .git directory
-            if ".git" in Path(root).parts:
-                continue
+        for _root, dirs, files in os.walk(repo_path):
+            # Never descend into the .git directory
+            dirs[:] = [d for d in dirs if d != ".git"]
             
             for filename in files:
-                filepath = Path(root) / filename
-                
-                try:
-                    # Try to get lexer for the file
-                    lexer = get_lexer_for_filename(filepath.name)
-                    language = lexer.name
+                # Table lookup by file name, no lexer search per file
+                language = language_for_filename(filename)
+                if language:
                     language_counts[language] += 1
-                except ClassNotFound:
+                else:
                     # If no lexer found, use extension
-                    ext = filepath.suffix.lower()
+                    ext = os.path.splitext(filename)[1].lower()
                     if ext:
                         language_counts[ext[1:]] += 1  # Remove leading dot
                     else:
@@ -186,11 +180,7 @@ class MetadataExtractor:
             # If content is available, analyze it
             if content:
                 # Detect language
-                try:
-                    lexer = get_lexer_for_filename(filepath.name)
-                    metadata["language"] = lexer.name
-                except ClassNotFound:
-                    metadata["language"] = "text"
+                metadata["language"] = language_for_filename(filepath.name) or "text"
                 
                 # Count lines
                 lines = content.splitlines()
@@ -268,14 +258,10 @@ class MetadataExtractor:
             List of keywords
         """
         # Try to use Pygments for token extraction
-        try:
-            lexer = pygments.lexers.get_lexer_by_name(language.lower())
-        except ClassNotFound:
-            try:
-                lexer = pygments.lexers.guess_lexer(content)
-            except ClassNotFound:
-                # Fallback to regex-based extraction
-                return self._extract_keywords_with_regex(content)
+        lexer = get_lexer(language) or get_lexer(guess_language(content) or "")
+        if lexer is None:
+            # Fallback to regex-based extraction
+            return self._extract_keywords_with_regex(content)
         
         # Extract tokens using Pygments
         tokens = list(pygments.lex(content, lexer))
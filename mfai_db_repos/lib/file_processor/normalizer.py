@@ -7,14 +7,13 @@ for better analysis and embedding generation.
 import re
 import unicodedata
 from enum import Enum
-from typing import List, Optional, Tuple
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
 
 import pygments
-import pygments.lexers
 import pygments.formatters
-from pygments.lexers import guess_lexer
-from pygments.util import ClassNotFound
 
+from mfai_db_repos.lib.file_processor.languages import detect_language, get_lexer, guess_language
 from mfai_db_repos.utils.config import Config
 from mfai_db_repos.utils.logger import get_logger
 
@@ -112,6 +111,7 @@ class ContentNormalizer:
         content: str, 
         language: Optional[str] = None,
         normalization_level: Optional[NormalizationLevel] = None,
+        filepath: Optional[Union[str, Path]] = None,
     ) -> str:
         """Normalize content according to the specified level.
         
@@ -119,6 +119,7 @@ class ContentNormalizer:
             content: Content to normalize
             language: Language of the content (auto-detected if None)
             normalization_level: Override the default normalization level
+            filepath: Optional file name, used to detect the language without guessing
             
         Returns:
             Normalized content
@@ -131,7 +132,7 @@ class ContentNormalizer:
         
         # Detect language if not provided
         if not language:
-            language = self._detect_language(content)
+            language = self._detect_language(content, filepath)
         
         # Apply normalization based on level
         if level == NormalizationLevel.NONE:
@@ -146,21 +147,20 @@ class ContentNormalizer:
             logger.warning(f"Unknown normalization level: {level}, using standard")
             return self._apply_standard_normalization(content, language)
     
-    def _detect_language(self, content: str) -> str:
+    def _detect_language(self, content: str, filepath: Optional[Union[str, Path]] = None) -> str:
         """Detect the language of content.
         
+        The file name is looked up first; content is only guessed from a short
+        prefix when the name is unknown.
+        
         Args:
             content: Content to detect language for
+            filepath: Optional file name
             
         Returns:
-            Detected language
+            Detected language (lowercase, "text" if unknown)
         """
-        try:
-            lexer = guess_lexer(content)
-            return lexer.name.lower()
-        except ClassNotFound:
-            # Default to text if can't detect
-            return "text"
+        return detect_language(filepath, content).lower()
     
     def _apply_minimal_normalization(self, content: str) -> str:
         """Apply minimal normalization to content.
@@ -298,10 +298,7 @@ class ContentNormalizer:
                 # Don't try to format plain text
                 return content
             
-            try:
-                lexer = pygments.lexers.get_lexer_by_name(language.lower())
-            except ClassNotFound:
-                lexer = pygments.lexers.guess_lexer(content)
+            lexer = get_lexer(language) or get_lexer(guess_language(content) or "text")
             
             # Format the code
             formatter = pygments.formatters.get_formatter_by_name("text")
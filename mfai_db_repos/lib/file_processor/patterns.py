@@ -4,13 +4,12 @@ Configurable inclusion/exclusion patterns module.
 This module provides functionality for managing and applying file inclusion/exclusion patterns
 for repository processing.
 """
-import fnmatch
-import re
 from pathlib import Path
 from typing import Dict, List, Optional, Union
 
 from pydantic import BaseModel, Field
 
+from mfai_db_repos.lib.file_processor.matcher import get_pattern_matcher, glob_match
 from mfai_db_repos.utils.config import config
 from mfai_db_repos.utils.logger import get_logger
 
@@ -154,6 +153,12 @@ class PatternManager:
         paths = [Path(f) for f in files]
         filtered_paths = []
         
+        # Compile the patterns once for the whole file list
+        matcher = get_pattern_matcher(
+            tuple(pattern_config.include_patterns),
+            tuple(pattern_config.exclude_patterns),
+        )
+        
         for path in paths:
             # Check extensions
             if pattern_config.include_extensions:
@@ -166,30 +171,10 @@ class PatternManager:
                 if ext in pattern_config.exclude_extensions:
                     continue
             
-            # Check patterns
-            path_str = str(path)
-            
-            # Check exclude patterns
-            excluded = False
-            for pattern in pattern_config.exclude_patterns:
-                if self._matches_glob_pattern(path_str, pattern):
-                    excluded = True
-                    break
-            
-            if excluded:
+            # Check include/exclude patterns
+            if not matcher.matches(str(path)):
                 continue
             
-            # Check include patterns
-            if pattern_config.include_patterns:
-                included = False
-                for pattern in pattern_config.include_patterns:
-                    if self._matches_glob_pattern(path_str, pattern):
-                        included = True
-                        break
-                
-                if not included:
-                    continue
-            
             # Add to filtered paths
             filtered_paths.append(path)
         
@@ -206,15 +191,7 @@ class PatternManager:
         Returns:
             True if the path matches the pattern, False otherwise
         """
-        # Handle recursive glob patterns (**, which isn't natively supported in fnmatch)
-        if "**" in pattern:
-            # Convert ** to a regex pattern
-            regex_pattern = pattern.replace(".", r"\.").replace("**", ".*").replace("*", "[^/]*").replace("?", ".")
-            regex_pattern = f"^{regex_pattern}$"
-            return bool(re.match(regex_pattern, filepath))
-        else:
-            # Use fnmatch for simple patterns
-            return fnmatch.fnmatch(filepath, pattern)
+        return glob_match(filepath, pattern)
 
 
 class PatternSet:
@@ -297,17 +274,9 @@ class PatternSet:
             if self.exclude_types and file_type in self.exclude_types:
                 return False
         
-        # Check exclude patterns
-        for pattern in self.exclude_patterns:
-            if PatternManager()._matches_glob_pattern(filepath_str, pattern):
-                return False
-        
-        # Check include patterns
-        if self.include_patterns:
-            for pattern in self.include_patterns:
-                if PatternManager()._matches_glob_pattern(filepath_str, pattern):
-                    return True
-            return False  # No include pattern matched
-        
-        # If no include patterns, include all files that weren't excluded
-        return True
\ No newline at end of file
+        # Check include/exclude patterns
+        matcher = get_pattern_matcher(
+            tuple(self.include_patterns),
+            tuple(self.exclude_patterns),
+        )
+        return matcher.matches(filepath_str)
@@ -5,11 +5,14 @@ This module provides a configurable pipeline for extracting and processing
 file content from repositories, combining multiple processing steps.
 """
 import asyncio
+import math
 import os
-from dataclasses import dataclass
+import pickle
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from enum import Enum
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from mfai_db_repos.lib.file_processor.encoding import EncodingDetector
 from mfai_db_repos.lib.file_processor.extractor import FileExtractor
@@ -20,10 +23,17 @@ from mfai_db_repos.lib.file_processor.normalizer import ContentNormalizer, Norma
 from mfai_db_repos.lib.file_processor.tracker import FileStatus, FileStatusTracker
 from mfai_db_repos.lib.git.repository import GitRepository
 from mfai_db_repos.utils.config import Config
+from mfai_db_repos.utils.env import get_env
 from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Maximum number of files sent to a worker process in one task
+MAX_CHUNK_SIZE = 64
+
+# Chunks created per worker process, so faster workers pick up more of the work
+CHUNKS_PER_WORKER = 4
+
 
 class ProcessingStage(str, Enum):
     """Processing stages in the extraction pipeline."""
@@ -36,6 +46,14 @@ class ProcessingStage(str, Enum):
     PROCESSING = "processing"  # Custom processing stage
 
 
+class ExecutorMode(str, Enum):
+    """Ways of running the extraction pipeline over many files."""
+    
+    SERIAL = "serial"  # One file after another in the calling thread
+    THREAD = "thread"  # Thread pool (I/O bound work)
+    PROCESS = "process"  # Process pool with chunked work (CPU bound work)
+
+
 @dataclass
 class ProcessingResult:
     """Result of content extraction and processing."""
@@ -88,6 +106,23 @@ class ProcessingResult:
             "skipped": self.skipped,
             "skip_reason": self.skip_reason,
         }
+    
+    def __getstate__(self) -> Tuple[Any, ...]:
+        """Pickle as a tuple of field values instead of a dictionary with field names.
+        
+        Returns:
+            Field values in declaration order
+        """
+        return tuple(getattr(self, field.name) for field in fields(self))
+    
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        """Restore a result pickled by __getstate__.
+        
+        Args:
+            state: Field values in declaration order
+        """
+        for field, value in zip(fields(self), state, strict=True):
+            setattr(self, field.name, value)
 
 
 class ProcessingOptions:
@@ -136,6 +171,35 @@ class ProcessingOptions:
         self.follow_symlinks = follow_symlinks
 
 
+# Pipeline of the current worker process, created once by _init_worker
+_worker_pipeline: Optional["ExtractionPipeline"] = None
+
+
+def _init_worker(state: bytes) -> None:
+    """Create the pipeline of a worker process.
+    
+    Args:
+        state: Pickled (config, options, custom processors, ignore manager) of the parent pipeline
+    """
+    global _worker_pipeline
+    config, options, custom_processors, ignore_manager = pickle.loads(state)
+    _worker_pipeline = ExtractionPipeline(config=config, options=options, custom_processors=custom_processors)
+    _worker_pipeline.ignore_manager = ignore_manager
+
+
+def _process_chunk(filepaths: List[str], base_path: Optional[str]) -> List[ProcessingResult]:
+    """Process a chunk of files in a worker process.
+    
+    Args:
+        filepaths: File paths
+        base_path: Base path for relative paths
+        
+    Returns:
+        List of ProcessingResult objects in the order of the paths
+    """
+    return [_worker_pipeline.process_file(filepath, base_path) for filepath in filepaths]
+
+
 class ExtractionPipeline:
     """Pipeline for content extraction and processing."""
     
@@ -144,6 +208,8 @@ class ExtractionPipeline:
         config: Optional[Config] = None,
         options: Optional[ProcessingOptions] = None,
         custom_processors: Optional[Dict[ProcessingStage, List[Callable]]] = None,
+        executor: Union[ExecutorMode, str] = ExecutorMode.SERIAL,
+        chunk_size: Optional[int] = None,
     ):
         """Initialize an extraction pipeline.
         
@@ -151,10 +217,14 @@ class ExtractionPipeline:
             config: Optional Config instance
             options: Processing options
             custom_processors: Custom processing functions for each stage
+            executor: How to run the pipeline over many files (serial, thread or process)
+            chunk_size: Files per worker task in process mode (derived from the file count if None)
         """
         self.config = config or Config()
         self.options = options or ProcessingOptions()
         self.custom_processors = custom_processors or {}
+        self.executor = ExecutorMode(executor)
+        self.chunk_size = chunk_size
         
         # Initialize pipeline components
         self._init_components()
@@ -384,15 +454,11 @@ class ExtractionPipeline:
                 elif isinstance(encoding_result, str):
                     result.encoding = encoding_result
         
-        # If encoding wasn't set by custom processor, detect it
-        if not result.encoding:
-            encoding_result = self.encoding_detector.detect_file_encoding(filepath)
-            result.encoding = encoding_result.encoding
-        
-        # Extract content
-        content, _ = self.encoding_detector.read_file_with_encoding(
+        # Extract content, detecting the encoding from the same read unless a custom processor set it
+        content, encoding_result = self.encoding_detector.read_file_with_encoding(
             filepath, encoding=result.encoding
         )
+        result.encoding = encoding_result.encoding
         
         if content is None:
             result.skipped = True
@@ -439,6 +505,7 @@ class ExtractionPipeline:
                 result.content,
                 language=result.language,
                 normalization_level=self.options.normalization_level,
+                filepath=result.name,
             )
             result.normalized_content = normalized
             return True
@@ -528,13 +595,74 @@ class ExtractionPipeline:
         Returns:
             List of ProcessingResult objects
         """
-        results = []
+        mode = self._executor_mode(len(filepaths), max_workers)
         
-        for filepath in filepaths:
-            result = self.process_file(filepath, base_path)
-            results.append(result)
+        if mode == ExecutorMode.SERIAL:
+            return [self.process_file(filepath, base_path) for filepath in filepaths]
         
-        return results
+        if mode == ExecutorMode.THREAD:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(lambda filepath: self.process_file(filepath, base_path), filepaths))
+        
+        chunks = self._chunk_paths(filepaths, max_workers)
+        base = str(base_path) if base_path is not None else None
+        with self._create_process_pool(max_workers) as executor:
+            chunk_results = executor.map(_process_chunk, chunks, [base] * len(chunks))
+            return [result for chunk in chunk_results for result in chunk]
+    
+    def _executor_mode(self, file_count: int, max_workers: int) -> ExecutorMode:
+        """Choose the executor for a batch of files.
+        
+        Args:
+            file_count: Number of files in the batch
+            max_workers: Maximum number of concurrent workers
+            
+        Returns:
+            Executor mode to use
+        """
+        if file_count <= 1 or max_workers <= 1:
+            return ExecutorMode.SERIAL
+        
+        if self.executor == ExecutorMode.PROCESS:
+            try:
+                pickle.dumps(self.custom_processors)
+            except Exception:
+                logger.warning("Custom processors cannot be sent to worker processes, using threads")
+                return ExecutorMode.THREAD
+        
+        return self.executor
+    
+    def _chunk_paths(self, filepaths: List[Union[str, Path]], max_workers: int) -> List[List[str]]:
+        """Split file paths into chunks for worker processes.
+        
+        Args:
+            filepaths: List of file paths
+            max_workers: Number of worker processes
+            
+        Returns:
+            List of path chunks in the original order
+        """
+        chunk_size = self.chunk_size or min(
+            MAX_CHUNK_SIZE, max(1, math.ceil(len(filepaths) / (max_workers * CHUNKS_PER_WORKER)))
+        )
+        paths = [str(filepath) for filepath in filepaths]
+        return [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+    
+    def _create_process_pool(self, max_workers: int) -> Executor:
+        """Create a process pool whose workers each build this pipeline once.
+        
+        Args:
+            max_workers: Number of worker processes
+            
+        Returns:
+            ProcessPoolExecutor
+        """
+        state = pickle.dumps((self.config, self.options, self.custom_processors, self.ignore_manager))
+        return ProcessPoolExecutor(
+            max_workers=min(max_workers, os.cpu_count() or 1),
+            initializer=_init_worker,
+            initargs=(state,),
+        )
     
     async def process_files_async(
         self,
@@ -552,6 +680,16 @@ class ExtractionPipeline:
         Returns:
             List of ProcessingResult objects
         """
+        if self._executor_mode(len(filepaths), max_workers) == ExecutorMode.PROCESS:
+            loop = asyncio.get_running_loop()
+            chunks = self._chunk_paths(filepaths, max_workers)
+            base = str(base_path) if base_path is not None else None
+            with self._create_process_pool(max_workers) as executor:
+                chunk_results = await asyncio.gather(
+                    *(loop.run_in_executor(executor, _process_chunk, chunk, base) for chunk in chunks)
+                )
+            return [result for chunk in chunk_results for result in chunk]
+        
         async def process_file_task(filepath: Union[str, Path]) -> ProcessingResult:
             return self.process_file(filepath, base_path)
         
@@ -570,6 +708,47 @@ class ExtractionPipeline:
         
         return results
     
+    def _collect_files(
+        self,
+        directory_path: Path,
+        recursive: bool = True,
+        max_files: Optional[int] = None,
+    ) -> List[Path]:
+        """Collect file paths in a directory, skipping ignored directories.
+        
+        Args:
+            directory_path: Path to directory
+            recursive: Whether to descend into subdirectories
+            max_files: Maximum number of files to collect
+            
+        Returns:
+            List of file paths
+        """
+        filepaths = []
+        
+        if recursive:
+            for root, dirs, files in os.walk(directory_path):
+                # Prune ignored directories so the walk never enters them
+                dirs[:] = [
+                    d for d in dirs
+                    if not self.ignore_manager.is_directory_ignored(os.path.join(root, d))
+                ]
+                
+                for filename in files:
+                    filepaths.append(Path(root) / filename)
+                    
+                    if max_files and len(filepaths) >= max_files:
+                        return filepaths
+        else:
+            for entry in directory_path.iterdir():
+                if entry.is_file():
+                    filepaths.append(entry)
+                    
+                    if max_files and len(filepaths) >= max_files:
+                        break
+        
+        return filepaths
+    
     def process_directory(
         self,
         directory_path: Union[str, Path],
@@ -595,26 +774,7 @@ class ExtractionPipeline:
             return []
         
         # Collect all file paths
-        filepaths = []
-        
-        if recursive:
-            for root, _, files in os.walk(directory_path):
-                for filename in files:
-                    filepath = Path(root) / filename
-                    filepaths.append(filepath)
-                    
-                    if max_files and len(filepaths) >= max_files:
-                        break
-                
-                if max_files and len(filepaths) >= max_files:
-                    break
-        else:
-            for entry in directory_path.iterdir():
-                if entry.is_file():
-                    filepaths.append(entry)
-                    
-                    if max_files and len(filepaths) >= max_files:
-                        break
+        filepaths = self._collect_files(directory_path, recursive, max_files)
         
         # Process files
         return self.process_files(filepaths, base_path=directory_path, max_workers=max_workers)
@@ -644,26 +804,7 @@ class ExtractionPipeline:
             return []
         
         # Collect all file paths
-        filepaths = []
-        
-        if recursive:
-            for root, _, files in os.walk(directory_path):
-                for filename in files:
-                    filepath = Path(root) / filename
-                    filepaths.append(filepath)
-                    
-                    if max_files and len(filepaths) >= max_files:
-                        break
-                
-                if max_files and len(filepaths) >= max_files:
-                    break
-        else:
-            for entry in directory_path.iterdir():
-                if entry.is_file():
-                    filepaths.append(entry)
-                    
-                    if max_files and len(filepaths) >= max_files:
-                        break
+        filepaths = self._collect_files(directory_path, recursive, max_files)
         
         # Process files asynchronously
         return await self.process_files_async(
@@ -699,16 +840,25 @@ class ExtractionPipeline:
         
         # Get files to process
         if incremental:
-            # Get changed files
-            tracked_files = self.status_tracker.track_repository(git_repo)
-            filepaths = []
+            # Compare against the snapshot of the previous run if there is one
+            cache_path = get_env("TRACKER_CACHE_PATH")
+            repo_key = str(repo_path)
+            if cache_path and not self.status_tracker.status_cache:
+                self.status_tracker.load_cache(cache_path, repo_key)
+            snapshot_commit = self.status_tracker.last_commit_hash
             
-            for entry in tracked_files:
-                if entry.status != FileStatus.DELETED:
-                    filepaths.append(repo_path / entry.path)
-                    
-                    if max_files and len(filepaths) >= max_files:
-                        break
+            # Get changed files (stat-first against the tracked state, hashing only changed stats)
+            if self.status_tracker.status_cache:
+                tracked_files = self.status_tracker.track_directory(repo_path)
+                self.status_tracker.last_commit_hash = git_repo.get_last_commit()
+            else:
+                tracked_files = self.status_tracker.track_repository(git_repo)
+            changed = [entry for entry in tracked_files if entry.status != FileStatus.DELETED]
+            filepaths = [repo_path / entry.path for entry in changed[:max_files or None]]
+            
+            # Files left out by max_files must still show up as changed next time
+            for entry in changed[len(filepaths):]:
+                self.status_tracker.status_cache.pop(entry.path, None)
         else:
             # Process all files
             return self.process_directory(
@@ -716,4 +866,19 @@ class ExtractionPipeline:
             )
         
         # Process files
-        return self.process_files(filepaths, base_path=repo_path, max_workers=max_workers)
\ No newline at end of file
+        results = self.process_files(filepaths, base_path=repo_path, max_workers=max_workers)
+        
+        # Failed files must also show up as changed next time (results keep the order of filepaths)
+        failed = 0
+        for entry, result in zip(changed[:len(filepaths)], results, strict=True):
+            if not result.success and not result.skipped:
+                self.status_tracker.status_cache.pop(entry.path, None)
+                failed += 1
+        if failed:
+            logger.info(f"{failed} files failed and will be retried on the next incremental run")
+        
+        # Only rewrite the snapshot when something changed
+        if cache_path and (tracked_files or snapshot_commit != self.status_tracker.last_commit_hash):
+            self.status_tracker.save_cache(cache_path, repo_key)
+        
+        return results
\ No newline at end of file
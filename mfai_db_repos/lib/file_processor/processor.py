@@ -7,11 +7,19 @@ tracking changes, and updating the database accordingly.
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy import func, literal_column
 
 from mfai_db_repos.lib.database import RepositoryDB, RepositoryFileDB
 from mfai_db_repos.lib.database.connection import session_context
+from mfai_db_repos.lib.database.repository_file import (
+    BULK_UPSERT_CHUNK_SIZE,
+    BULK_UPSERT_MAX_BYTES,
+    estimate_row_bytes,
+)
 from mfai_db_repos.lib.file_processor.extractor import FileExtractor
+from mfai_db_repos.lib.file_processor.scanner import RepositoryScanner
 from mfai_db_repos.lib.git.repository import GitRepository, RepoStatus
 from mfai_db_repos.utils.config import config
 from mfai_db_repos.utils.logger import get_logger
@@ -164,27 +172,18 @@ class FileProcessor:
         if not git_repo.is_cloned() or not git_repo.repo:
             return 0
         
-        # Get all files recursively
+        # Get all files in a single pass, pruning excluded directories
         repo_path = Path(git_repo.repo.working_dir)
-        all_files = []
-        
-        for root, _, files in os.walk(repo_path):
-            # Skip .git directory
-            if ".git" in Path(root).parts:
-                continue
-            
-            # Process files
-            for filename in files:
-                filepath = Path(root) / filename
-                rel_path = filepath.relative_to(repo_path)
-                
-                # Check if the file should be processed
-                if self.extractor.should_process_file(
-                    filepath,
-                    self.include_patterns,
-                    self.exclude_patterns,
-                ):
-                    all_files.append(str(rel_path))
+        scanner = RepositoryScanner(
+            include_patterns=self.include_patterns,
+            exclude_patterns=self.exclude_patterns,
+            extractor=self.extractor,
+        )
+        all_files = [
+            candidate.path
+            for candidate in scanner.scan(repo_path)
+            if not candidate.is_binary
+        ]
         
         return await self._process_files(repo_id, git_repo, all_files)
 
@@ -238,71 +237,52 @@ class FileProcessor:
             file_paths: List of file paths relative to repository root
 
         Returns:
-            Number of processed files
+            Number of new files
         """
         if not git_repo.is_cloned() or not git_repo.repo:
             return 0
         
         repo_path = Path(git_repo.repo.working_dir)
         processed_count = 0
+        rows: List[Dict[str, Any]] = []
+        rows_bytes = 0
         
         # Process each file
         for i, rel_path in enumerate(file_paths):
             filepath = repo_path / rel_path
             
             try:
-                # Get file metadata
-                metadata = self.extractor.get_file_metadata(filepath)
-                
-                # Extract content
-                content = self.extractor.extract_content(filepath)
+                # Read the file once for its content and metadata
+                record = self.extractor.read_file(filepath)
                 
-                # Skip files with no content or empty content
-                if content is None or content.strip() == "":
+                # Skip unreadable, binary and empty files
+                if record is None or record.is_binary or not record.text or record.text.strip() == "":
                     logger.debug(f"Skipping empty file: {filepath}")
                     continue
                 
-                async with session_context() as session:
-                    file_repo = RepositoryFileDB(session)
-                    
-                    # Check if file already exists in database
-                    existing_file = await file_repo.get_by_path(repo_id, str(rel_path))
-                    
-                    if existing_file:
-                        # Update existing file
-                        # Create a copy of existing file and update fields
-                        existing_file.content = content
-                        existing_file.file_size = metadata["file_size"]
-                        existing_file.last_modified = metadata["last_modified"]
-                        
-                        # Add metadata if it doesn't exist
-                        if not existing_file.repo_metadata:
-                            existing_file.repo_metadata = {}
-                        
-                        # Update metadata
-                        if isinstance(existing_file.repo_metadata, dict):
-                            existing_file.repo_metadata["git_status"] = "modified"
-                            existing_file.repo_metadata["file_type"] = metadata["file_type"]
-                        
-                        # Update file
-                        await file_repo.update(existing_file)
-                    else:
-                        # Create new file
-                        rel_path_str = str(rel_path)
-                        new_file = await file_repo.create(
-                            repo_id=repo_id,
-                            filepath=rel_path_str,
-                            filename=Path(rel_path_str).name,
-                            extension=Path(rel_path_str).suffix.lower(),
-                            content=content,
-                            file_size=metadata["file_size"],
-                            last_modified=metadata["last_modified"],
-                            # Convert git_status to metadata
-                            metadata={"git_status": "added", "file_type": metadata["file_type"]}
-                        )
-                        
-                        if new_file:
-                            processed_count += 1
+                metadata = record.metadata
+                content = record.text
+                
+                rel_path_str = str(rel_path)
+                row = {
+                    "filepath": rel_path_str,
+                    "filename": Path(rel_path_str).name,
+                    "extension": Path(rel_path_str).suffix.lower(),
+                    "content": content,
+                    "file_size": metadata["file_size"],
+                    "last_modified": metadata["last_modified"],
+                    "git_status": "added",
+                    "repo_metadata": {"git_status": "added", "file_type": metadata["file_type"]},
+                }
+                rows.append(row)
+                rows_bytes += estimate_row_bytes(row)
+                
+                # Write files in bulk instead of one session per file, without
+                # holding more than one statement's worth of contents
+                if len(rows) >= BULK_UPSERT_CHUNK_SIZE or rows_bytes >= BULK_UPSERT_MAX_BYTES:
+                    processed_count += await self._write_files(repo_id, rows)
+                    rows = []
+                    rows_bytes = 0
                 
                 # Log progress every 100 files
                 if (i + 1) % 100 == 0:
@@ -311,8 +291,39 @@ class FileProcessor:
             except Exception as e:
                 logger.warning(f"Failed to process file {rel_path}: {e}")
         
+        processed_count += await self._write_files(repo_id, rows)
         return processed_count
 
+    async def _write_files(self, repo_id: int, rows: List[Dict[str, Any]]) -> int:
+        """Insert or update file rows in a single bulk upsert.
+
+        Existing files keep their analysis and embedding and are marked as modified,
+        both in the git_status column and in their metadata.
+
+        Args:
+            repo_id: Repository ID in the database
+            rows: File column values
+
+        Returns:
+            Number of new files
+        """
+        if not rows:
+            return 0
+        
+        conflict_values = {
+            "git_status": "modified",
+            "repo_metadata": lambda excluded: func.json_build_object(
+                literal_column("'git_status'"),
+                literal_column("'modified'"),
+                literal_column("'file_type'"),
+                excluded.repo_metadata["file_type"].as_string(),
+            ),
+        }
+        async with session_context() as session:
+            file_repo = RepositoryFileDB(session)
+            _, inserted = await file_repo.bulk_upsert_counts(repo_id, rows, conflict_values=conflict_values)
+            return inserted
+
     async def remove_deleted_files(self, repo_id: int, git_repo: GitRepository) -> int:
         """Remove files from the database that no longer exist in the repository.
 
@@ -0,0 +1,286 @@
+"""
+Data file sampling module.
+
+Model input and output files (arrays, tables, head and budget listings) are
+mostly repetitive numeric rows. This module detects such data-dominated text
+and replaces it with head and tail excerpts, the distinct text lines in
+between and statistics computed over the numeric rows, so the file can be
+described from a prompt orders of magnitude smaller than the file itself.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from mfai_db_repos.utils.env import get_int_env
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Number, including Fortran double precision exponents such as 1.0D+03. Each
+# digit run can only be matched one way, so failed matches never backtrack
+_NUMBER = r"[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eEdD][-+]?\d+)?"
+_NUMBER_PATTERN = re.compile(_NUMBER)
+
+# Separators between the numbers of a row: whitespace, commas or semicolons
+_SEPARATOR_PATTERN = re.compile(r"[\s,;]+")
+
+
+@dataclass
+class ColumnStats:
+    """Statistics of one column of numeric rows."""
+
+    count: int = 0
+    minimum: float = math.inf
+    maximum: float = -math.inf
+    total: float = 0.0
+
+    def add(self, value: float) -> None:
+        """Add a value to the statistics.
+
+        Args:
+            value: Numeric value
+        """
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def __str__(self) -> str:
+        if not self.count:
+            return "no values"
+        return f"min {self.minimum:.6g}, max {self.maximum:.6g}, mean {self.total / self.count:.6g}"
+
+
+@dataclass
+class DataProfile:
+    """Statistics of the numeric rows of a data file."""
+
+    total_chars: int = 0
+    total_lines: int = 0
+    data_lines: int = 0
+    data_chars: int = 0
+    sampled_rows: int = 0
+    column_counts: Counter = field(default_factory=Counter)
+    columns: List[ColumnStats] = field(default_factory=list)
+    values: ColumnStats = field(default_factory=ColumnStats)
+    headers: Counter = field(default_factory=Counter)  # Text line pattern -> occurrences
+
+    @property
+    def data_ratio(self) -> float:
+        """Share of the characters of the file in numeric rows."""
+        return min(1.0, self.data_chars / self.total_chars) if self.total_chars else 0.0
+
+
+class DataSampler:
+    """Replace data-dominated file content with excerpts and statistics."""
+
+    def __init__(
+        self,
+        min_chars: int = 20000,
+        min_data_ratio: float = 0.5,
+        head_lines: int = 40,
+        tail_lines: int = 20,
+        max_text_lines: int = 60,
+        max_columns: int = 12,
+        max_stats_rows: int = 50000,
+        max_line_chars: int = 300,
+    ):
+        """Initialize the sampler.
+
+        Args:
+            min_chars: Content shorter than this is never sampled
+            min_data_ratio: Minimum share of characters in numeric rows to sample
+            head_lines: Lines kept from the start of the file
+            tail_lines: Lines kept from the end of the file
+            max_text_lines: Distinct text lines kept from the middle of the file
+            max_columns: Columns described with their own statistics
+            max_stats_rows: Numeric rows parsed for statistics, evenly spaced beyond this
+            max_line_chars: Characters kept of each excerpt line
+        """
+        self.min_chars = min_chars
+        self.min_data_ratio = min_data_ratio
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.max_text_lines = max_text_lines
+        self.max_columns = max_columns
+        self.max_stats_rows = max_stats_rows
+        self.max_line_chars = max_line_chars
+
+    def profile(self, lines: List[str]) -> Tuple[DataProfile, List[int]]:
+        """Profile the lines of a file.
+
+        Args:
+            lines: Lines of the file
+
+        Returns:
+            Tuple of (profile, indices of the text lines that are not numeric rows)
+        """
+        profile = DataProfile(total_lines=len(lines))
+        data_indices = []
+        text_indices = []
+        for index, line in enumerate(lines):
+            profile.total_chars += len(line) + 1
+            if not line.strip():
+                continue
+            if _numeric_tokens(line) is not None:
+                profile.data_chars += len(line) + 1
+                data_indices.append(index)
+            else:
+                text_indices.append(index)
+                profile.headers[_line_pattern(line)] += 1
+        profile.data_lines = len(data_indices)
+
+        # Statistics over all numeric rows, or evenly spaced ones for very large files
+        step = max(1, math.ceil(len(data_indices) / self.max_stats_rows))
+        for index in data_indices[::step]:
+            values = [float(token.replace("D", "E").replace("d", "e")) for token in _numeric_tokens(lines[index])]
+            profile.sampled_rows += 1
+            profile.column_counts[len(values)] += 1
+            for column, value in enumerate(values):
+                if not math.isfinite(value):
+                    continue
+                profile.values.add(value)
+                if column < self.max_columns:
+                    while len(profile.columns) <= column:
+                        profile.columns.append(ColumnStats())
+                    profile.columns[column].add(value)
+        return profile, text_indices
+
+    def sample(self, content: str, filepath: Optional[str] = None) -> Optional[str]:
+        """Sample data-dominated content.
+
+        Args:
+            content: File content
+            filepath: Optional file path (for logging)
+
+        Returns:
+            Excerpts and statistics replacing the content, or None if the content
+            is short or not dominated by numeric rows
+        """
+        if self.min_chars <= 0 or len(content) < self.min_chars:
+            return None
+
+        lines = content.splitlines()
+        profile, text_indices = self.profile(lines)
+        profile.total_chars = len(content)
+        if profile.data_ratio < self.min_data_ratio:
+            return None
+
+        sampled = self._render(lines, profile, text_indices)
+        if len(sampled) >= len(content):
+            return None
+
+        logger.debug(
+            f"Sampled data file {filepath or ''} from {len(content)} to {len(sampled)} characters "
+            f"({profile.data_ratio:.0%} numeric rows)"
+        )
+        return sampled
+
+    def _render(self, lines: List[str], profile: DataProfile, text_indices: List[int]) -> str:
+        """Render the excerpts and statistics of a profiled file.
+
+        Args:
+            lines: Lines of the file
+            profile: Profile of the lines
+            text_indices: Indices of the text lines
+
+        Returns:
+            Sampled content
+        """
+        head_end = min(self.head_lines, len(lines))
+        tail_start = max(head_end, len(lines) - self.tail_lines)
+
+        summary = [
+            f"[Sampled data file: {profile.total_chars} characters, {profile.total_lines} lines, "
+            f"{profile.data_lines} numeric rows ({profile.data_ratio:.0%} of the content)]"
+        ]
+        if profile.column_counts:
+            common = profile.column_counts.most_common(6)
+            line = f"[Values per numeric row: {common[0][0]} in {common[0][1] / profile.sampled_rows:.0%} of rows"
+            if len(common) > 1:
+                line += "; also " + ", ".join(f"{columns} in {rows} rows" for columns, rows in common[1:])
+            summary.append(line + "]")
+        scope = "all" if profile.sampled_rows == profile.data_lines else f"{profile.sampled_rows} evenly spaced"
+        summary.append(f"[All values over {scope} numeric rows: {profile.values}]")
+        if len(profile.columns) > 1:
+            for column, stats in enumerate(profile.columns, start=1):
+                summary.append(f"[Column {column}: {stats}]")
+
+        repeated = [(pattern, count) for pattern, count in profile.headers.most_common(10) if count > 1]
+        if repeated:
+            summary.append("[Repeated text lines (numbers shown as #):]")
+            summary.extend(f"  {count} x {pattern}" for pattern, count in repeated)
+
+        # Distinct text lines between head and tail, e.g. block headers and messages
+        middle = []
+        seen = set()
+        for index in text_indices:
+            if index < head_end or index >= tail_start:
+                continue
+            pattern = _line_pattern(lines[index])
+            if pattern in seen:
+                continue
+            seen.add(pattern)
+            middle.append(f"{index + 1}: {self._clip(lines[index])}")
+            if len(middle) >= self.max_text_lines:
+                break
+
+        parts = [
+            "\n".join(summary),
+            f"--- First {head_end} lines ---",
+            "\n".join(self._clip(line) for line in lines[:head_end]),
+        ]
+        if middle:
+            parts += ["--- Distinct text lines in between (line number: text) ---", "\n".join(middle)]
+        if tail_start < len(lines):
+            parts += [
+                f"--- Last {len(lines) - tail_start} lines ---",
+                "\n".join(self._clip(line) for line in lines[tail_start:]),
+            ]
+        return "\n".join(parts)
+
+    def _clip(self, line: str) -> str:
+        """Clip an excerpt line to the maximum line length."""
+        line = line.rstrip()
+        if len(line) <= self.max_line_chars:
+            return line
+        return f"{line[:self.max_line_chars]} ... [{len(line) - self.max_line_chars} more characters]"
+
+
+def _numeric_tokens(line: str) -> Optional[List[str]]:
+    """Split a row of numbers separated by whitespace, commas or semicolons.
+
+    Args:
+        line: Line of a file
+
+    Returns:
+        The numbers of the row, or None if the line is not a numeric row
+    """
+    tokens = _SEPARATOR_PATTERN.split(line.strip())
+    if tokens[-1] == "":
+        tokens.pop()  # Trailing separator, e.g. "1, 2,"
+    if not tokens or not all(_NUMBER_PATTERN.fullmatch(token) for token in tokens):
+        return None
+    return tokens
+
+
+def _line_pattern(line: str) -> str:
+    """Get the pattern of a text line with numbers replaced by #."""
+    return " ".join(_NUMBER_PATTERN.sub("#", line).split())[:200]
+
+
+_default_sampler: Optional[DataSampler] = None
+
+
+def get_data_sampler() -> DataSampler:
+    """Get the data sampler configured from the environment.
+
+    Returns:
+        Shared DataSampler instance (DATA_SAMPLE_MIN_CHARS=0 disables sampling)
+    """
+    global _default_sampler
+    if _default_sampler is None:
+        _default_sampler = DataSampler(min_chars=get_int_env("DATA_SAMPLE_MIN_CHARS", 20000))
+    return _default_sampler
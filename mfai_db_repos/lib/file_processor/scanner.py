@@ -0,0 +1,234 @@
+"""
+Repository file scanning module.
+
+This module provides a single-pass file walker built on os.scandir that prunes
+excluded directories before descending into them and reuses the stat results
+from each directory entry, producing compact candidate records for later stages.
+"""
+import os
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+from mfai_db_repos.lib.file_processor.extractor import FileExtractor
+from mfai_db_repos.lib.file_processor.matcher import PatternMatcher
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Directory names that are never descended into, regardless of patterns
+ALWAYS_PRUNED_DIRS = {".git"}
+
+# Number of bytes sniffed from the start of a file to detect binary content
+BINARY_SNIFF_BYTES = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class FileCandidate:
+    """Compact record of a file discovered during a repository scan."""
+
+    path: str  # Path relative to the scanned root
+    abs_path: str  # Absolute path on disk
+    size: int  # File size in bytes
+    mtime: float  # Last modification time (seconds since epoch)
+    is_binary: bool  # Whether the file looks binary
+
+
+class RepositoryScanner:
+    """Single-pass repository walker with directory pruning."""
+
+    def __init__(
+        self,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        include_tests: bool = False,
+        max_file_size_mb: Optional[float] = None,
+        extractor: Optional[FileExtractor] = None,
+    ):
+        """Initialize a repository scanner.
+
+        Args:
+            include_patterns: List of glob patterns to include (defaults to config)
+            exclude_patterns: List of glob patterns to exclude (defaults to config)
+            include_tests: Whether to include test files and directories
+            max_file_size_mb: Maximum file size to accept in MB
+            extractor: Optional FileExtractor providing the size limit
+        """
+        self.extractor = extractor or FileExtractor(max_file_size_mb=max_file_size_mb)
+        self.max_file_size_bytes = self.extractor.max_file_size_bytes
+
+        # Compile the pattern lists once instead of per file
+        self.matcher = PatternMatcher.from_config(include_patterns, exclude_patterns, include_tests)
+
+    def scan(self, root: Union[str, Path], limit: Optional[int] = None) -> List[FileCandidate]:
+        """Scan a directory tree and return candidate files.
+
+        Files that fail the include/exclude patterns or exceed the maximum size are
+        skipped. Binary files are returned with is_binary set so callers can decide.
+
+        Args:
+            root: Root directory to scan
+            limit: Optional maximum number of candidates to return
+
+        Returns:
+            List of FileCandidate records in discovery order
+        """
+        root_str = os.path.abspath(str(root))
+        prefix_len = len(root_str.rstrip(os.sep)) + 1
+        candidates: List[FileCandidate] = []
+        pending = [root_str]
+
+        while pending:
+            current = pending.pop()
+            subdirs = []
+
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not self._is_pruned_dir(entry, entry.path[prefix_len:]):
+                                    subdirs.append(entry.path)
+                                continue
+
+                            if not entry.is_file():
+                                continue
+
+                            candidate = self._build_candidate(entry, entry.path[prefix_len:])
+                        except OSError as e:
+                            logger.debug(f"Skipping {entry.path}: {e}")
+                            continue
+
+                        if candidate is None:
+                            continue
+
+                        candidates.append(candidate)
+                        if limit is not None and limit > 0 and len(candidates) >= limit:
+                            return candidates
+            except OSError as e:
+                logger.warning(f"Failed to scan directory {current}: {e}")
+                continue
+
+            # Reverse so that directories are visited in scandir order
+            pending.extend(reversed(subdirs))
+
+        return candidates
+
+    def scan_paths(
+        self,
+        root: Union[str, Path],
+        rel_paths: Iterable[str],
+        limit: Optional[int] = None,
+    ) -> List[FileCandidate]:
+        """Build candidate records for a known set of paths instead of walking the tree.
+
+        The same pattern, size and binary checks as scan() are applied, so the
+        result matches what a full scan would return for those paths.
+
+        Args:
+            root: Root directory the paths are relative to
+            rel_paths: File paths relative to the root (e.g. from a git diff)
+            limit: Optional maximum number of candidates to return
+
+        Returns:
+            List of FileCandidate records in input order
+        """
+        root_str = os.path.abspath(str(root))
+        candidates: List[FileCandidate] = []
+
+        for rel_path in rel_paths:
+            parts = rel_path.split("/")
+            if any(part in ALWAYS_PRUNED_DIRS for part in parts[:-1]):
+                continue
+            if not self.matcher.matches(rel_path):
+                continue
+
+            abs_path = os.path.join(root_str, *parts)
+            try:
+                file_stat = os.stat(abs_path)
+            except OSError as e:
+                logger.debug(f"Skipping {abs_path}: {e}")
+                continue
+
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+            if file_stat.st_size > self.max_file_size_bytes:
+                logger.debug(f"Skipping {abs_path} due to size ({file_stat.st_size} bytes)")
+                continue
+
+            candidates.append(FileCandidate(
+                path=rel_path,
+                abs_path=abs_path,
+                size=file_stat.st_size,
+                mtime=file_stat.st_mtime,
+                is_binary=self._sniff_binary(abs_path, parts[-1]),
+            ))
+            if limit is not None and limit > 0 and len(candidates) >= limit:
+                break
+
+        return candidates
+
+    def _is_pruned_dir(self, entry: os.DirEntry, rel_path: str) -> bool:
+        """Check if a directory should be skipped without descending into it.
+
+        Args:
+            entry: Directory entry
+            rel_path: Directory path relative to the scanned root
+
+        Returns:
+            True if the directory subtree is excluded
+        """
+        if entry.name in ALWAYS_PRUNED_DIRS:
+            return True
+
+        return self.matcher.should_prune_directory(rel_path)
+
+    def _build_candidate(self, entry: os.DirEntry, rel_path: str) -> Optional[FileCandidate]:
+        """Build a candidate record for a file entry if it passes all checks.
+
+        Args:
+            entry: File directory entry
+            rel_path: File path relative to the scanned root
+
+        Returns:
+            FileCandidate or None if the file is filtered out
+        """
+        # Pattern checks are pure string work, so run them before touching the disk
+        if not self.matcher.matches(rel_path):
+            return None
+
+        # DirEntry caches the stat result
+        file_stat = entry.stat()
+        if file_stat.st_size > self.max_file_size_bytes:
+            logger.debug(f"Skipping {entry.path} due to size ({file_stat.st_size} bytes)")
+            return None
+
+        return FileCandidate(
+            path=rel_path,
+            abs_path=entry.path,
+            size=file_stat.st_size,
+            mtime=file_stat.st_mtime,
+            is_binary=self._sniff_binary(entry.path, entry.name),
+        )
+
+    def _sniff_binary(self, abs_path: str, name: str) -> bool:
+        """Check whether a file is binary by extension or by its first bytes.
+
+        Args:
+            abs_path: Absolute path to the file
+            name: File name
+
+        Returns:
+            True if the file is binary
+        """
+        extension = os.path.splitext(name)[1].lower()
+        if extension in FileExtractor.BINARY_EXTENSIONS:
+            return True
+
+        try:
+            with open(abs_path, "rb") as f:
+                return b"\x00" in f.read(BINARY_SNIFF_BYTES)
+        except OSError:
+            logger.warning(f"Failed to read file {abs_path}")
+            return True
@@ -6,17 +6,47 @@ allowing for efficient incremental processing.
 """
 import hashlib
 import os
+import sqlite3
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 from mfai_db_repos.lib.git.repository import GitRepository
 from mfai_db_repos.utils.config import Config
 from mfai_db_repos.utils.logger import get_logger
 
+try:
+    import xxhash
+except ImportError:
+    # xxhash is optional; "xxhash" falls back to blake2b without it
+    xxhash = None
+
 logger = get_logger(__name__)
 
+# Read buffer size used when hashing file contents
+HASH_BUFFER_BYTES = 1024 * 1024
+
+_SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    repo_key TEXT NOT NULL,
+    commit_hash TEXT NOT NULL DEFAULT '',
+    hash_algorithm TEXT NOT NULL,
+    created_at REAL NOT NULL DEFAULT (julianday('now')),
+    UNIQUE (repo_key, commit_hash)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    snapshot_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    content_hash TEXT,
+    PRIMARY KEY (snapshot_id, path)
+) WITHOUT ROWID;
+"""
+
 
 class FileStatus(str, Enum):
     """File status enum."""
@@ -40,6 +70,8 @@ class FileStatusEntry:
         size: Optional[int] = None,
         content_hash: Optional[str] = None,
         old_path: Optional[str] = None,
+        mtime_ns: Optional[int] = None,
+        inode: Optional[int] = None,
     ):
         """Initialize a file status entry.
         
@@ -50,13 +82,45 @@ class FileStatusEntry:
             size: File size in bytes
             content_hash: Hash of file content
             old_path: Previous path (for renamed files)
+            mtime_ns: Last modification time in nanoseconds
+            inode: Inode number
         """
         self.path = path
         self.status = status
-        self.last_modified = last_modified
+        self._last_modified = last_modified
         self.size = size
         self.content_hash = content_hash
         self.old_path = old_path
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+    
+    @property
+    def last_modified(self) -> Optional[datetime]:
+        """Last modification time (derived from mtime_ns when not set explicitly)."""
+        if self._last_modified is None and self.mtime_ns is not None:
+            self._last_modified = datetime.fromtimestamp(self.mtime_ns / 1e9)
+        return self._last_modified
+    
+    @last_modified.setter
+    def last_modified(self, value: Optional[datetime]) -> None:
+        self._last_modified = value
+    
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        """Check whether a file is unchanged according to its stat result.
+        
+        Args:
+            stat: Current stat result of the file
+            
+        Returns:
+            True if size, modification time and inode are unchanged
+        """
+        if self.mtime_ns is None:
+            return (
+                self.last_modified is not None
+                and stat.st_size == self.size
+                and stat.st_mtime == self.last_modified.timestamp()
+            )
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns and stat.st_ino == self.inode
     
     def __str__(self) -> str:
         """String representation of file status entry.
@@ -77,19 +141,30 @@ class FileStatusTracker:
         self,
         config: Optional[Config] = None,
         use_content_hash: bool = True,
-        hash_algorithm: str = "md5",
+        hash_algorithm: str = "blake2b",
         max_hash_size_mb: float = 10.0,
     ):
         """Initialize a file status tracker.
         
+        Content is only hashed when size, modification time or inode of a file
+        differ from the tracked entry.
+        
         Args:
             config: Optional Config instance
             use_content_hash: Whether to use content hashing for change detection
-            hash_algorithm: Hash algorithm to use (md5, sha1, sha256)
+            hash_algorithm: Hash algorithm to use (blake2b, xxhash, md5, sha1, sha256);
+                xxhash falls back to blake2b when it is not installed and unknown
+                names to md5
             max_hash_size_mb: Maximum file size in MB to hash
         """
         self.config = config or Config()
         self.use_content_hash = use_content_hash
+        # Snapshots record the algorithm actually used, so hashes are only
+        # compared with hashes of the same algorithm
+        if hash_algorithm == "xxhash" and xxhash is None:
+            hash_algorithm = "blake2b"
+        elif hash_algorithm not in ("blake2b", "xxhash", "md5", "sha1", "sha256"):
+            hash_algorithm = "md5"
         self.hash_algorithm = hash_algorithm
         self.max_hash_size_bytes = int(max_hash_size_mb * 1024 * 1024)
         
@@ -202,20 +277,11 @@ class FileStatusTracker:
             repo_path = Path(git_repo.repo.working_dir)
             all_files = []
             
-            for root, _, files in os.walk(repo_path):
-                # Skip .git directory
-                if ".git" in Path(root).parts:
-                    continue
-                
-                # Process files
-                for filename in files:
-                    filepath = Path(root) / filename
-                    rel_path = str(filepath.relative_to(repo_path))
-                    
-                    entry = self._track_new_file(git_repo, rel_path)
-                    if entry:
-                        all_files.append(entry)
-                        self.status_cache[entry.path] = entry
+            for rel_path, abs_path, stat in self._walk_files(repo_path):
+                entry = self._create_status_entry(abs_path, rel_path, FileStatus.NEW, stat)
+                if entry:
+                    all_files.append(entry)
+                    self.status_cache[entry.path] = entry
             
             return all_files
         except Exception as e:
@@ -250,49 +316,38 @@ class FileStatusTracker:
             current_files = set()
             changed_files = []
             
-            for root, _, files in os.walk(directory_path):
-                for filename in files:
-                    filepath = Path(root) / filename
-                    rel_path = str(filepath.relative_to(directory_path))
-                    current_files.add(rel_path)
-                    
-                    if rel_path in baseline:
-                        # Check if file was modified
-                        baseline_entry = baseline[rel_path]
-                        stat = filepath.stat()
-                        
-                        # Check modification time and size
-                        if (stat.st_mtime != baseline_entry.last_modified.timestamp() or
-                            stat.st_size != baseline_entry.size):
-                            
-                            # Check content hash if enabled
-                            if self.use_content_hash and baseline_entry.content_hash:
-                                current_hash = self._compute_file_hash(filepath)
-                                if current_hash != baseline_entry.content_hash:
-                                    entry = self._create_status_entry(
-                                        filepath, 
-                                        rel_path, 
-                                        FileStatus.MODIFIED
-                                    )
-                                    changed_files.append(entry)
-                                    self.status_cache[rel_path] = entry
-                            else:
-                                entry = self._create_status_entry(
-                                    filepath, 
-                                    rel_path, 
-                                    FileStatus.MODIFIED
-                                )
-                                changed_files.append(entry)
-                                self.status_cache[rel_path] = entry
-                    else:
-                        # New file
-                        entry = self._create_status_entry(
-                            filepath, 
-                            rel_path, 
-                            FileStatus.NEW
-                        )
+            for rel_path, filepath, stat in self._walk_files(directory_path):
+                current_files.add(rel_path)
+                baseline_entry = baseline.get(rel_path)
+                
+                if baseline_entry is None:
+                    # New file
+                    entry = self._create_status_entry(filepath, rel_path, FileStatus.NEW, stat)
+                    if entry:
                         changed_files.append(entry)
                         self.status_cache[rel_path] = entry
+                    continue
+                
+                # Unchanged size, mtime and inode: no need to read the file
+                if baseline_entry.matches_stat(stat):
+                    continue
+                
+                entry = self._create_status_entry(filepath, rel_path, FileStatus.MODIFIED, stat)
+                if entry is None:
+                    continue
+                
+                if (
+                    self.use_content_hash
+                    and baseline_entry.content_hash
+                    and entry.content_hash == baseline_entry.content_hash
+                ):
+                    # Touched but identical; remember the new stat so it is not hashed again
+                    entry.status = FileStatus.UNCHANGED
+                    self.status_cache[rel_path] = entry
+                    continue
+                
+                changed_files.append(entry)
+                self.status_cache[rel_path] = entry
             
             # Check for deleted files
             for path in set(baseline.keys()) - current_files:
@@ -309,6 +364,37 @@ class FileStatusTracker:
             logger.error(f"Error tracking directory changes: {e}")
             return []
     
+    def _walk_files(self, root: Path) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """Walk the regular files below a directory, skipping .git directories.
+        
+        Args:
+            root: Directory to walk
+            
+        Yields:
+            Tuples of (path relative to root, absolute path, stat result)
+        """
+        root_str = str(root)
+        prefix_len = len(root_str.rstrip(os.sep)) + 1
+        pending = [root_str]
+        
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name != ".git":
+                                    pending.append(entry.path)
+                                continue
+                            if not entry.is_file():
+                                continue
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        yield entry.path[prefix_len:], entry.path, stat
+            except OSError as e:
+                logger.warning(f"Cannot read directory: {e}")
+    
     def _track_new_file(
         self,
         git_repo: GitRepository,
@@ -410,27 +496,37 @@ class FileStatusTracker:
     
     def _create_status_entry(
         self,
-        abs_path: Path,
+        abs_path: Union[str, Path],
         rel_path: str,
         status: FileStatus,
+        stat: Optional[os.stat_result] = None,
     ) -> Optional[FileStatusEntry]:
         """Create a file status entry.
         
+        The content hash of a tracked entry with the same size, modification time
+        and inode is reused instead of reading the file again.
+        
         Args:
             abs_path: Absolute file path
             rel_path: File path relative to repository root
             status: File status
+            stat: Optional stat result of the file, if already known
             
         Returns:
             FileStatusEntry or None if error
         """
         try:
-            stat = abs_path.stat()
+            if stat is None:
+                stat = os.stat(abs_path)
             
             # Compute content hash if enabled
             content_hash = None
             if self.use_content_hash and stat.st_size <= self.max_hash_size_bytes:
-                content_hash = self._compute_file_hash(abs_path)
+                known = self.status_cache.get(rel_path)
+                if known is not None and known.content_hash and known.matches_stat(stat):
+                    content_hash = known.content_hash
+                else:
+                    content_hash = self._compute_file_hash(abs_path)
             
             return FileStatusEntry(
                 path=rel_path,
@@ -438,12 +534,14 @@ class FileStatusTracker:
                 last_modified=datetime.fromtimestamp(stat.st_mtime),
                 size=stat.st_size,
                 content_hash=content_hash,
+                mtime_ns=stat.st_mtime_ns,
+                inode=stat.st_ino,
             )
         except Exception as e:
             logger.warning(f"Error creating status entry for {rel_path}: {e}")
             return None
     
-    def _compute_file_hash(self, filepath: Path) -> Optional[str]:
+    def _compute_file_hash(self, filepath: Union[str, Path]) -> Optional[str]:
         """Compute a hash of file content.
         
         Args:
@@ -454,19 +552,26 @@ class FileStatusTracker:
         """
         try:
             # Choose hash algorithm
-            if self.hash_algorithm == "md5":
-                hasher = hashlib.md5()
+            if self.hash_algorithm == "xxhash":
+                hasher = xxhash.xxh3_128()
+            elif self.hash_algorithm == "blake2b":
+                hasher = hashlib.blake2b(digest_size=16)
             elif self.hash_algorithm == "sha1":
                 hasher = hashlib.sha1()
             elif self.hash_algorithm == "sha256":
                 hasher = hashlib.sha256()
             else:
-                hasher = hashlib.md5()  # Default to MD5
+                hasher = hashlib.md5()
             
-            # Read and hash file in chunks
-            with open(filepath, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hasher.update(chunk)
+            # Read and hash file in large chunks into a reused buffer
+            buffer = bytearray(HASH_BUFFER_BYTES)
+            view = memoryview(buffer)
+            with open(filepath, "rb", buffering=0) as f:
+                while True:
+                    count = f.readinto(buffer)
+                    if not count:
+                        break
+                    hasher.update(view[:count])
             
             return hasher.hexdigest()
         except Exception as e:
@@ -497,26 +602,127 @@ class FileStatusTracker:
         self.status_cache.clear()
         self.last_commit_hash = None
     
-    def save_cache(self, cache_file: Union[str, Path]) -> bool:
-        """Save the status cache to a file.
+    @staticmethod
+    def _open_snapshot_db(cache_file: Union[str, Path]) -> sqlite3.Connection:
+        """Open (or create) a snapshot database.
         
         Args:
-            cache_file: Path to cache file
+            cache_file: Path to the SQLite snapshot file
             
         Returns:
-            True if successful, False otherwise
+            SQLite connection
         """
-        # TODO: Implement cache serialization
-        return False
+        cache_path = Path(cache_file).expanduser()
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(cache_path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SNAPSHOT_SCHEMA)
+        return conn
     
-    def load_cache(self, cache_file: Union[str, Path]) -> bool:
-        """Load the status cache from a file.
+    def save_cache(self, cache_file: Union[str, Path], repo_key: str = "default") -> bool:
+        """Save the status cache as the snapshot of a repository at the last tracked commit.
+        
+        Older snapshots of the same repository are replaced.
         
         Args:
-            cache_file: Path to cache file
+            cache_file: Path to the SQLite snapshot file
+            repo_key: Key of the repository (e.g. its URL or clone path)
             
         Returns:
             True if successful, False otherwise
         """
-        # TODO: Implement cache deserialization
-        return False
\ No newline at end of file
+        rows = [
+            (entry.path, entry.size, entry.mtime_ns, entry.inode, entry.content_hash)
+            for entry in self.status_cache.values()
+            if entry.status != FileStatus.DELETED and entry.mtime_ns is not None
+        ]
+        
+        try:
+            conn = self._open_snapshot_db(cache_file)
+            try:
+                with conn:
+                    conn.execute(
+                        "DELETE FROM entries WHERE snapshot_id IN (SELECT id FROM snapshots WHERE repo_key = ?)",
+                        (repo_key,),
+                    )
+                    conn.execute("DELETE FROM snapshots WHERE repo_key = ?", (repo_key,))
+                    snapshot_id = conn.execute(
+                        "INSERT INTO snapshots (repo_key, commit_hash, hash_algorithm) VALUES (?, ?, ?)",
+                        (repo_key, self.last_commit_hash or "", self.hash_algorithm),
+                    ).lastrowid
+                    conn.executemany(
+                        "INSERT INTO entries (snapshot_id, path, size, mtime_ns, inode, content_hash) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        ((snapshot_id, *row) for row in rows),
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to save file status snapshot to {cache_file}: {e}")
+            return False
+        
+        logger.debug(f"Saved file status snapshot of {len(rows)} files for {repo_key}")
+        return True
+    
+    def load_cache(
+        self,
+        cache_file: Union[str, Path],
+        repo_key: str = "default",
+        commit_hash: Optional[str] = None,
+    ) -> bool:
+        """Load the snapshot of a repository into the status cache.
+        
+        Loaded entries have status UNCHANGED. Content hashes are only kept if the
+        snapshot was written with the same hash algorithm.
+        
+        Args:
+            cache_file: Path to the SQLite snapshot file
+            repo_key: Key of the repository
+            commit_hash: Optional commit the snapshot must have been taken at
+            
+        Returns:
+            True if a snapshot was loaded, False otherwise
+        """
+        if not Path(cache_file).expanduser().exists():
+            return False
+        
+        try:
+            conn = self._open_snapshot_db(cache_file)
+            try:
+                query = "SELECT id, commit_hash, hash_algorithm FROM snapshots WHERE repo_key = ?"
+                params: Tuple[str, ...] = (repo_key,)
+                if commit_hash is not None:
+                    query += " AND commit_hash = ?"
+                    params += (commit_hash,)
+                snapshot = conn.execute(query + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+                if snapshot is None:
+                    return False
+                
+                snapshot_id, snapshot_commit, hash_algorithm = snapshot
+                same_hash = hash_algorithm == self.hash_algorithm
+                rows = conn.execute(
+                    "SELECT path, size, mtime_ns, inode, content_hash FROM entries WHERE snapshot_id = ?",
+                    (snapshot_id,),
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to load file status snapshot from {cache_file}: {e}")
+            return False
+        
+        self.status_cache = {
+            path: FileStatusEntry(
+                path=path,
+                status=FileStatus.UNCHANGED,
+                size=size,
+                content_hash=content_hash if same_hash else None,
+                mtime_ns=mtime_ns,
+                inode=inode,
+            )
+            for path, size, mtime_ns, inode, content_hash in rows
+        }
+        self.last_commit_hash = snapshot_commit or None
+        
+        logger.debug(f"Loaded file status snapshot of {len(rows)} files for {repo_key}")
+        return True
\ No newline at end of file
@@ -4,6 +4,7 @@ Git module for the GitContext application.
 This module provides functionality for working with Git repositories,
 including cloning, updating, and extracting content.
 """
-from mfai_db_repos.lib.git.repository import GitRepository, RepoStatus
+from mfai_db_repos.lib.git.object_reader import AsyncCatFileReader, CatFileReader, GitObject
+from mfai_db_repos.lib.git.repository import FileChanges, GitRepository, RepoStatus
 
-__all__ = ["GitRepository", "RepoStatus"]
+__all__ = ["AsyncCatFileReader", "CatFileReader", "FileChanges", "GitObject", "GitRepository", "RepoStatus"]
@@ -0,0 +1,341 @@
+"""
+Git object store reader module.
+
+This module provides readers that stream object contents from a long-lived
+`git cat-file --batch` process, so files can be read at any revision without a
+checkout and without starting a git process per file.
+"""
+import asyncio
+import subprocess
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple, Union
+
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Object types of cat-file response headers
+OBJECT_TYPES = frozenset({"blob", "tree", "commit", "tag"})
+
+
+@dataclass(frozen=True)
+class GitObject:
+    """Object read from the git object store."""
+
+    sha: str
+    type: str  # "blob", "tree", "commit" or "tag"
+    data: bytes
+
+
+def _object_name(revision: str, path: str) -> str:
+    """Build the object name of a file at a revision.
+
+    Args:
+        revision: Git revision (commit hash, branch, tag)
+        path: File path relative to the repository root
+
+    Returns:
+        Object name understood by git cat-file
+    """
+    return f"{revision}:{path}"
+
+
+def _parse_header(header: bytes, name: str) -> Optional[Tuple[str, str, int]]:
+    """Parse a cat-file response header.
+
+    Args:
+        header: Header line without the trailing newline
+        name: Requested object name
+
+    Returns:
+        Tuple of (sha, type, size), or None if the object does not exist or the
+        header is not an object header
+    """
+    # "<name> missing" and "<name> ambiguous" echo the name, which may contain spaces
+    if header.endswith((b" missing", b" ambiguous")):
+        logger.debug(f"Git object not found: {name}")
+        return None
+
+    parts = header.decode("utf-8", errors="replace").split(" ")
+    if len(parts) != 3 or parts[1] not in OBJECT_TYPES or not parts[2].isdigit():
+        logger.warning(f"Unexpected git cat-file response for {name}: {header[:200]!r}")
+        return None
+
+    sha, object_type, size = parts
+    return sha, object_type, int(size)
+
+
+class CatFileReader:
+    """Thread-safe reader backed by one `git cat-file --batch` process."""
+
+    def __init__(self, git_dir: Union[str, Path], git_executable: str = "git"):
+        """Initialize the reader. The git process starts on first use.
+
+        Args:
+            git_dir: Path to the repository (working tree, .git directory or bare mirror)
+            git_executable: Git executable to run
+        """
+        self.git_dir = str(git_dir)
+        self.git_executable = git_executable
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        """Start the cat-file process if it is not running.
+
+        Returns:
+            Running cat-file process
+        """
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                [self.git_executable, "cat-file", "--batch"],
+                cwd=self.git_dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._process
+
+    def read(self, name: str) -> Optional[GitObject]:
+        """Read an object by sha or revision expression.
+
+        Args:
+            name: Object name (e.g. a blob sha or "HEAD:path/to/file.py")
+
+        Returns:
+            GitObject or None if the object does not exist
+        """
+        if "\n" in name:
+            return None
+
+        with self._lock:
+            for attempt in range(2):
+                process = self._ensure_process()
+                try:
+                    process.stdin.write(name.encode("utf-8") + b"\n")
+                    process.stdin.flush()
+
+                    header = process.stdout.readline()
+                    if not header:
+                        raise BrokenPipeError("git cat-file exited")
+
+                    parsed = _parse_header(header.rstrip(b"\n"), name)
+                    if parsed is None:
+                        return None
+
+                    sha, object_type, size = parsed
+                    data = process.stdout.read(size)
+                    process.stdout.read(1)  # Trailing newline
+                    return GitObject(sha=sha, type=object_type, data=data)
+                except (BrokenPipeError, OSError) as e:
+                    # Restart the process once if it died
+                    self._terminate()
+                    if attempt:
+                        logger.error(f"Failed to read git object {name}: {e}")
+                        return None
+        return None
+
+    def read_blob(self, revision: str, path: str) -> Optional[bytes]:
+        """Read the content of a file at a revision.
+
+        Args:
+            revision: Git revision (commit hash, branch, tag)
+            path: File path relative to the repository root
+
+        Returns:
+            File content as bytes, or None if the file does not exist
+        """
+        obj = self.read(_object_name(revision, path))
+        if obj is None or obj.type != "blob":
+            return None
+        return obj.data
+
+    def _terminate(self) -> None:
+        """Stop the cat-file process."""
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._process = None
+
+    def close(self) -> None:
+        """Stop the cat-file process."""
+        with self._lock:
+            self._terminate()
+
+    def __enter__(self) -> "CatFileReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class AsyncCatFileReader:
+    """Asyncio reader sharing one `git cat-file --batch` process between coroutines.
+
+    Requests are pipelined: callers write their object names as they arrive and a
+    single background task reads the responses in order and hands each one back.
+    """
+
+    def __init__(self, git_dir: Union[str, Path], git_executable: str = "git"):
+        """Initialize the reader. The git process starts on first use.
+
+        Args:
+            git_dir: Path to the repository (working tree, .git directory or bare mirror)
+            git_executable: Git executable to run
+        """
+        self.git_dir = str(git_dir)
+        self.git_executable = git_executable
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._pending: Deque[Tuple[str, asyncio.Future]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    async def _ensure_process(self) -> asyncio.subprocess.Process:
+        """Start the cat-file process and the response reader if needed.
+
+        Returns:
+            Running cat-file process
+        """
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._reader_task is not None and self._reader_task.done():
+                # The reader stopped after an error; start over with a fresh process
+                if self._process is not None and self._process.returncode is None:
+                    self._process.kill()
+                self._process = None
+
+            if self._process is None or self._process.returncode is not None:
+                self._process = await asyncio.create_subprocess_exec(
+                    self.git_executable, "cat-file", "--batch",
+                    cwd=self.git_dir,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                    limit=1 << 20,
+                )
+                self._wakeup = asyncio.Event()
+                self._reader_task = asyncio.create_task(self._read_responses(self._process))
+        return self._process
+
+    async def _read_responses(self, process: asyncio.subprocess.Process) -> None:
+        """Read responses in request order and resolve the waiting futures.
+
+        Args:
+            process: cat-file process to read from
+        """
+        try:
+            while True:
+                while not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+
+                name, future = self._pending[0]
+                header = await process.stdout.readline()
+                if not header:
+                    raise BrokenPipeError("git cat-file exited")
+
+                parsed = _parse_header(header.rstrip(b"\n"), name)
+                result = None
+                if parsed is not None:
+                    sha, object_type, size = parsed
+                    data = await process.stdout.readexactly(size + 1)
+                    result = GitObject(sha=sha, type=object_type, data=data[:-1])
+
+                self._pending.popleft()
+                if not future.done():
+                    future.set_result(result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Git object reader failed: {e}")
+            while self._pending:
+                _, future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(e)
+
+    async def read(self, name: str) -> Optional[GitObject]:
+        """Read an object by sha or revision expression.
+
+        Args:
+            name: Object name (e.g. a blob sha or "HEAD:path/to/file.py")
+
+        Returns:
+            GitObject or None if the object does not exist
+        """
+        if "\n" in name:
+            return None
+
+        process = await self._ensure_process()
+        future = asyncio.get_running_loop().create_future()
+
+        # Queue and write without awaiting in between, so responses stay in request order
+        self._pending.append((name, future))
+        process.stdin.write(name.encode("utf-8") + b"\n")
+        self._wakeup.set()
+        await process.stdin.drain()
+
+        return await future
+
+    async def read_blob(self, revision: str, path: str) -> Optional[bytes]:
+        """Read the content of a file at a revision.
+
+        Args:
+            revision: Git revision (commit hash, branch, tag)
+            path: File path relative to the repository root
+
+        Returns:
+            File content as bytes, or None if the file does not exist
+        """
+        obj = await self.read(_object_name(revision, path))
+        if obj is None or obj.type != "blob":
+            return None
+        return obj.data
+
+    async def read_blobs(self, revision: str, paths: List[str]) -> List[Optional[bytes]]:
+        """Read the contents of many files at a revision with all requests in flight.
+
+        Args:
+            revision: Git revision (commit hash, branch, tag)
+            paths: File paths relative to the repository root
+
+        Returns:
+            File contents in the order of the paths (None for missing files)
+        """
+        return list(await asyncio.gather(*(self.read_blob(revision, path) for path in paths)))
+
+    async def close(self) -> None:
+        """Stop the cat-file process and the response reader."""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+
+        if self._process is not None:
+            if self._process.returncode is None:
+                self._process.stdin.close()
+                try:
+                    await asyncio.wait_for(self._process.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    self._process.kill()
+            self._process = None
+
+        while self._pending:
+            _, future = self._pending.popleft()
+            if not future.done():
+                future.cancel()
@@ -4,6 +4,7 @@ Git repository management module.
 This module provides functionality for cloning, updating, and managing Git repositories.
 """
 import shutil
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
@@ -13,11 +14,42 @@ import git
 from git import GitCommandError, Repo
 from git.objects import Commit
 
+from mfai_db_repos.lib.git.object_reader import AsyncCatFileReader, CatFileReader
 from mfai_db_repos.utils.config import config
 from mfai_db_repos.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Bytes read per chunk when streaming `git log` output
+COMMIT_MAP_READ_SIZE = 64 * 1024
+
+# Files always checked out in sparse clones (ignore rules and README context, with
+# README matched in any letter case, e.g. Readme.md or ReadMe.rst)
+SPARSE_ALWAYS_INCLUDED = ["/[Rr][Ee][Aa][Dd][Mm][Ee]*", ".gitignore"]
+
+
+def sparse_checkout_patterns(include_patterns: List[str], exclude_patterns: List[str]) -> List[str]:
+    """Translate file filter globs into non-cone sparse-checkout patterns.
+    
+    Include globs are used as they are (gitignore syntax understands ``**``).
+    Only excludes of whole directory subtrees (``dir/**``) are translated, as
+    those have the same meaning in both syntaxes; the scanner still applies
+    the complete filter to the checked out files.
+    
+    Args:
+        include_patterns: Glob patterns of files to include
+        exclude_patterns: Glob patterns of files to exclude
+        
+    Returns:
+        Sparse-checkout patterns in gitignore syntax
+    """
+    patterns = list(include_patterns) + SPARSE_ALWAYS_INCLUDED
+    for pattern in exclude_patterns:
+        directory = pattern[:-3] if pattern.endswith("/**") else None
+        if directory and directory.strip("*/") and directory.strip("*/") != ".git":
+            patterns.append(f"!{pattern}")
+    return patterns
+
 
 class RepoStatus(str, Enum):
     """Repository status enumeration."""
@@ -31,6 +63,25 @@ class RepoStatus(str, Enum):
     ERROR = "error"
 
 
+@dataclass
+class FileChanges:
+    """Files changed between two commits."""
+
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    renamed: List[Tuple[str, str]] = field(default_factory=list)  # (old path, new path), content unchanged
+
+    @property
+    def to_process(self) -> List[str]:
+        """Get the paths whose content needs to be (re)processed."""
+        return self.added + self.modified
+
+    def __len__(self) -> int:
+        """Get the total number of changed paths."""
+        return len(self.added) + len(self.modified) + len(self.deleted) + len(self.renamed)
+
+
 class GitRepository:
     """Git repository management class."""
 
@@ -40,6 +91,8 @@ class GitRepository:
         clone_path: Optional[Union[str, Path]] = None,
         branch: Optional[str] = None,
         depth: Optional[int] = None,
+        clone_filter: Optional[str] = None,
+        sparse_patterns: Optional[List[str]] = None,
     ):
         """Initialize a Git repository manager.
 
@@ -48,6 +101,9 @@ class GitRepository:
             clone_path: Path where the repository should be cloned (defaults to config)
             branch: Branch to clone (defaults to config)
             depth: Depth limit for clone (defaults to config)
+            clone_filter: Partial clone filter such as "blob:none" (defaults to config, "" for none)
+            sparse_patterns: Sparse-checkout patterns (defaults to the file filter patterns
+                if sparse checkout is enabled in config, [] for a full checkout)
         """
         self.url = url
         self.name = self._extract_repo_name(url)
@@ -57,10 +113,28 @@ class GitRepository:
         self.clone_path = Path(clone_path) if clone_path else git_config.default_clone_path / self.name
         self.branch = branch or git_config.default_branch
         self.depth = depth if depth is not None else git_config.depth
+        self.clone_filter = clone_filter if clone_filter is not None else git_config.clone_filter
+        
+        # Blobs outside the sparse patterns are never checked out, so with a
+        # partial clone they are never downloaded either
+        if sparse_patterns is None and git_config.sparse_checkout:
+            file_filter = config.config.file_filter
+            sparse_patterns = sparse_checkout_patterns(file_filter.include_patterns, file_filter.exclude_patterns)
+        self.sparse_patterns = sparse_patterns or []
         
         # Repository instance (initialized after clone)
         self._repo: Optional[Repo] = None
         self._status = RepoStatus.CREATED
+        
+        # Last-commit-per-file map, cached with the HEAD hash it was built for
+        self._commit_map: Optional[Tuple[str, Dict[str, str]]] = None
+        
+        # Blob-SHA-per-file map, cached with the HEAD hash it was built for
+        self._blob_map: Optional[Tuple[str, Dict[str, str]]] = None
+        
+        # Long-lived `git cat-file --batch` readers, started on first use
+        self._object_reader: Optional[CatFileReader] = None
+        self._async_object_reader: Optional[AsyncCatFileReader] = None
 
     @property
     def repo(self) -> Optional[Repo]:
@@ -72,6 +146,20 @@ class GitRepository:
                 logger.warning(f"No valid Git repository at {self.clone_path}")
         return self._repo
 
+    @property
+    def object_reader(self) -> Optional[CatFileReader]:
+        """Get the reader streaming objects from the repository's object store."""
+        if self._object_reader is None and self.repo is not None:
+            self._object_reader = CatFileReader(self.repo.git_dir)
+        return self._object_reader
+
+    @property
+    def async_object_reader(self) -> Optional[AsyncCatFileReader]:
+        """Get the object store reader shared by coroutines."""
+        if self._async_object_reader is None and self.repo is not None:
+            self._async_object_reader = AsyncCatFileReader(self.repo.git_dir)
+        return self._async_object_reader
+
     @property
     def status(self) -> RepoStatus:
         """Get the current status of the repository."""
@@ -134,18 +222,9 @@ class GitRepository:
             # Try to clone with the specified branch first
             if self.branch:
                 try:
-                    # Clone options with branch specified
-                    clone_kwargs = {
-                        "to_path": str(self.clone_path),
-                        "branch": self.branch,
-                    }
-                    
-                    # Add depth if specified
-                    if self.depth is not None:
-                        clone_kwargs["depth"] = self.depth
-                    
                     # Clone the repository with specified branch
-                    self._repo = git.Repo.clone_from(url_to_use, **clone_kwargs)
+                    self._repo = git.Repo.clone_from(url_to_use, **self._clone_options(self.branch))
+                    self._apply_sparse_checkout()
                     
                     # Update the branch with the actual checked out branch
                     if self._repo:
@@ -163,16 +242,9 @@ class GitRepository:
             
             # If we're here, either no branch was specified or the specified branch failed
             # Clone without specifying a branch (let Git decide)
-            clone_kwargs = {
-                "to_path": str(self.clone_path),
-            }
-            
-            # Add depth if specified
-            if self.depth is not None:
-                clone_kwargs["depth"] = self.depth
-            
             # Clone the repository without specifying branch
-            self._repo = git.Repo.clone_from(url_to_use, **clone_kwargs)
+            self._repo = git.Repo.clone_from(url_to_use, **self._clone_options())
+            self._apply_sparse_checkout()
             
             # Update the branch with the actual checked out branch
             if self._repo:
@@ -188,6 +260,70 @@ class GitRepository:
             logger.error(f"Failed to clone repository {self.url}: {e}")
             return False
             
+    def _clone_options(self, branch: Optional[str] = None) -> Dict[str, Union[str, int, bool]]:
+        """Build the keyword arguments for a clone.
+        
+        Args:
+            branch: Optional branch to clone
+            
+        Returns:
+            Keyword arguments for Repo.clone_from
+        """
+        clone_kwargs: Dict[str, Union[str, int, bool]] = {
+            "to_path": str(self.clone_path),
+        }
+        if branch:
+            clone_kwargs["branch"] = branch
+        
+        # Add depth if specified
+        if self.depth is not None:
+            clone_kwargs["depth"] = self.depth
+        
+        # Fetch blobs lazily, only for files that are checked out
+        if self.clone_filter:
+            clone_kwargs["filter"] = self.clone_filter
+        
+        # Start with only top-level files checked out until the patterns are set
+        if self.sparse_patterns:
+            clone_kwargs["sparse"] = True
+        
+        return clone_kwargs
+
+    def _apply_sparse_checkout(self) -> None:
+        """Restrict the working tree to the sparse-checkout patterns.
+        
+        Missing blobs of matching files are fetched in one batch. If sparse
+        checkout fails, the full working tree is checked out instead.
+        """
+        repo = self.repo
+        if not self.sparse_patterns or not repo:
+            return
+        
+        try:
+            repo.git.sparse_checkout("set", "--no-cone", *self.sparse_patterns)
+            logger.info(f"Sparse checkout of {self.name} set to {len(self.sparse_patterns)} patterns")
+        except GitCommandError as e:
+            logger.warning(f"Sparse checkout failed for {self.name}, checking out all files: {e}")
+            try:
+                repo.git.sparse_checkout("disable")
+            except GitCommandError as disable_error:
+                logger.error(f"Failed to disable sparse checkout for {self.name}: {disable_error}")
+
+    def _is_sparse_checkout(self) -> bool:
+        """Check whether the working tree was cloned with sparse checkout.
+        
+        Returns:
+            True if sparse checkout is enabled in the repository configuration
+        """
+        repo = self.repo
+        if not repo:
+            return False
+        try:
+            with repo.config_reader() as reader:
+                return bool(reader.get_value("core", "sparseCheckout", False))
+        except Exception:
+            return False
+
     def _get_authenticated_url(self, url: str) -> str:
         """Get an authenticated URL if GitHub token is available.
         
@@ -245,6 +381,11 @@ class GitRepository:
                 if auth_url != repo.remotes.origin.url:
                     repo.remotes.origin.set_url(auth_url)
             
+            # Refresh the patterns of sparse clones so the pull only checks out matching
+            # files; full clones made without sparse checkout stay full
+            if self._is_sparse_checkout():
+                self._apply_sparse_checkout()
+            
             # Fetch and pull
             origin = repo.remotes.origin
             origin.fetch()
@@ -297,6 +438,59 @@ class GitRepository:
         
         return list(set(changed_files))  # Remove duplicates
 
+    def get_changes_since(self, commit_hash: str, target: str = "HEAD") -> Optional[FileChanges]:
+        """Get the files changed between a commit and the target revision.
+        
+        Renames without content changes are reported as renames; renames with
+        content changes are reported as a rename plus a modification of the new path.
+        
+        Args:
+            commit_hash: Base commit hash
+            target: Target revision (default: HEAD)
+            
+        Returns:
+            FileChanges or None if the base commit is not available
+        """
+        if not self.is_cloned() or not self.repo:
+            return None
+        
+        try:
+            output = self.repo.git.diff(
+                "--name-status", "-z", "-M", "--no-ext-diff", commit_hash, target, "--"
+            )
+        except GitCommandError as e:
+            logger.warning(f"Cannot diff {commit_hash[:7]}..{target}: {e}")
+            return None
+        
+        changes = FileChanges()
+        tokens = output.split("\0")
+        i = 0
+        while i < len(tokens) and tokens[i]:
+            status = tokens[i]
+            kind = status[0]
+            if kind in ("R", "C"):
+                old_path, new_path = tokens[i + 1], tokens[i + 2]
+                i += 3
+                if kind == "C":
+                    changes.added.append(new_path)
+                    continue
+                changes.renamed.append((old_path, new_path))
+                if status != "R100":
+                    changes.modified.append(new_path)
+                continue
+            
+            path = tokens[i + 1]
+            i += 2
+            if kind == "A":
+                changes.added.append(path)
+            elif kind == "D":
+                changes.deleted.append(path)
+            else:
+                # Modified, type changed or unmerged
+                changes.modified.append(path)
+        
+        return changes
+
     def get_last_commit(self) -> Optional[str]:
         """Get the hash of the last commit.
         
@@ -342,17 +536,134 @@ class GitRepository:
         if not self.is_cloned() or not self.repo:
             return None
         
+        commit_hash = self.get_file_commit_map().get(Path(filepath).as_posix())
+        
+        # If the file is not in the history, return the repository's last commit
+        return commit_hash or self.get_last_commit()
+
+    def get_file_commit_map(self) -> Dict[str, str]:
+        """Get the latest commit hash for every tracked file.
+        
+        The map is built from a single streaming `git log --name-only` pass that
+        stops once every tracked file has been seen, and is cached per HEAD commit.
+        
+        Returns:
+            Dictionary mapping file paths (relative to the repository root) to commit hashes
+        """
+        if not self.is_cloned() or not self.repo:
+            return {}
+        
+        try:
+            head_hash = self.repo.head.commit.hexsha
+        except (ValueError, GitCommandError):
+            return {}
+        
+        if self._commit_map is not None and self._commit_map[0] == head_hash:
+            return self._commit_map[1]
+        
+        try:
+            commit_map = self._build_commit_map(head_hash)
+        except GitCommandError as e:
+            logger.warning(f"Failed to resolve file commit hashes: {e}")
+            return {}
+        
+        logger.debug(f"Resolved commit hashes for {len(commit_map)} files at {head_hash[:7]}")
+        self._commit_map = (head_hash, commit_map)
+        return commit_map
+
+    def get_blob_sha_map(self) -> Dict[str, str]:
+        """Get the git blob SHA of every file in the HEAD tree.
+        
+        Identical file contents have the same blob SHA, wherever they are stored.
+        The map is built from one `git ls-tree` call and cached per HEAD commit.
+        
+        Returns:
+            Dictionary mapping file paths (relative to the repository root) to blob SHAs
+        """
+        if not self.is_cloned() or not self.repo:
+            return {}
+        
+        try:
+            head_hash = self.repo.head.commit.hexsha
+        except (ValueError, GitCommandError):
+            return {}
+        
+        if self._blob_map is not None and self._blob_map[0] == head_hash:
+            return self._blob_map[1]
+        
+        try:
+            output = self.repo.git.ls_tree("-r", "-z", "--full-tree", head_hash)
+        except GitCommandError as e:
+            logger.warning(f"Failed to list blob SHAs: {e}")
+            return {}
+        
+        blob_map = {}
+        for entry in output.split("\0"):
+            if not entry:
+                continue
+            info, path = entry.split("\t", 1)
+            _, object_type, sha = info.split(" ")
+            if object_type == "blob":
+                blob_map[path] = sha
+        
+        self._blob_map = (head_hash, blob_map)
+        return blob_map
+
+    def get_file_blob_sha(self, filepath: str) -> Optional[str]:
+        """Get the git blob SHA of a file at HEAD.
+        
+        Args:
+            filepath: Path to the file within the repository
+            
+        Returns:
+            Blob SHA or None if the file is not tracked
+        """
+        return self.get_blob_sha_map().get(filepath)
+
+    def _build_commit_map(self, head_hash: str) -> Dict[str, str]:
+        """Build the last-commit-per-file map from one `git log` pass.
+        
+        Args:
+            head_hash: Commit to start the history walk from
+            
+        Returns:
+            Dictionary mapping file paths to commit hashes
+        """
+        tracked = {path for path in self.repo.git.ls_files("-z").split("\0") if path}
+        commit_map: Dict[str, str] = {}
+        
+        # Commits are marked with \x01 so they can't be mistaken for paths
+        process = self.repo.git.log(
+            "-z", "--name-only", "--no-renames", "--format=%x01%H", head_hash,
+            as_process=True,
+        )
+        current_hash = head_hash
+        pending = b""
+        
         try:
-            # Get the latest commit that modified the file
-            commits = list(self.repo.iter_commits(paths=filepath, max_count=1))
-            if not commits:
-                # If no commits found, return the repository's last commit
-                return self.get_last_commit()
+            while len(commit_map) < len(tracked):
+                chunk = process.stdout.read(COMMIT_MAP_READ_SIZE)
+                if not chunk:
+                    break
                 
-            return commits[0].hexsha
-        except (GitCommandError, ValueError):
-            # If anything goes wrong, return the repository's last commit
-            return self.get_last_commit()
+                tokens = (pending + chunk).split(b"\0")
+                pending = tokens.pop()
+                
+                for token in tokens:
+                    if token.startswith(b"\x01"):
+                        current_hash = token[1:].decode("ascii")
+                        continue
+                    
+                    path = token.lstrip(b"\n").decode("utf-8", errors="surrogateescape")
+                    if path in tracked and path not in commit_map:
+                        commit_map[path] = current_hash
+        finally:
+            # Stop walking the rest of the history once every file is resolved
+            if process.proc.poll() is None:
+                process.proc.kill()
+            process.proc.wait()
+        
+        return commit_map
 
     def get_file_content(self, filepath: str, revision: str = "HEAD") -> Optional[str]:
         """Get the content of a file at a specific revision.
@@ -364,15 +675,49 @@ class GitRepository:
         Returns:
             File content as string or None if file doesn't exist
         """
-        if not self.is_cloned() or not self.repo:
+        if not self.is_cloned():
             return None
         
-        try:
-            # Get the file blob from the specified revision
-            blob = self.repo.git.show(f"{revision}:{filepath}")
-            return blob
-        except GitCommandError:
+        reader = self.object_reader
+        if reader is None:
+            return None
+        
+        # Read the blob from the object store, without a checkout or a process per file
+        data = reader.read_blob(revision, filepath)
+        if data is None:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    async def read_file_bytes(self, filepath: str, revision: str = "HEAD") -> Optional[bytes]:
+        """Read the raw content of a file at a specific revision without blocking the event loop.
+        
+        Concurrent callers share one `git cat-file --batch` process. This works on
+        bare mirrors and at historical commits, as no checkout is needed.
+        
+        Args:
+            filepath: Path to the file within the repository
+            revision: Git revision to get the file from (default: HEAD)
+            
+        Returns:
+            File content as bytes or None if file doesn't exist
+        """
+        reader = self.async_object_reader
+        if reader is None:
             return None
+        return await reader.read_blob(revision, filepath)
+
+    def close(self) -> None:
+        """Stop the object store reader process."""
+        if self._object_reader is not None:
+            self._object_reader.close()
+            self._object_reader = None
+
+    async def aclose(self) -> None:
+        """Stop the object store reader processes, including the async reader."""
+        self.close()
+        if self._async_object_reader is not None:
+            await self._async_object_reader.close()
+            self._async_object_reader = None
 
     def get_file_history(
         self, filepath: str, max_count: int = 10
@@ -483,6 +828,7 @@ class GitRepository:
         
         try:
             # Close the repository to avoid file handle issues
+            self.close()
             if self._repo:
                 self._repo.close()
                 self._repo = None
@@ -0,0 +1,224 @@
+"""
+Benchmark of the raw and base64 content modes of structured analysis.
+
+Sends the same sample files to the analysis model once per content mode and
+compares input tokens, latency and the rate of responses that fail to parse.
+With --dry-run no request is sent and input tokens are counted locally.
+
+Usage:
+    python -m mfai_db_repos.tools.benchmark_analysis_prompt /path/to/repo --files 30
+    python -m mfai_db_repos.tools.benchmark_analysis_prompt /path/to/repo --dry-run
+"""
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from mfai_db_repos.lib.embeddings.google_genai import (
+    ANALYSIS_MODEL,
+    AnalysisContentMode,
+    GoogleGenAIEmbeddingConfig,
+    GoogleGenAIEmbeddingProvider,
+    build_analysis_contents,
+    parse_analysis_response,
+)
+from mfai_db_repos.lib.embeddings.tokens import TokenBudget
+from mfai_db_repos.lib.file_processor.extractor import FileExtractor
+from mfai_db_repos.lib.file_processor.scanner import RepositoryScanner
+from mfai_db_repos.utils.env import get_env
+
+
+@dataclass
+class ModeResult:
+    """Measurements of one content mode."""
+
+    mode: str
+    input_tokens: List[int] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+    parse_failures: int = 0
+    request_failures: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.input_tokens) + self.request_failures
+
+
+def load_samples(root: Path, count: int) -> List[Tuple[str, str]]:
+    """Read text files of a repository as benchmark samples.
+
+    Args:
+        root: Repository or directory to sample
+        count: Maximum number of files
+
+    Returns:
+        List of (relative path, content) pairs
+    """
+    extractor = FileExtractor()
+    samples = []
+    for candidate in RepositoryScanner().scan(root):
+        if candidate.is_binary:
+            continue
+        record = extractor.read_file(root / candidate.path)
+        if record is None or record.is_binary or not record.text or not record.text.strip():
+            continue
+        samples.append((candidate.path, record.text))
+        if len(samples) >= count:
+            break
+    return samples
+
+
+def count_input_tokens(budget: TokenBudget, content: str, readme: Optional[str], mode: str) -> int:
+    """Count the input tokens of an analysis request locally.
+
+    Args:
+        budget: Token budget of the analysis model
+        content: File content
+        readme: Optional README content
+        mode: AnalysisContentMode
+
+    Returns:
+        Input tokens of the request
+    """
+    contents = build_analysis_contents(content, readme, mode, budget)
+    return sum(budget.count(part.text) for part in contents.parts)
+
+
+async def run_mode(
+    provider: GoogleGenAIEmbeddingProvider,
+    samples: List[Tuple[str, str]],
+    readme: Optional[str],
+    mode: str,
+    concurrency: int,
+) -> ModeResult:
+    """Send every sample with one content mode.
+
+    Args:
+        provider: Google GenAI provider
+        samples: (path, content) pairs
+        readme: Optional README content
+        mode: AnalysisContentMode
+        concurrency: Maximum requests in flight
+
+    Returns:
+        ModeResult with the measurements
+    """
+    result = ModeResult(mode)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(path: str, content: str) -> None:
+        contents = build_analysis_contents(content, readme, mode, provider.analysis_budget)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await provider.request_analysis(contents)
+            except Exception as e:
+                print(f"  {mode}: request failed for {path}: {e}")
+                result.request_failures += 1
+                return
+            result.latencies.append(time.perf_counter() - start)
+
+        usage = response.usage_metadata
+        result.input_tokens.append(usage.prompt_token_count if usage and usage.prompt_token_count else 0)
+        try:
+            parse_analysis_response(response.text)
+        except ValueError as e:
+            print(f"  {mode}: unparseable response for {path}: {e}")
+            result.parse_failures += 1
+
+    await asyncio.gather(*(send(path, content) for path, content in samples))
+    return result
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of a list of values.
+
+    Args:
+        values: Values
+        fraction: Percentile as a fraction (e.g. 0.95)
+
+    Returns:
+        Percentile value, or 0 for no values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args) -> int:
+    """Run the benchmark.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        Exit code
+    """
+    root = Path(args.path).resolve()
+    samples = load_samples(root, args.files)
+    if not samples:
+        print(f"No text files found in {root}")
+        return 1
+
+    readme = None
+    if args.readme:
+        readme = Path(args.readme).read_text(encoding="utf-8", errors="replace")
+
+    modes = args.modes
+    print(f"Analyzing {len(samples)} files from {root} with {ANALYSIS_MODEL}")
+
+    if args.dry_run:
+        budget = TokenBudget(ANALYSIS_MODEL)
+        counting = "exact" if budget.exact else "approximate"
+        print(f"Local {counting} token counts, no requests sent")
+        print(f"{'mode':>8} {'files':>6} {'mean tokens':>12} {'total tokens':>13}")
+        totals = {}
+        for mode in modes:
+            tokens = [count_input_tokens(budget, content, readme, mode) for _, content in samples]
+            totals[mode] = sum(tokens)
+            print(f"{mode:>8} {len(tokens):>6} {statistics.mean(tokens):>12.0f} {totals[mode]:>13}")
+        if AnalysisContentMode.RAW in totals and totals.get(AnalysisContentMode.BASE64):
+            print(f"raw/base64 input tokens: {totals[AnalysisContentMode.RAW] / totals[AnalysisContentMode.BASE64]:.2f}")
+        return 0
+
+    provider = GoogleGenAIEmbeddingProvider(GoogleGenAIEmbeddingConfig(api_key=get_env("GOOGLE_API_KEY")))
+    print(
+        f"{'mode':>8} {'files':>6} {'mean tokens':>12} {'total tokens':>13} "
+        f"{'mean s':>7} {'p95 s':>7} {'parse fail':>11} {'req fail':>9}"
+    )
+    for mode in modes:
+        result = await run_mode(provider, samples, readme, mode, args.concurrency)
+        mean_tokens = statistics.mean(result.input_tokens) if result.input_tokens else 0
+        mean_latency = statistics.mean(result.latencies) if result.latencies else 0
+        parsed = max(1, len(result.input_tokens))
+        print(
+            f"{mode:>8} {result.requests:>6} {mean_tokens:>12.0f} {sum(result.input_tokens):>13} "
+            f"{mean_latency:>7.2f} {percentile(result.latencies, 0.95):>7.2f} "
+            f"{result.parse_failures / parsed:>10.1%} {result.request_failures:>9}"
+        )
+    return 0
+
+
+def main():
+    """Main function."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark analysis prompt content modes")
+    parser.add_argument("path", help="Repository or directory to sample files from")
+    parser.add_argument("--files", type=int, default=20, help="Number of sample files")
+    parser.add_argument("--readme", help="Optional README file sent as repository context")
+    parser.add_argument(
+        "--modes", nargs="+", default=[AnalysisContentMode.RAW, AnalysisContentMode.BASE64],
+        choices=[AnalysisContentMode.RAW, AnalysisContentMode.BASE64], help="Content modes to compare",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight per mode")
+    parser.add_argument("--dry-run", action="store_true", help="Count input tokens locally without requests")
+    args = parser.parse_args()
+
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,148 @@
+"""
+Microbenchmark for the compiled include/exclude/test pattern matcher.
+
+Generates synthetic repository paths and compares the compiled PatternMatcher
+against a per-pattern fnmatch loop, for increasing numbers of configured patterns.
+
+Usage:
+    python -m mfai_db_repos.tools.benchmark_patterns --paths 100000
+"""
+import fnmatch
+import random
+import time
+from typing import Callable, List, Tuple
+
+from mfai_db_repos.lib.file_processor.matcher import PatternMatcher
+from mfai_db_repos.utils.config import config
+
+DIRECTORIES = [
+    "src", "flopy", "modflow", "pest", "utils", "docs", "examples", "data",
+    "tests", "node_modules", "build", "scripts", "notebooks", "mf6", "gwf",
+]
+EXTENSIONS = [
+    ".py", ".md", ".txt", ".json", ".yml", ".nam", ".dis", ".dat", ".csv",
+    ".f90", ".js", ".ts", ".ipynb", ".pyc", ".lst",
+]
+
+
+def generate_paths(count: int, seed: int = 42) -> List[str]:
+    """Generate synthetic relative repository paths.
+
+    Args:
+        count: Number of paths to generate
+        seed: Random seed for reproducibility
+
+    Returns:
+        List of relative paths
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        depth = rng.randint(0, 5)
+        parts = [rng.choice(DIRECTORIES) for _ in range(depth)]
+        prefix = "test_" if rng.random() < 0.05 else ""
+        parts.append(f"{prefix}file_{i}{rng.choice(EXTENSIONS)}")
+        paths.append("/".join(parts))
+    return paths
+
+
+def synthetic_patterns(multiplier: int) -> Tuple[List[str], List[str], List[str]]:
+    """Build include/exclude/test pattern lists scaled by a multiplier.
+
+    Args:
+        multiplier: How many extra pattern copies to generate
+
+    Returns:
+        Tuple of (include_patterns, exclude_patterns, test_patterns)
+    """
+    file_filter = config.config.file_filter
+    include = list(file_filter.include_patterns)
+    exclude = list(file_filter.exclude_patterns)
+    tests = list(file_filter.test_patterns)
+
+    for i in range(1, multiplier):
+        include.extend(f"**/*.ext{i}_{j}" for j in range(len(file_filter.include_patterns)))
+        exclude.extend(f"**/skipdir{i}_{j}/**" for j in range(len(file_filter.exclude_patterns)))
+        tests.append(f"**/check{i}_*.py")
+
+    return include, exclude, tests
+
+
+def fnmatch_baseline(
+    include: List[str], exclude: List[str], tests: List[str]
+) -> Callable[[str], bool]:
+    """Build the previous per-pattern fnmatch matcher for comparison.
+
+    Args:
+        include: Include patterns
+        exclude: Exclude patterns
+        tests: Test patterns (treated as excludes)
+
+    Returns:
+        Matching function
+    """
+    all_excludes = exclude + tests
+
+    def matches(path: str) -> bool:
+        for pattern in all_excludes:
+            if fnmatch.fnmatch(path, pattern):
+                return False
+        if not include:
+            return True
+        return any(fnmatch.fnmatch(path, pattern) for pattern in include)
+
+    return matches
+
+
+def time_matcher(matches: Callable[[str], bool], paths: List[str]) -> Tuple[float, int]:
+    """Time a matching function over all paths.
+
+    Args:
+        matches: Matching function
+        paths: Paths to match
+
+    Returns:
+        Tuple of (elapsed seconds, number of matched paths)
+    """
+    start = time.perf_counter()
+    matched = sum(1 for path in paths if matches(path))
+    return time.perf_counter() - start, matched
+
+
+def main():
+    """Main function."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pattern matching")
+    parser.add_argument("--paths", type=int, default=100_000, help="Number of synthetic paths")
+    parser.add_argument(
+        "--multipliers", type=int, nargs="+", default=[1, 4, 16],
+        help="Pattern list size multipliers to compare",
+    )
+    args = parser.parse_args()
+
+    paths = generate_paths(args.paths)
+    print(f"Matching {len(paths)} synthetic paths")
+    print(f"{'patterns':>9} {'fnmatch (s)':>12} {'compiled (s)':>13} {'ns/path':>9} {'speedup':>8}")
+
+    for multiplier in args.multipliers:
+        include, exclude, tests = synthetic_patterns(multiplier)
+        pattern_count = len(include) + len(exclude) + len(tests)
+
+        baseline_time, _ = time_matcher(fnmatch_baseline(include, exclude, tests), paths)
+
+        compile_start = time.perf_counter()
+        matcher = PatternMatcher(include, exclude, tests, include_tests=False)
+        compile_time = time.perf_counter() - compile_start
+        compiled_time, _ = time_matcher(matcher.matches, paths)
+
+        print(
+            f"{pattern_count:>9} {baseline_time:>12.3f} {compiled_time + compile_time:>13.3f} "
+            f"{compiled_time / len(paths) * 1e9:>9.0f} {baseline_time / compiled_time:>7.1f}x"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,254 @@
+"""
+Blocking call offloading for asyncio code.
+
+This module runs blocking work (file reads, encoding and type detection, git
+commands) on dedicated thread pools with one size limit per category, so the
+event loop stays free to drive API requests and database queries. It also
+provides a monitor that measures how late the event loop wakes up, which shows
+whether anything still blocks it.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from mfai_db_repos.utils.env import get_int_env
+from mfai_db_repos.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class BlockingCategory(str, Enum):
+    """Kinds of blocking work, each with its own thread pool."""
+
+    DISK = "disk"  # File reads, libmagic and encoding detection
+    GIT = "git"  # GitPython calls and git subprocesses
+
+
+# Environment variables holding the pool size of each category, with defaults
+CATEGORY_WORKERS_ENV: Dict[BlockingCategory, Tuple[str, int]] = {
+    BlockingCategory.DISK: ("DISK_WORKERS", 8),
+    BlockingCategory.GIT: ("GIT_WORKERS", 4),
+}
+
+
+class BlockingExecutor:
+    """Thread pools for blocking work, sized per category."""
+
+    def __init__(self, limits: Optional[Dict[BlockingCategory, int]] = None):
+        """Initialize the executor. Pools are created on first use.
+
+        Args:
+            limits: Optional maximum number of threads per category
+                (defaults to the DISK_WORKERS and GIT_WORKERS environment variables)
+        """
+        self._limits = dict(limits or {})
+        self._pools: Dict[BlockingCategory, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def limit(self, category: BlockingCategory) -> int:
+        """Get the maximum number of threads of a category.
+
+        Args:
+            category: Blocking work category
+
+        Returns:
+            Maximum number of concurrent calls of the category
+        """
+        if category not in self._limits:
+            env_key, default = CATEGORY_WORKERS_ENV[category]
+            self._limits[category] = get_int_env(env_key, default)
+        return max(1, self._limits[category])
+
+    def _pool(self, category: BlockingCategory) -> ThreadPoolExecutor:
+        """Get the thread pool of a category, creating it if needed.
+
+        Args:
+            category: Blocking work category
+
+        Returns:
+            Thread pool of the category
+        """
+        pool = self._pools.get(category)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(category)
+                if pool is None:
+                    pool = ThreadPoolExecutor(
+                        max_workers=self.limit(category),
+                        thread_name_prefix=f"mfai-{category.value}",
+                    )
+                    self._pools[category] = pool
+        return pool
+
+    async def run(self, category: BlockingCategory, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking function on the pool of its category.
+
+        Like asyncio.to_thread, the current context variables are propagated.
+
+        Args:
+            category: Blocking work category
+            func: Blocking function
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            Return value of the function
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return await loop.run_in_executor(self._pool(category), call)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down all thread pools.
+
+        Args:
+            wait: Whether to wait for running calls to finish
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.shutdown(wait=wait)
+
+
+_default_executor: Optional[BlockingExecutor] = None
+_default_lock = threading.Lock()
+
+
+def get_blocking_executor() -> BlockingExecutor:
+    """Get the process-wide blocking executor.
+
+    Returns:
+        Shared BlockingExecutor instance
+    """
+    global _default_executor
+    if _default_executor is None:
+        with _default_lock:
+            if _default_executor is None:
+                _default_executor = BlockingExecutor()
+    return _default_executor
+
+
+async def run_blocking(category: BlockingCategory, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking function on the shared pool of its category.
+
+    Args:
+        category: Blocking work category
+        func: Blocking function
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        Return value of the function
+    """
+    return await get_blocking_executor().run(category, func, *args, **kwargs)
+
+
+@dataclass
+class LoopLagStats:
+    """Summary of measured event loop lag."""
+
+    samples: int = 0
+    mean_ms: float = 0.0
+    p95_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"event loop lag over {self.samples} samples: mean {self.mean_ms:.1f} ms, "
+            f"p95 {self.p95_ms:.1f} ms, max {self.max_ms:.1f} ms"
+        )
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop runs a periodic timer.
+
+    A coroutine sleeps for a fixed interval and records how much later than
+    scheduled it woke up. Lag stays near zero while nothing blocks the loop.
+    """
+
+    def __init__(self, interval: float = 0.1, warn_threshold: float = 0.25, window: int = 1000):
+        """Initialize the monitor.
+
+        Args:
+            interval: Seconds between measurements
+            warn_threshold: Lag in seconds that is logged as a warning
+            window: Number of recent samples kept for the percentile
+        """
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start measuring on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> LoopLagStats:
+        """Stop measuring.
+
+        Returns:
+            Lag statistics collected so far
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return self.stats
+
+    @property
+    def stats(self) -> LoopLagStats:
+        """Get the lag statistics collected so far."""
+        if not self._count:
+            return LoopLagStats()
+        recent = sorted(self._recent)
+        return LoopLagStats(
+            samples=self._count,
+            mean_ms=self._total / self._count * 1000,
+            p95_ms=recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000,
+            max_ms=self._max * 1000,
+        )
+
+    def record(self, lag: float) -> None:
+        """Record one lag measurement.
+
+        Args:
+            lag: Seconds the timer ran late
+        """
+        self._recent.append(lag)
+        self._count += 1
+        self._total += lag
+        self._max = max(self._max, lag)
+        if lag >= self.warn_threshold:
+            logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    async def _run(self) -> None:
+        """Sleep in a loop and record the lag of every wakeup."""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - scheduled))
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
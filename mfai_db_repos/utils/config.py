@@ -35,7 +35,8 @@ class EmbeddingConfig(BaseModel):
     openai_api_key: Optional[str] = Field(default=None)
     openai_model: str = Field(default="text-embedding-ada-002")
     google_genai_api_key: Optional[str] = Field(default=None)
-    gemini_model: str = Field(default="gemini-2.5-flash-preview-05-20")
+    gemini_model: str = Field(default="gemini-2.0-flash")  # Standard analysis model
+    gemini_light_model: str = Field(default="gemini-2.0-flash-lite")  # Analysis model of small and low-value files
     embedding_dimensions: int = Field(default=1536)
     parallel_workers: int = Field(default=5)
     max_content_length: int = Field(default=1000000)
@@ -49,6 +50,8 @@ class GitConfig(BaseModel):
     default_branch: str = Field(default="main")
     depth: Optional[int] = Field(default=None)  # None means full clone
     github_token: Optional[str] = Field(default=None)  # GitHub Personal Access Token for private repos
+    clone_filter: Optional[str] = Field(default="blob:none")  # Partial clone filter, None for all blobs
+    sparse_checkout: bool = Field(default=True)  # Only check out files matching the file filter patterns
 
 
 class FileFilterConfig(BaseModel):
@@ -143,10 +146,20 @@ class Config:
             self._config.embedding.openai_api_key = os.environ["OPENAI_API_KEY"]
         if os.environ.get("GOOGLE_API_KEY"):
             self._config.embedding.google_genai_api_key = os.environ["GOOGLE_API_KEY"]
+        if os.environ.get("GEMINI_MODEL"):
+            self._config.embedding.gemini_model = os.environ["GEMINI_MODEL"]
+        if "GEMINI_LIGHT_MODEL" in os.environ:
+            self._config.embedding.gemini_light_model = os.environ["GEMINI_LIGHT_MODEL"]
         
         # Git configuration
         if os.environ.get("GITHUB_TOKEN"):
             self._config.git.github_token = os.environ["GITHUB_TOKEN"]
+        if os.environ.get("GIT_DEPTH"):
+            self._config.git.depth = int(os.environ["GIT_DEPTH"])
+        if "GIT_CLONE_FILTER" in os.environ:
+            self._config.git.clone_filter = os.environ["GIT_CLONE_FILTER"] or None
+        if os.environ.get("GIT_SPARSE_CHECKOUT"):
+            self._config.git.sparse_checkout = os.environ["GIT_SPARSE_CHECKOUT"].lower() in ("true", "1", "yes")
         
         # Logging configuration
         if os.environ.get("LOG_LEVEL"):
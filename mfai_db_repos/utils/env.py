@@ -30,6 +30,26 @@ DEFAULT_ENV = {
     "BATCH_SIZE": "5",
     "PARALLEL_WORKERS": "5",
     "MAX_FILE_SIZE_MB": "10",
+    "READ_WORKERS": "4",
+    "DISK_WORKERS": "8",  # Threads for blocking file reads
+    "GIT_WORKERS": "4",  # Threads for blocking git calls
+    "ANALYSIS_WORKERS": "",  # Defaults to 3 x PARALLEL_WORKERS
+    "EMBEDDING_WORKERS": "",  # Defaults to EMBEDDING_BATCH_SIZE
+    "EMBEDDING_BATCH_SIZE": "64",
+    "EMBEDDING_BATCH_TOKENS": "200000",
+    "EMBEDDING_BATCH_WAIT": "0.5",
+    "API_CACHE_PATH": "~/.cache/mfai_db_repos/api_cache.sqlite",  # Empty disables the cache
+    "TRACKER_CACHE_PATH": "~/.cache/mfai_db_repos/file_status.sqlite",  # Empty disables snapshots
+    "TOKENIZER_CACHE_PATH": "~/.cache/mfai_db_repos/tiktoken",  # Downloaded BPE vocabularies
+    "DB_COMMIT_SIZE": "20",
+    "ANALYSIS_CONTENT_MODE": "raw",  # "raw" or "base64" file content in analysis prompts
+    "DATA_SAMPLE_MIN_CHARS": "20000",  # Data files from this size are analyzed from samples, 0 disables
+    "ANALYSIS_LIGHT_MAX_CHARS": "2000",  # Files up to this size use the light analysis model, 0 disables
+    "ANALYSIS_LIGHT_CATEGORIES": "data",  # Categories always analyzed light
+    "ANALYSIS_REPO_TIERS": "",  # Per-repository tier overrides, e.g. "flopy=standard,scratch=light"
+    "LOCAL_ANALYSIS": "true",  # Parse structured and stub files instead of sending them for analysis
+    "RATE_LIMIT_PER_MINUTE": "100",  # Per provider and model
+    "TOKENS_PER_MINUTE": "",  # Per provider and model, empty for no token budget
 }
 
 # Load environment variables
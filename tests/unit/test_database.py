@@ -114,4 +114,113 @@ def test_repository_file_model(test_session):
     assert db_file.git_status == "added"
     assert db_file.content == "print('Hello, world!')"
     assert db_file.file_type == "python"
-    assert db_file.tags == "python,main"
\ No newline at end of file
+    assert db_file.tags == "python,main"
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_statement():
+    """Test bulk upserts write all rows with chunked ON CONFLICT statements."""
+    from unittest import mock
+
+    from sqlalchemy.dialects import postgresql
+
+    from mfai_db_repos.lib.database.repository_file import RepositoryFileRepository
+
+    repository = Repository(id=1, url="https://github.com/user/repo.git", name="repo", file_count=1)
+    session = mock.AsyncMock()
+    session.get.return_value = repository
+    session.add = mock.Mock()
+    statements = []
+
+    async def execute(stmt):
+        statements.append(stmt)
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        rows = len([key for key in params if key.startswith("filepath")])
+        return [(True,)] * rows
+
+    session.execute.side_effect = execute
+
+    rows = [
+        {"filepath": f"src/file{i}.py", "filename": f"file{i}.py", "content": "x = 1"}
+        for i in range(5)
+    ]
+    file_repo = RepositoryFileRepository(session)
+    written = await file_repo.bulk_upsert(1, rows, conflict_values={"git_status": "modified"}, chunk_size=2)
+
+    assert written == 5
+    assert len(statements) == 3
+    assert repository.file_count == 6
+    session.commit.assert_awaited_once()
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT ON CONSTRAINT uq_repository_file_path DO UPDATE" in sql
+    assert "content = excluded.content" in sql
+    assert "filepath = excluded.filepath" not in sql
+    assert "content_tsvector" not in sql
+
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_byte_cap():
+    """Test bulk upserts close statements early on large rows and apply callable conflict values."""
+    from unittest import mock
+
+    from sqlalchemy import func
+    from sqlalchemy.dialects import postgresql
+
+    from mfai_db_repos.lib.database.repository_file import RepositoryFileRepository
+
+    repository = Repository(id=1, url="https://github.com/user/repo.git", name="repo", file_count=0)
+    session = mock.AsyncMock()
+    session.get.return_value = repository
+    statements = []
+
+    async def execute(stmt):
+        statements.append(stmt)
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        rows = len([key for key in params if key.startswith("filepath")])
+        return [(index == 0,) for index in range(rows)]
+
+    session.execute.side_effect = execute
+
+    rows = [{"filepath": f"data/file{i}.txt", "content": "x" * 400} for i in range(5)]
+    conflict_values = {"content": lambda excluded: func.upper(excluded.content)}
+    file_repo = RepositoryFileRepository(session)
+    written, inserted = await file_repo.bulk_upsert_counts(
+        1, rows, conflict_values=conflict_values, max_bytes=1000
+    )
+
+    assert (written, inserted) == (5, 3)
+    assert len(statements) == 3
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "content = upper(excluded.content)" in sql
+
+@pytest.mark.asyncio
+async def test_rename_clears_embedding():
+    """Test renamed rows take the new path and drop the embedding of the old path."""
+    from unittest import mock
+
+    from sqlalchemy.dialects import postgresql
+
+    from mfai_db_repos.lib.database.repository_file import RepositoryFileRepository
+
+    session = mock.AsyncMock()
+    statements = []
+
+    async def execute(stmt):
+        statements.append(stmt)
+        return mock.Mock(rowcount=1)
+
+    session.execute.side_effect = execute
+
+    file_repo = RepositoryFileRepository(session)
+    assert await file_repo.rename(1, "old/ignore", "new/.gitignore", "abc123") is True
+
+    params = statements[1].compile(dialect=postgresql.dialect()).params
+    assert params["filepath"] == "new/.gitignore"
+    assert params["filename"] == ".gitignore"
+    assert params["extension"] == ""
+    assert params["embedding"] is None
+    assert params["embedding_string"] is None
+    assert params["repo_commit_hash"] == "abc123"
+    session.commit.assert_awaited_once()
@@ -2,7 +2,9 @@
 Tests for embedding generation functionality.
 """
 import asyncio
+import json
 import os
+import threading
 import unittest
 from unittest import mock
 from typing import List
@@ -10,6 +12,10 @@ from typing import List
 import pytest
 
 from mfai_db_repos.lib.embeddings import (
+    AnalysisCache,
+    AnalysisPromptVariant,
+    AnalysisRoutingPolicy,
+    AnalysisTier,
     BatchProcessor,
     BatchProcessingResult,
     EmbeddingConfig,
@@ -20,7 +26,27 @@ from mfai_db_repos.lib.embeddings import (
     OpenAIEmbeddingProvider,
     GoogleGenAIEmbeddingConfig,
     GoogleGenAIEmbeddingProvider,
+    LocalAnalyzerRegistry,
+    MicroBatchEmbedder,
+    ModelTokenLimits,
+    RateLimiter,
+    TokenBudget,
+    get_rate_limiter,
+    get_model_limits,
 )
+from mfai_db_repos.lib.embeddings.cache import content_hash
+from mfai_db_repos.lib.embeddings.google_genai import (
+    ANALYSIS_MODEL,
+    BRIEF_ANALYSIS_INSTRUCTIONS,
+    MAX_ANALYSIS_CONTENT_TOKENS,
+    README_CONTEXT_PROMPT_VERSION,
+    AnalysisContentMode,
+    StructuredResponseSchema,
+    build_analysis_contents,
+    fit_analysis_content,
+    parse_analysis_response,
+)
+from mfai_db_repos.lib.embeddings.tokens import estimate_text_tokens
 
 
 class TestEmbeddingVector(unittest.TestCase):
@@ -134,6 +160,522 @@ class TestBatchProcessor:
         assert isinstance(list(result.errors.values())[0], ValueError)
 
 
+class TestMicroBatchEmbedder:
+    """Tests for the MicroBatchEmbedder class."""
+    
+    @pytest.mark.asyncio
+    async def test_coalesces_concurrent_calls(self):
+        """Test concurrent single-text calls are sent as batch requests."""
+        requests = []
+        
+        async def embed_batch(texts):
+            requests.append(list(texts))
+            return [EmbeddingVector(vector=[float(len(t))], model="test") for t in texts]
+        
+        embedder = MicroBatchEmbedder(embed_batch, max_batch_size=4, max_wait=0.05)
+        texts = ["a" * i for i in range(1, 11)]
+        vectors = await asyncio.gather(*(embedder.embed(t) for t in texts))
+        
+        assert [v.vector[0] for v in vectors] == [float(i) for i in range(1, 11)]
+        assert [len(r) for r in requests] == [4, 4, 2]
+        assert embedder.request_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_token_budget_and_errors(self):
+        """Test the token budget splits batches and errors only reach failing callers."""
+        requests = []
+        
+        async def embed_batch(texts):
+            requests.append(len(texts))
+            if any(t.startswith("bad") for t in texts):
+                raise RuntimeError("API error")
+            return [EmbeddingVector(vector=[1.0], model="test") for _ in texts]
+        
+        embedder = MicroBatchEmbedder(embed_batch, max_batch_size=10, max_batch_tokens=30, max_wait=0.01)
+        await asyncio.gather(*(embedder.embed("x" * 48) for _ in range(3)))
+        assert requests == [2, 1]
+        
+        results = await asyncio.gather(
+            embedder.embed("bad"), embedder.embed("fine"), return_exceptions=True
+        )
+        assert isinstance(results[0], RuntimeError)
+        assert results[1].vector == [1.0]
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_split(self):
+        """Test one failing text only fails its own caller, while rate limit errors are not split."""
+        requests = []
+        
+        async def embed_batch(texts):
+            requests.append(len(texts))
+            if "bad" in texts:
+                raise RuntimeError("invalid input")
+            return [EmbeddingVector(vector=[float(len(t))], model="test") for t in texts]
+        
+        embedder = MicroBatchEmbedder(embed_batch, max_batch_size=8, max_wait=0.01)
+        texts = ["a" * i for i in range(1, 8)]
+        results = await asyncio.gather(
+            *(embedder.embed(t) for t in texts[:3]), embedder.embed("bad"), *(embedder.embed(t) for t in texts[3:]),
+            return_exceptions=True,
+        )
+        
+        assert isinstance(results[3], RuntimeError)
+        vectors = results[:3] + results[4:]
+        assert [v.vector[0] for v in vectors] == [float(i) for i in range(1, 8)]
+        assert requests[0] == 8 and 1 in requests
+        
+        rate_limited = RuntimeError("rate limited")
+        rate_limited.status_code = 429
+        
+        async def limited_batch(texts):
+            requests.append(len(texts))
+            raise rate_limited
+        
+        requests.clear()
+        embedder = MicroBatchEmbedder(limited_batch, max_batch_size=4, max_wait=0.01)
+        results = await asyncio.gather(*(embedder.embed(t) for t in texts[:4]), return_exceptions=True)
+        assert all(r is rate_limited for r in results)
+        assert requests == [4]
+
+
+class TestTokenBudget:
+    """Tests for the TokenBudget class."""
+    
+    def test_estimator(self):
+        """Test the estimator counts dense text higher than prose and samples long texts."""
+        prose = "The hydraulic conductivity of the aquifer controls groundwater flow. " * 10
+        dense = "aGVsbG8gd29ybGQhIDEyMzQ1Njc4OTA=" * 20
+        assert 0 < estimate_text_tokens(prose) < len(prose) / 3
+        assert estimate_text_tokens(dense) > len(dense) / 4
+        
+        long_text = prose * 100
+        assert abs(estimate_text_tokens(long_text) - 100 * estimate_text_tokens(prose)) < 0.05 * estimate_text_tokens(long_text)
+    
+    def test_truncate_and_pack(self):
+        """Test texts are truncated to the input limit and packed within request limits."""
+        budget = TokenBudget("test-model", ModelTokenLimits(100, 250, 3), use_tokenizer=False)
+        assert get_model_limits("models/text-embedding-004").max_input_tokens == 2048
+        
+        short = "short text"
+        assert budget.truncate(short) == short
+        
+        long_text = "word " * 1000
+        truncated = budget.truncate(long_text)
+        assert long_text.startswith(truncated)
+        assert 0 < budget.count(truncated) <= budget.usable(100)
+        
+        texts = ["word " * 60 for _ in range(5)] + [long_text, short, short, short]
+        fitted, batches = budget.pack(texts)
+        assert fitted[5] == truncated
+        assert sorted(i for batch in batches for i in batch) == list(range(len(texts)))
+        for batch in batches:
+            assert len(batch) <= 3
+            assert len(batch) == 1 or sum(budget.count(fitted[i]) for i in batch) <= budget.usable(250)
+    
+    def test_fit_and_pack_counts(self):
+        """Test fitting counts the kept tokens and packing reports tokens per request."""
+        budget = TokenBudget("test-model", ModelTokenLimits(100, 250, 3), use_tokenizer=False)
+        long_text = "word " * 1000
+        fitted, tokens = budget.fit(long_text)
+        assert fitted == budget.truncate(long_text)
+        assert tokens == budget.count(fitted)
+        
+        texts = ["word " * 60 for _ in range(5)] + [long_text, "short text"]
+        fitted_texts, batches, batch_tokens = budget.pack_with_counts(texts)
+        assert (fitted_texts, batches) == budget.pack(texts)
+        assert batch_tokens == [sum(budget.count(fitted_texts[i]) for i in batch) for batch in batches]
+    
+    @pytest.mark.asyncio
+    async def test_vocabulary_loaded_lazily(self):
+        """Test the vocabulary is loaded on first use, in a worker thread when awaited."""
+        threads = []
+        
+        def load_encoding(model):
+            threads.append(threading.current_thread())
+            return None, False
+        
+        with mock.patch("mfai_db_repos.lib.embeddings.tokens._load_encoding", side_effect=load_encoding):
+            budget = TokenBudget("text-embedding-3-small")
+            assert threads == []
+            
+            await budget.load()
+            await budget.load()
+            assert budget.count("word") > 0 and not budget.exact
+            assert len(threads) == 1 and threads[0] is not threading.current_thread()
+    
+    def test_vocabulary_cached_by_tiktoken(self, tmp_path):
+        """Test tiktoken caches vocabularies under TOKENIZER_CACHE_PATH only while loading."""
+        from mfai_db_repos.lib.embeddings import tokens
+        
+        cache_dirs = []
+        fake_tiktoken = mock.Mock()
+        fake_tiktoken.encoding_name_for_model.side_effect = KeyError("unknown")
+        fake_tiktoken.get_encoding.side_effect = lambda name: cache_dirs.append(os.environ.get("TIKTOKEN_CACHE_DIR"))
+        
+        tokens._load_encoding.cache_clear()
+        try:
+            with mock.patch.object(tokens, "tiktoken", fake_tiktoken), \
+                    mock.patch.object(tokens, "get_env", return_value=str(tmp_path)), \
+                    mock.patch.dict(os.environ):
+                os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+                tokens._load_encoding("unlisted-model")
+                assert "TIKTOKEN_CACHE_DIR" not in os.environ
+        finally:
+            tokens._load_encoding.cache_clear()
+        
+        assert cache_dirs == [str(tmp_path)]
+        fake_tiktoken.get_encoding.assert_called_once_with(tokens.APPROXIMATE_ENCODING)
+
+
+class TestAnalysisContentModes:
+    """Tests for the raw and base64 analysis content modes."""
+    
+    RESPONSE = (
+        "===TITLE===\nSolver\n===SUMMARY===\nSolves.\n===KEY_CONCEPTS===\n- flow\n"
+        "===POTENTIAL_QUESTIONS===\n- How?\n===KEYWORDS===\n- mf6\n"
+        "===DOCUMENT_TYPE===\ncode\n===TECHNICAL_LEVEL===\nadvanced\n===END===\n"
+    )
+    
+    def test_build_contents(self):
+        """Test raw mode sends verbatim delimited parts and base64 mode one encoded prompt."""
+        content = "x = 1  # MFAI_CONTENT\n"
+        raw = build_analysis_contents(content, "Readme text", AnalysisContentMode.RAW)
+        texts = [part.text for part in raw.parts]
+        assert len(texts) == 3
+        assert texts[0] == "<<<MFAI_CONTENT_1 README>>>\nReadme text\n<<<END MFAI_CONTENT_1 README>>>"
+        assert texts[1] == f"<<<MFAI_CONTENT_1 FILE>>>\n{content}\n<<<END MFAI_CONTENT_1 FILE>>>"
+        assert "===TITLE===" in texts[2] and "base64" not in texts[2]
+        
+        encoded = build_analysis_contents(content, None, AnalysisContentMode.BASE64)
+        assert len(encoded.parts) == 1
+        assert "eCA9IDEgICMgTUZBSV9DT05URU5UCg==" in encoded.parts[0].text
+        assert content not in encoded.parts[0].text
+    
+    def test_content_cap(self):
+        """Test file content is capped below a large model input limit."""
+        budget = TokenBudget("test-model", ModelTokenLimits(1_048_576, 1_048_576, 1), use_tokenizer=False)
+        content = "word " * 200_000
+        raw = build_analysis_contents(content, None, AnalysisContentMode.RAW, budget=budget)
+        fitted = raw.parts[0].text
+        assert len(fitted) < len(content)
+        assert budget.count(fitted) <= budget.usable(MAX_ANALYSIS_CONTENT_TOKENS) + 20
+    
+    def test_unlisted_model_budget(self):
+        """Test unlisted Gemini models keep whole files and too small limits are rejected."""
+        budget = TokenBudget("gemini-1.5-flash-002", use_tokenizer=False)
+        assert budget.limits.max_input_tokens == 1_048_576
+        assert get_model_limits("gemini-embedding-exp").max_input_tokens == 2048
+        
+        content = "word " * 10_000
+        raw = build_analysis_contents(content, None, AnalysisContentMode.RAW, budget=budget)
+        assert raw.parts[0].text == f"<<<MFAI_CONTENT FILE>>>\n{content}\n<<<END MFAI_CONTENT FILE>>>"
+        
+        fitted, tokens = fit_analysis_content(content, budget)
+        assert fitted == content and tokens == budget.count(content)
+        
+        small = TokenBudget("test-model", ModelTokenLimits(100, 100, 1), use_tokenizer=False)
+        for mode in (AnalysisContentMode.RAW, AnalysisContentMode.BASE64):
+            with pytest.raises(ValueError):
+                build_analysis_contents(content, None, mode, budget=small)
+    
+    def test_parse_response(self):
+        """Test delimited responses are parsed and incomplete ones rejected."""
+        analysis = parse_analysis_response(self.RESPONSE)
+        assert analysis.title == "Solver"
+        assert analysis.keywords == ["mf6"]
+        
+        with pytest.raises(ValueError):
+            parse_analysis_response(None)
+        with pytest.raises(ValueError):
+            parse_analysis_response("===TITLE===\nOnly a title")
+    
+    @pytest.mark.asyncio
+    async def test_base64_fallback(self):
+        """Test unparseable raw-mode responses are retried once with base64 content."""
+        provider = GoogleGenAIEmbeddingProvider(GoogleGenAIEmbeddingConfig(api_key="test-key"))
+        modes = []
+        
+        async def request_analysis(contents, model=ANALYSIS_MODEL, max_output_tokens=None):
+            raw = len(contents.parts) > 1
+            modes.append(AnalysisContentMode.RAW if raw else AnalysisContentMode.BASE64)
+            return mock.Mock(text="I cannot help with that." if raw else self.RESPONSE)
+        
+        provider.request_analysis = request_analysis
+        analysis = await provider.generate_structured_analysis("print('hi')")
+        
+        assert analysis.title == "Solver"
+        assert modes == [AnalysisContentMode.RAW, AnalysisContentMode.BASE64]
+        assert provider.analysis_fallback_count == 1
+
+
+class TestLocalAnalysis:
+    """Tests for the rule-based local analyzers."""
+    
+    def test_modflow_and_pest_files(self):
+        """Test MODFLOW name files and PEST control files are parsed into analyses."""
+        registry = LocalAnalyzerRegistry()
+        nam = (
+            "BEGIN OPTIONS\n  SAVE_FLOWS\nEND OPTIONS\n"
+            "BEGIN PACKAGES\n  DIS6 model.dis\n  NPF6 model.npf\n  WEL6 model.wel wel-1\nEND PACKAGES\n"
+        )
+        analysis = registry.analyze("models/model.nam", nam)
+        assert analysis["title"] == "MODFLOW 6 Model Name File: model"
+        assert analysis["document_type"] == "configuration"
+        assert {"DIS6", "NPF6", "WEL6", "model.wel"} <= set(analysis["keywords"])
+        assert "well package" in analysis["summary"]
+        
+        # The content signature identifies name files without the extension
+        assert registry.analyze("models/mfsim.txt", nam)["title"].startswith("MODFLOW 6")
+        
+        pst = (
+            "pcf\n* control data\nrestart estimation\n 2 4 1 0 1\n"
+            "* parameter data\nhk1 log factor 1.0 0.01 100 hk 1.0 0.0 1\n"
+            "rch1 none factor 1.0 0.5 2 rch 1.0 0.0 1\n"
+            "* observation groups\nheads\n* model command line\nforward_run.bat\n"
+        )
+        analysis = registry.analyze("pest/case.pst", pst)
+        assert analysis["title"] == "PEST Control File: case"
+        assert {"hk1", "rch1", "heads"} <= set(analysis["keywords"])
+        assert "2 parameters and 4 observations" in analysis["summary"]
+        assert registry.counts == {"modflow-name-file": 2, "pest-control-file": 1}
+    
+    def test_configs_stubs_and_fallback(self):
+        """Test configuration and stub files are analyzed and other files left to the model."""
+        registry = LocalAnalyzerRegistry()
+        
+        analysis = registry.analyze("config/settings.json", json.dumps({"name": "demo", "solver": {"tol": 1e-6}}))
+        assert analysis["title"] == "JSON Configuration: settings.json"
+        assert "solver" in analysis["keywords"]
+        assert set(analysis) == set(StructuredResponseSchema.model_fields)
+        
+        analysis = registry.analyze("env.yml", "name: flopy\ndependencies:\n  - numpy\n")
+        assert analysis["keywords"][:4] == ["YAML", "configuration", "env.yml", "name"]
+        analysis = registry.analyze("pyproject.toml", "name = 'x'\n[tool.black]\nline-length = 88\n")
+        assert analysis["summary"].endswith("Top-level keys: name. Sections: tool.black.")
+        
+        analysis = registry.analyze("pkg/__init__.py", "")
+        assert analysis["document_type"] == "code"
+        assert analysis["technical_level"] == "beginner"
+        
+        code = "def solve(h):\n    return h * 2\n" * 20
+        assert registry.analyze("pkg/solver.py", code) is None
+        assert registry.analyze("data/big.json", "{" + "x" * 500) is None
+
+
+class TestRateLimiter:
+    """Tests for the RateLimiter class."""
+    
+    @pytest.mark.asyncio
+    async def test_requests_spread_in_arrival_order(self):
+        """Test concurrent requests are paced evenly and served first come, first served."""
+        limiter = RateLimiter(requests_per_minute=600, burst_seconds=0.1)
+        order = []
+        
+        async def request(i):
+            await limiter.acquire()
+            order.append(i)
+        
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(request(i) for i in range(5)))
+        elapsed = loop.time() - start
+        
+        assert order == [0, 1, 2, 3, 4]
+        assert 0.35 <= elapsed < 1.0
+    
+    @pytest.mark.asyncio
+    async def test_token_budget(self):
+        """Test large requests wait for the token budget."""
+        limiter = RateLimiter(tokens_per_minute=60_000, burst_seconds=0.2)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await limiter.acquire(tokens=100)
+        await limiter.acquire(tokens=100)
+        assert loop.time() - start < 0.05
+        await limiter.acquire(tokens=200)
+        assert loop.time() - start >= 0.15
+    
+    @pytest.mark.asyncio
+    async def test_retry_after_rate_limit_error(self):
+        """Test 429 errors pause the limiter for Retry-After and are retried."""
+        class RateLimitError(Exception):
+            status_code = 429
+            response = mock.Mock(headers={"retry-after": "0.05"})
+        
+        limiter = RateLimiter(requests_per_minute=6000)
+        calls = []
+        
+        async def request():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RateLimitError("Too many requests")
+            return "ok"
+        
+        assert await limiter.call(request) == "ok"
+        assert len(calls) == 2
+        assert limiter.throttled_count == 1
+        
+        async def failing():
+            raise ValueError("bad request")
+        
+        with pytest.raises(ValueError):
+            await limiter.call(failing)
+        assert limiter.throttled_count == 1
+    
+    def test_shared_per_provider_and_model(self):
+        """Test limiters are shared per provider and model."""
+        limiter = get_rate_limiter("test-provider", "model-a", requests_per_minute=100)
+        assert get_rate_limiter("test-provider", "model-a", requests_per_minute=100) is limiter
+        assert get_rate_limiter("test-provider", "model-b", requests_per_minute=100) is not limiter
+
+
+class TestAnalysisCache:
+    """Tests for the AnalysisCache class."""
+    
+    def test_round_trip(self, tmp_path):
+        """Test analyses and embeddings persist across cache instances."""
+        cache = AnalysisCache(tmp_path / "cache.sqlite")
+        assert cache.get_analysis("c", "r", "model", "1") is None
+        
+        cache.put_analysis("c", "r", "model", "1", {"title": "Test", "keywords": ["a"]})
+        cache.put_embedding("t", "embed-model", [0.1, 0.2, 0.3])
+        cache.close()
+        
+        cache = AnalysisCache(tmp_path / "cache.sqlite")
+        assert cache.get_analysis("c", "r", "model", "1") == {"title": "Test", "keywords": ["a"]}
+        assert cache.get_analysis("c", "r", "model", "2") is None
+        assert cache.get_embedding("t", "embed-model") == [0.1, 0.2, 0.3]
+        assert cache.hits == 2
+        assert cache.misses == 1
+    
+    @pytest.mark.asyncio
+    async def test_manager_skips_api_calls_on_hit(self):
+        """Test the manager consults the cache before calling providers."""
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            manager = EmbeddingManager(
+                primary_provider=ProviderType.OPENAI,
+                cache=AnalysisCache(":memory:"),
+            )
+        
+        mock_analyzer = mock.create_autospec(GoogleGenAIEmbeddingProvider, instance=True)
+        mock_analyzer.generate_structured_analysis.return_value = mock.Mock(
+            model_dump=mock.Mock(return_value={"title": "T"})
+        )
+        mock_analyzer.get_analysis_budget.return_value = TokenBudget(ANALYSIS_MODEL, use_tokenizer=False)
+        manager.secondary_provider = mock_analyzer
+        manager.secondary_provider_type = ProviderType.GOOGLE_GENAI
+        
+        mock_embedder = mock.AsyncMock()
+        mock_embedder.config = OpenAIEmbeddingConfig(model="test-model", dimensions=3)
+        mock_embedder.token_budget = TokenBudget("test-model", use_tokenizer=False)
+        mock_embedder.embed_text.return_value = EmbeddingVector(vector=[0.1, 0.2, 0.3], model="test-model")
+        manager.primary_provider = mock_embedder
+        
+        for _ in range(2):
+            assert await manager.analyze_file_content("content", "readme") == {"title": "T"}
+            vector = await manager.embed_text("text")
+            assert vector.vector == [0.1, 0.2, 0.3]
+        
+        assert mock_analyzer.generate_structured_analysis.await_count == 1
+        assert mock_embedder.embed_text.await_count == 1
+        assert manager.request_count == 2
+        
+        # Closing releases the cache file; later requests go to the providers
+        await manager.close()
+        assert manager.cache is None
+        await manager.embed_text("text")
+        assert mock_embedder.embed_text.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_readme_context_generated_once(self):
+        """Test a long README is condensed once and reused across managers."""
+        cache = AnalysisCache(":memory:")
+        readme = "A groundwater model of the upper basin with wells and rivers. " * 200
+        calls = []
+        
+        for _ in range(2):
+            manager = EmbeddingManager(
+                primary_provider=ProviderType.GOOGLE_GENAI,
+                primary_config=GoogleGenAIEmbeddingConfig(api_key="test-key"),
+                cache=cache,
+            )
+            generate = mock.AsyncMock(return_value="Groundwater model summary.")
+            manager.primary_provider.generate_readme_context = generate
+            
+            contexts = await asyncio.gather(*(manager.get_readme_context(readme, "repo") for _ in range(3)))
+            assert contexts == ["Groundwater model summary."] * 3
+            assert await manager.get_readme_context("Short README.") == "Short README."
+            assert await manager.get_readme_context(None) is None
+            calls.append(generate.await_count)
+        
+        # Only the first manager called the model, the second read the cache
+        assert calls == [1, 0]
+        assert cache.get_readme_context(content_hash(readme), ANALYSIS_MODEL, README_CONTEXT_PROMPT_VERSION)
+
+
+class TestAnalysisRouting:
+    """Tests for routing analyses to model tiers."""
+    
+    def test_route_files(self):
+        """Test small and low-value files go to the light tier and others to the standard tier."""
+        policy = AnalysisRoutingPolicy(
+            standard_model="standard-model", light_model="light-model", repo_tiers={"core": AnalysisTier.STANDARD}
+        )
+        assert policy.route("src/model.py", 500).model == "light-model"
+        assert policy.route("data/heads.csv", 50000).tier == AnalysisTier.LIGHT
+        assert policy.route("src/model.py", 50000).tier == AnalysisTier.STANDARD
+        assert policy.route("scripts/run_model.sh", 50000).tier == AnalysisTier.STANDARD
+        assert policy.route("data/heads.csv", 500, "core").tier == AnalysisTier.STANDARD
+        assert policy.counts == {AnalysisTier.LIGHT: 2, AnalysisTier.STANDARD: 3}
+        
+        assert policy.light.prompt_version != policy.standard.prompt_version
+        assert policy.routes == [policy.standard, policy.light]
+        assert AnalysisRoutingPolicy(light_model="").route("a.csv", 10).tier == AnalysisTier.STANDARD
+        assert AnalysisRoutingPolicy(light_model="").routes == [AnalysisRoutingPolicy().standard]
+    
+    def test_from_env(self):
+        """Test thresholds, categories and repository overrides are read from the environment."""
+        env = {
+            "ANALYSIS_LIGHT_MAX_CHARS": "0",
+            "ANALYSIS_LIGHT_CATEGORIES": "documentation",
+            "ANALYSIS_REPO_TIERS": "scratch=light, core=standard, bad=fast",
+        }
+        with mock.patch.dict("mfai_db_repos.utils.env.env", env):
+            policy = AnalysisRoutingPolicy.from_env(light_model="light-model")
+        
+        assert policy.standard_model == ANALYSIS_MODEL
+        assert policy.repo_tiers == {"scratch": AnalysisTier.LIGHT, "core": AnalysisTier.STANDARD}
+        assert policy.route("notes.md", 10).tier == AnalysisTier.LIGHT
+        assert policy.route("heads.csv", 10).tier == AnalysisTier.STANDARD
+        assert policy.route("src/model.py", 10, "scratch").tier == AnalysisTier.LIGHT
+    
+    @pytest.mark.asyncio
+    async def test_manager_uses_route(self):
+        """Test the manager sends the model and prompt of a route and caches analyses per route."""
+        policy = AnalysisRoutingPolicy(standard_model="standard-model", light_model="light-model")
+        manager = EmbeddingManager(
+            primary_provider=ProviderType.GOOGLE_GENAI,
+            primary_config=GoogleGenAIEmbeddingConfig(api_key="test-key"),
+            cache=AnalysisCache(":memory:"),
+            routing_policy=policy,
+        )
+        requests = []
+        
+        async def request_analysis(contents, model=ANALYSIS_MODEL, max_output_tokens=None):
+            requests.append((model, BRIEF_ANALYSIS_INSTRUCTIONS in contents.parts[-1].text))
+            return mock.Mock(text=TestAnalysisContentModes.RESPONSE)
+        
+        manager.primary_provider.request_analysis = request_analysis
+        for route in (policy.light, policy.standard, policy.light):
+            analysis = await manager.analyze_file_content("x = 1\n", None, route)
+            assert analysis["title"] == "Solver"
+        
+        assert requests == [("light-model", True), ("standard-model", False)]
+        
+        brief = build_analysis_contents("x = 1\n", None, AnalysisContentMode.RAW, variant=AnalysisPromptVariant.BRIEF)
+        assert BRIEF_ANALYSIS_INSTRUCTIONS in brief.parts[-1].text
+
+
 @pytest.mark.asyncio
 class TestEmbeddingProviders:
     """Tests for embedding providers using mocks."""
@@ -191,6 +733,7 @@ class TestEmbeddingManager:
         """Test embedding text with the manager."""
         # Create mock provider
         mock_provider = mock.AsyncMock()
+        mock_provider.token_budget = TokenBudget("test-model", use_tokenizer=False)
         mock_result = EmbeddingVector(vector=[0.1, 0.2, 0.3], model="test-model")
         mock_provider.embed_text.return_value = mock_result
         
@@ -206,6 +749,7 @@ class TestEmbeddingManager:
         """Test embedding a batch with the manager."""
         # Create mock provider
         mock_provider = mock.AsyncMock()
+        mock_provider.token_budget = TokenBudget("test-model", use_tokenizer=False)
         mock_results = [
             EmbeddingVector(vector=[0.1, 0.2, 0.3], model="test-model"),
             EmbeddingVector(vector=[0.4, 0.5, 0.6], model="test-model")
@@ -225,7 +769,9 @@ class TestEmbeddingManager:
         """Test using the secondary provider."""
         # Create mock providers
         mock_primary = mock.AsyncMock()
+        mock_primary.token_budget = TokenBudget("test-model", use_tokenizer=False)
         mock_secondary = mock.AsyncMock()
+        mock_secondary.token_budget = TokenBudget("test-model", use_tokenizer=False)
         
         mock_primary_result = EmbeddingVector(vector=[0.1, 0.2, 0.3], model="primary-model")
         mock_secondary_result = EmbeddingVector(vector=[0.4, 0.5, 0.6], model="secondary-model")
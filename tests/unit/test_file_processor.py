@@ -3,7 +3,10 @@ Unit tests for file processor components.
 
 These tests verify the functionality of file extraction, filtering, and processing.
 """
+import codecs
+import hashlib
 import os
+import pickle
 import tempfile
 from datetime import datetime
 from pathlib import Path
@@ -12,11 +15,24 @@ from unittest.mock import Mock, patch
 
 import pytest
 
+from mfai_db_repos.lib.file_processor.encoding import DETECTION_SAMPLE_BYTES, EncodingDetector
 from mfai_db_repos.lib.file_processor.extractor import FileExtractor
 from mfai_db_repos.lib.file_processor.filter import FileFilter, FileTypeDetector
+from mfai_db_repos.lib.file_processor.ignores import IgnoreManager
+from mfai_db_repos.lib.file_processor.languages import (
+    GUESS_PREFIX_CHARS,
+    detect_language,
+    get_lexer,
+    language_for_filename,
+)
+from mfai_db_repos.lib.file_processor.matcher import PatternMatcher, glob_match
 from mfai_db_repos.lib.file_processor.metadata import MetadataExtractor
 from mfai_db_repos.lib.file_processor.patterns import PatternConfig, PatternManager, PatternSet
+from mfai_db_repos.lib.file_processor.pipeline import ExtractionPipeline, ProcessingOptions, ProcessingResult
 from mfai_db_repos.lib.file_processor.processor import FileProcessor
+from mfai_db_repos.lib.file_processor.sampler import DataSampler
+from mfai_db_repos.lib.file_processor.scanner import FileCandidate, RepositoryScanner
+from mfai_db_repos.lib.file_processor.tracker import FileStatus, FileStatusTracker
 from mfai_db_repos.lib.git.repository import GitRepository, RepoStatus
 
 
@@ -155,6 +171,334 @@ class TestFileExtractor:
         metadata = extractor.get_file_metadata("nonexistent.py")
         assert "error" in metadata
 
+    def test_read_file(self, temp_file):
+        """Test reading a file into a single ingestion record."""
+        extractor = FileExtractor()
+        
+        record = extractor.read_file(temp_file)
+        assert record.text == "Test content for file extractor"
+        assert record.data == b"Test content for file extractor"
+        assert record.size == len(record.data)
+        assert record.is_binary is False
+        assert record.content_hash == hashlib.sha256(record.data).hexdigest()
+        assert record.metadata["file_size"] == record.size
+        assert record.metadata == {**extractor.get_file_metadata(temp_file), "file_type": record.file_type}
+        
+        # Non-UTF-8 text is decoded from the bytes already read
+        with open(temp_file, "wb") as f:
+            f.write("Grüße aus München, schöne Grüße\n".encode("latin-1") * 20)
+        record = extractor.read_file(temp_file)
+        assert record.encoding != "utf-8"
+        assert "München" in record.text
+        
+        # Null bytes mark the file as binary without decoding it
+        with open(temp_file, "wb") as f:
+            f.write(b"\x00\x01\x02data")
+        record = extractor.read_file(temp_file)
+        assert record.is_binary is True
+        assert record.text is None
+        
+        # Missing and oversized files are rejected
+        assert extractor.read_file("nonexistent.py") is None
+        assert FileExtractor(max_file_size_mb=0.000001).read_file(temp_file) is None
+
+
+class TestEncodingDetector:
+    """Test cases for EncodingDetector byte-level detection."""
+
+    def test_detect_bytes_cascade(self):
+        """Test BOM, UTF-8, Western and statistical detection."""
+        detector = EncodingDetector()
+        
+        assert detector.detect_bytes_encoding(codecs.BOM_UTF8 + b"text").bom_detected is True
+        assert detector.detect_bytes_encoding(b"plain ascii").encoding == "utf-8"
+        assert detector.detect_bytes_encoding("Grüße".encode("utf-8")).encoding == "utf-8"
+        
+        # A few accented bytes in ASCII text take the Western fast path without chardet
+        western = "      PROGRAM LAKE  ! Température moyenne\n".encode("latin-1") * 10
+        with patch("mfai_db_repos.lib.file_processor.encoding.chardet.detect") as mock_detect:
+            assert detector.detect_bytes_encoding(western).encoding == "cp1252"
+            mock_detect.assert_not_called()
+        
+        # Mostly non-ASCII text goes to chardet on a bounded sample
+        cyrillic = "Привет, как дела? Это тестовый файл.\n".encode("cp1251") * 200
+        with patch(
+            "mfai_db_repos.lib.file_processor.encoding.chardet.detect",
+            return_value={"encoding": "windows-1251", "confidence": 0.95},
+        ) as mock_detect:
+            text, result = detector.decode_bytes(cyrillic)
+            assert result.encoding == "windows_1251"
+            assert text.startswith("Привет")
+            assert len(mock_detect.call_args[0][0]) <= DETECTION_SAMPLE_BYTES
+
+    def test_sibling_files_share_detected_encoding(self, tmp_path):
+        """Test the encoding detected for one file is reused for its siblings."""
+        detector = EncodingDetector()
+        cyrillic = "Привет, как дела? Это тестовый файл.\n".encode("cp1251") * 20
+        
+        with patch(
+            "mfai_db_repos.lib.file_processor.encoding.chardet.detect",
+            return_value={"encoding": "windows-1251", "confidence": 0.95},
+        ) as mock_detect:
+            detector.detect_bytes_encoding(cyrillic, tmp_path / "a.dat")
+            result = detector.detect_bytes_encoding(cyrillic, tmp_path / "b.dat")
+            assert result.encoding == "windows_1251"
+            assert mock_detect.call_count == 1
+            
+            # Other extensions are detected on their own
+            detector.detect_bytes_encoding(cyrillic, tmp_path / "c.txt")
+            assert mock_detect.call_count == 2
+
+
+class TestLanguageDetection:
+    """Test cases for table-based language detection."""
+
+    def test_language_for_filename(self):
+        """Test file names resolve to languages without a lexer search."""
+        assert language_for_filename("src/model.py") == "Python"
+        assert language_for_filename("gwf.F90") == "Fortran"
+        assert language_for_filename("legacy.for") == "FortranFixed"
+        assert language_for_filename("Makefile") == "Makefile"
+        assert language_for_filename("Makefile.am") == "Makefile"
+        assert language_for_filename("model.nam") is None
+
+    def test_detect_language_guesses_prefix_only(self):
+        """Test content is only guessed for unknown names, from a short prefix."""
+        with patch("mfai_db_repos.lib.file_processor.languages.guess_lexer") as mock_guess:
+            assert detect_language("script.py", "print(1)") == "Python"
+            mock_guess.assert_not_called()
+            
+            detect_language("README", "x" * (GUESS_PREFIX_CHARS * 3))
+            assert len(mock_guess.call_args[0][0]) == GUESS_PREFIX_CHARS
+        
+        assert detect_language("README", "") == "text"
+        assert get_lexer("python") is get_lexer("Python")
+
+
+class TestRepositoryScanner:
+    """Test cases for RepositoryScanner class."""
+
+    @pytest.fixture
+    def repo_dir(self, tmp_path):
+        """Create a small repository-like directory tree."""
+        files = {
+            "setup.py": "print('setup')",
+            "src/model.py": "x = 1",
+            "src/notes.md": "# Notes",
+            "src/data.bin.py": "abc\x00def",
+            "node_modules/lib/index.js": "module.exports = {}",
+            ".git/config": "[core]",
+            "src/image.png": "not really an image",
+            "src/big.py": "y" * 4096,
+        }
+        for rel_path, content in files.items():
+            full_path = tmp_path / rel_path
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+            full_path.write_text(content)
+        return tmp_path
+
+    def test_scan_returns_candidates(self, repo_dir):
+        """Test that scanning yields compact records for matching files."""
+        scanner = RepositoryScanner(
+            include_patterns=["**/*.py", "**/*.md", "**/*.png"],
+            exclude_patterns=["**/node_modules/**"],
+        )
+        candidates = {c.path: c for c in scanner.scan(repo_dir)}
+
+        assert set(candidates) == {
+            "setup.py",
+            os.path.join("src", "model.py"),
+            os.path.join("src", "notes.md"),
+            os.path.join("src", "data.bin.py"),
+            os.path.join("src", "image.png"),
+            os.path.join("src", "big.py"),
+        }
+        model = candidates[os.path.join("src", "model.py")]
+        assert isinstance(model, FileCandidate)
+        assert model.size == 5
+        assert model.abs_path == str(repo_dir / "src" / "model.py")
+        assert model.mtime > 0
+        assert model.is_binary is False
+        assert candidates[os.path.join("src", "data.bin.py")].is_binary is True
+        assert candidates[os.path.join("src", "image.png")].is_binary is True
+
+    def test_scan_prunes_excluded_directories(self, repo_dir):
+        """Test that excluded directories are never descended into."""
+        scanner = RepositoryScanner(
+            include_patterns=["**/*"],
+            exclude_patterns=["**/node_modules/**"],
+        )
+
+        with patch("os.scandir", wraps=os.scandir) as mock_scandir:
+            paths = {c.path for c in scanner.scan(repo_dir)}
+
+        scanned_dirs = {str(call.args[0]) for call in mock_scandir.call_args_list}
+        assert str(repo_dir / "node_modules") not in scanned_dirs
+        assert str(repo_dir / ".git") not in scanned_dirs
+        assert not any(p.startswith("node_modules") for p in paths)
+        assert not any(p.startswith(".git") for p in paths)
+
+    def test_scan_size_and_limit(self, repo_dir):
+        """Test the size cap and the result limit."""
+        scanner = RepositoryScanner(
+            include_patterns=["**/*.py"],
+            exclude_patterns=[],
+            max_file_size_mb=1024 / (1024 * 1024),
+        )
+        paths = {c.path for c in scanner.scan(repo_dir)}
+        assert os.path.join("src", "big.py") not in paths
+
+        assert len(scanner.scan(repo_dir, limit=2)) == 2
+
+
+class TestPatternMatcher:
+    """Test cases for PatternMatcher class."""
+
+    def test_glob_semantics(self):
+        """Test ** and basename glob semantics."""
+        assert glob_match("a.py", "**/*.py")
+        assert glob_match("src/pkg/a.py", "**/*.py")
+        assert glob_match("src/pkg/a.py", "*.py")
+        assert glob_match("docs/guide/index.md", "docs/**")
+        assert not glob_match("src/docs/index.md", "/docs/**")
+        assert not glob_match("src/a.py", "src/*/a.py")
+        assert glob_match("src/x/a.py", "src/*/a.py")
+        assert glob_match("pkg/node_modules/lib/a.js", "**/node_modules/**")
+        assert glob_match("src/Makefile", "**/Makefile")
+
+    def test_matches_include_exclude_tests(self):
+        """Test combined include, exclude and test pattern rules."""
+        matcher = PatternMatcher(
+            include_patterns=["**/*.py", "**/*.md"],
+            exclude_patterns=["**/build/**", "**/*.min.js"],
+            test_patterns=["**/test_*.py", "**/tests/**"],
+            include_tests=False,
+        )
+
+        assert matcher.matches("src/module.py")
+        assert matcher.matches("README.md")
+        assert not matcher.matches("src/module.js")
+        assert not matcher.matches("build/module.py")
+        assert not matcher.matches("src/test_module.py")
+        assert not matcher.matches("tests/helpers.py")
+        assert matcher.is_test("src/test_module.py")
+
+        with_tests = PatternMatcher(
+            include_patterns=["**/*.py"],
+            test_patterns=["**/test_*.py"],
+            include_tests=True,
+        )
+        assert with_tests.matches("src/test_module.py")
+
+    def test_should_prune_directory(self):
+        """Test whole-directory pruning decisions."""
+        matcher = PatternMatcher(
+            exclude_patterns=["**/node_modules/**", "docs/_build/**"],
+            test_patterns=["**/tests/**"],
+            include_tests=False,
+        )
+
+        assert matcher.should_prune_directory("node_modules")
+        assert matcher.should_prune_directory("web/node_modules")
+        assert matcher.should_prune_directory("docs/_build")
+        assert matcher.should_prune_directory("tests")
+        assert not matcher.should_prune_directory("docs")
+        assert not matcher.should_prune_directory("src")
+
+
+class TestIgnoreManager:
+    """Test cases for IgnoreManager class."""
+
+    @pytest.fixture
+    def repo_dir(self, tmp_path):
+        """Create a repository tree with nested .gitignore files."""
+        (tmp_path / ".gitignore").write_text("*.log\nbuild/\n/local.cfg\n")
+        (tmp_path / "src").mkdir()
+        (tmp_path / "src" / ".gitignore").write_text("!keep.log\ngenerated/\n")
+        (tmp_path / "src" / "generated").mkdir()
+        (tmp_path / "src" / "generated" / ".gitignore").write_text("!*.py\n")
+        (tmp_path / "build").mkdir()
+        return tmp_path
+
+    def test_nested_gitignore_precedence(self, repo_dir):
+        """Test that deeper .gitignore files override shallower ones."""
+        manager = IgnoreManager(default_ignores=[".git/"])
+        manager.parse_gitignore_in_repo(repo_dir)
+
+        assert set(manager.directory_patterns) == {"", "src"}
+        assert manager.should_ignore("debug.log")
+        assert manager.should_ignore("src/debug.log")
+        assert not manager.should_ignore("src/keep.log")
+        assert manager.should_ignore("keep.log")
+        assert manager.should_ignore("local.cfg")
+        assert not manager.should_ignore("src/local.cfg")
+        assert not manager.should_ignore(repo_dir / "src" / "main.py")
+
+    def test_ignored_directory_excludes_subtree(self, repo_dir):
+        """Test that files below an ignored directory stay ignored."""
+        manager = IgnoreManager(default_ignores=[".git/"])
+        manager.parse_gitignore_in_repo(repo_dir)
+
+        assert manager.is_directory_ignored("build")
+        assert manager.is_directory_ignored(repo_dir / "src" / "generated")
+        assert manager.should_ignore("build/lib/module.py")
+        # Negations inside an ignored directory cannot re-include files
+        assert manager.should_ignore("src/generated/module.py")
+
+        filtered = manager.filter_paths(["src/main.py", "build/out.py", "app.log"])
+        assert filtered == [Path("src/main.py")]
+
+
+class TestDataSampler:
+    """Tests for the DataSampler class."""
+    
+    def test_samples_data_files(self):
+        """Test array-dominated text is replaced by excerpts and statistics."""
+        lines = []
+        for period in range(1, 21):
+            lines.append(f" HEAD IN LAYER   1 AT END OF TIME STEP   1 IN STRESS PERIOD {period:4d}")
+            for row in range(200):
+                lines.append(" ".join(f"{period + row / 1000 + col:.4E}" for col in range(8)))
+        lines.append(" NORMAL TERMINATION OF SIMULATION")
+        content = "\n".join(lines)
+        
+        sampled = DataSampler().sample(content)
+        assert sampled is not None
+        assert len(sampled) * 20 < len(content)
+        assert "4021 lines, 4000 numeric rows" in sampled
+        assert "[Values per numeric row: 8 in 100% of rows]" in sampled
+        assert "[Column 1: min 1, max 20.199, mean 10.5995]" in sampled
+        assert "20 x HEAD IN LAYER # AT END OF TIME STEP # IN STRESS PERIOD #" in sampled
+        assert sampled.rstrip().endswith("NORMAL TERMINATION OF SIMULATION")
+    
+    def test_leaves_other_content(self):
+        """Test short files and files that are mostly text are not sampled."""
+        sampler = DataSampler(min_chars=1000)
+        assert sampler.sample("1 2 3\n" * 100) is None
+        
+        code = "def solve(h, k):\n    return h * k  # 1 2 3\n" * 100
+        assert sampler.sample(code) is None
+        
+        csv = "well,x,y,rate\n" + "\n".join(f"{i},{i * 10.0},{i * 5.0},-1.5D+02" for i in range(500))
+        sampled = sampler.sample(csv)
+        assert sampled.splitlines()[0] == (
+            f"[Sampled data file: {len(csv)} characters, 501 lines, 500 numeric rows (100% of the content)]"
+        )
+        assert "[Column 4: min -150, max -150, mean -150]" in sampled
+        assert DataSampler(min_chars=0).sample(csv) is None
+    
+    def test_long_digit_runs_profile_in_linear_time(self):
+        """Test long digit runs ending in a non-separator are profiled quickly as text lines."""
+        import time
+        
+        lines = ["1" * 50_000 + "x", "1, 2.5;3D+02 ,", ",1 2", "1-2"]
+        start = time.perf_counter()
+        profile, text_indices = DataSampler().profile(lines)
+        assert time.perf_counter() - start < 1.0
+        assert text_indices == [0, 2, 3]
+        assert profile.data_lines == 1
+        assert profile.column_counts == {3: 1}
+
 
 class TestFileTypeDetector:
     """Test cases for FileTypeDetector class."""
@@ -399,4 +743,123 @@ class TestPatternManager:
         
         # Filter with default pattern
         filtered = manager.filter_files(file_paths)
-        assert len(filtered) > 0
\ No newline at end of file
+        assert len(filtered) > 0
+
+
+class TestExtractionPipeline:
+    """Test cases for ExtractionPipeline executors."""
+
+    @pytest.fixture
+    def source_dir(self, tmp_path):
+        """Create a directory of small source files."""
+        for i in range(12):
+            (tmp_path / f"module_{i}.py").write_text(f"def function_{i}():\n    return {i}\n")
+        (tmp_path / "image.png").write_bytes(b"\x89PNG\x00\x00")
+        return tmp_path
+
+    def test_result_pickles_as_tuple(self):
+        """Test results pickle without repeating field names."""
+        result = ProcessingResult(path="a.py", name="a.py", content="x = 1", metadata={"language": "Python"})
+        state = result.__getstate__()
+        assert isinstance(state, tuple)
+        assert pickle.loads(pickle.dumps(result)) == result
+
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_parallel_executors_match_serial(self, source_dir, executor):
+        """Test parallel executors return the serial results in the same order."""
+        options = ProcessingOptions(extract_metadata=False)
+        files = sorted(source_dir.iterdir())
+        
+        serial = ExtractionPipeline(options=options).process_files(files, base_path=source_dir)
+        parallel = ExtractionPipeline(options=options, executor=executor, chunk_size=3).process_files(
+            files, base_path=source_dir, max_workers=2
+        )
+        
+        assert [r.to_dict() for r in parallel] == [r.to_dict() for r in serial]
+        assert sum(1 for r in parallel if r.success) == 12
+
+
+class TestFileStatusTracker:
+    """Test cases for FileStatusTracker snapshots and change detection."""
+
+    def test_snapshot_stat_first_detection(self, tmp_path):
+        """Test a reloaded snapshot only hashes files whose stat changed."""
+        work_dir = tmp_path / "work"
+        (work_dir / ".git").mkdir(parents=True)
+        (work_dir / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+        (work_dir / "a.py").write_text("a = 1\n")
+        (work_dir / "b.py").write_text("b = 1\n")
+        cache_file = tmp_path / "status.sqlite"
+        
+        tracker = FileStatusTracker()
+        assert sorted(e.path for e in tracker.track_directory(work_dir, baseline={})) == ["a.py", "b.py"]
+        tracker.last_commit_hash = "abc123"
+        assert tracker.save_cache(cache_file, "repo") is True
+        
+        # Unchanged tree: nothing reported and nothing hashed
+        reloaded = FileStatusTracker()
+        assert reloaded.load_cache(cache_file, "repo") is True
+        assert reloaded.last_commit_hash == "abc123"
+        assert reloaded.load_cache(cache_file, "repo", commit_hash="other") is False
+        with patch.object(FileStatusTracker, "_compute_file_hash") as mock_hash:
+            assert reloaded.track_directory(work_dir) == []
+            mock_hash.assert_not_called()
+        
+        # Rewritten with identical content: hashed once, not reported
+        stat = (work_dir / "a.py").stat()
+        (work_dir / "a.py").write_text("a = 1\n")
+        os.utime(work_dir / "a.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        (work_dir / "b.py").write_text("b = 2\n")
+        changes = reloaded.track_directory(work_dir)
+        assert [(e.path, e.status) for e in changes] == [("b.py", FileStatus.MODIFIED)]
+
+    def test_snapshot_records_hash_algorithm_used(self, tmp_path):
+        """Test a tracker asked for xxhash without xxhash installed records blake2b."""
+        import sqlite3
+        
+        from mfai_db_repos.lib.file_processor import tracker as tracker_module
+        
+        work_dir = tmp_path / "work"
+        work_dir.mkdir()
+        (work_dir / "a.py").write_text("a = 1\n")
+        cache_file = tmp_path / "status.sqlite"
+        
+        with patch.object(tracker_module, "xxhash", None):
+            tracker = FileStatusTracker(hash_algorithm="xxhash")
+            assert tracker.hash_algorithm == "blake2b"
+            tracker.track_directory(work_dir, baseline={})
+            assert tracker.save_cache(cache_file, "repo") is True
+        
+        with sqlite3.connect(cache_file) as conn:
+            assert conn.execute("SELECT hash_algorithm FROM snapshots").fetchone() == ("blake2b",)
+        assert FileStatusTracker(hash_algorithm="unknown").hash_algorithm == "md5"
+
+    def test_failed_files_stay_changed(self, tmp_path):
+        """Test files that failed to process are reported as changed by the next run."""
+        from git import Repo
+
+        work_dir = tmp_path / "work"
+        work_dir.mkdir()
+        repo = Repo.init(work_dir)
+        with repo.config_writer() as writer:
+            writer.set_value("user", "name", "Test")
+            writer.set_value("user", "email", "test@example.com")
+        (work_dir / "a.py").write_text("a = 1\n")
+        (work_dir / "b.py").write_text("b = 1\n")
+        repo.index.add(["a.py", "b.py"])
+        repo.index.commit("initial")
+        git_repo = GitRepository("https://github.com/user/repo.git", clone_path=work_dir)
+        cache_file = str(tmp_path / "status.sqlite")
+
+        def process_files(filepaths, base_path=None, max_workers=None):
+            return [
+                ProcessingResult(path=path.name, name=path.name, success=path.name != "b.py")
+                for path in filepaths
+            ]
+
+        for expected in (["a.py", "b.py"], ["b.py"]):
+            pipeline = ExtractionPipeline()
+            with patch("mfai_db_repos.lib.file_processor.pipeline.get_env", return_value=cache_file), \
+                    patch.object(pipeline, "process_files", side_effect=process_files) as mock_process:
+                pipeline.process_repository(git_repo)
+            assert sorted(path.name for path in mock_process.call_args[0][0]) == expected
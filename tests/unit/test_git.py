@@ -3,6 +3,7 @@ Unit tests for Git operations.
 
 These tests verify the functionality of Git repository management.
 """
+import asyncio
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple, Union
@@ -15,7 +16,7 @@ from unittest.mock import MagicMock, Mock, patch
 import pytest
 from git import Repo
 
-from mfai_db_repos.lib.git.repository import GitRepository, RepoStatus
+from mfai_db_repos.lib.git.repository import GitRepository, RepoStatus, sparse_checkout_patterns
 
 
 class TestGitRepository:
@@ -221,19 +222,20 @@ class TestGitRepository:
         # Test when cloned
         mock_is_cloned.return_value = True
         repo._repo = mock_repo
-        repo._repo.git.show.return_value = "file content"
+        repo._object_reader = MagicMock()
+        repo._object_reader.read_blob.return_value = b"file content"
         
         content = repo.get_file_content("file.py")
         assert content == "file content"
-        repo._repo.git.show.assert_called_with("HEAD:file.py")
+        repo._object_reader.read_blob.assert_called_with("HEAD", "file.py")
         
         # Test with specific revision
         content = repo.get_file_content("file.py", "abcdef")
         assert content == "file content"
-        repo._repo.git.show.assert_called_with("abcdef:file.py")
+        repo._object_reader.read_blob.assert_called_with("abcdef", "file.py")
         
         # Test when file doesn't exist
-        repo._repo.git.show.side_effect = Exception("File not found")
+        repo._object_reader.read_blob.return_value = None
         assert repo.get_file_content("nonexistent.py") is None
 
     @patch.object(GitRepository, "is_cloned")
@@ -341,4 +343,221 @@ class TestGitRepository:
         with patch("shutil.rmtree") as mock_rmtree:
             mock_rmtree.side_effect = Exception("Cleanup failed")
             result = repo.cleanup()
-            assert result is False
\ No newline at end of file
+            assert result is False
+
+    def test_get_file_commit_map(self, temp_dir):
+        """Test resolving the last commit of every file in one pass."""
+        clone_path = Path(temp_dir) / "test_repo"
+        clone_path.mkdir()
+        git_repo = Repo.init(clone_path)
+        with git_repo.config_writer() as writer:
+            writer.set_value("user", "name", "Test")
+            writer.set_value("user", "email", "test@example.com")
+        
+        (clone_path / "a.py").write_text("a = 1\n")
+        (clone_path / "docs").mkdir()
+        (clone_path / "docs" / "guide.md").write_text("# Guide\n")
+        git_repo.index.add(["a.py", "docs/guide.md"])
+        first = git_repo.index.commit("first").hexsha
+        
+        (clone_path / "a.py").write_text("a = 2\n")
+        git_repo.index.add(["a.py"])
+        second = git_repo.index.commit("second").hexsha
+        
+        repo = GitRepository("https://github.com/user/repo.git", clone_path=clone_path)
+        commit_map = repo.get_file_commit_map()
+        assert commit_map == {"a.py": second, "docs/guide.md": first}
+        assert repo.get_file_commit_hash("docs/guide.md") == first
+        assert repo.get_file_commit_hash("missing.py") == second
+        
+        # Cached per HEAD commit
+        with patch.object(repo, "_build_commit_map") as mock_build:
+            assert repo.get_file_commit_map() is commit_map
+            mock_build.assert_not_called()
+    
+    def test_get_changes_since(self, temp_dir):
+        """Test classifying files changed since a commit."""
+        clone_path = Path(temp_dir) / "test_repo"
+        clone_path.mkdir()
+        git_repo = Repo.init(clone_path)
+        with git_repo.config_writer() as writer:
+            writer.set_value("user", "name", "Test")
+            writer.set_value("user", "email", "test@example.com")
+        
+        body = "".join(f"line {i}\n" for i in range(50))
+        for name in ("keep.py", "edit.py", "gone.py", "move.py", "move_edit.py"):
+            (clone_path / name).write_text(f"# {name}\n{body}")
+        git_repo.index.add(["keep.py", "edit.py", "gone.py", "move.py", "move_edit.py"])
+        base = git_repo.index.commit("base").hexsha
+        
+        (clone_path / "edit.py").write_text("# edited\n" + body)
+        (clone_path / "new.py").write_text("new = True\n")
+        git_repo.git.rm("gone.py")
+        git_repo.git.mv("move.py", "moved.py")
+        git_repo.git.mv("move_edit.py", "moved_edit.py")
+        (clone_path / "moved_edit.py").write_text("# move_edit.py\n" + body + "extra\n")
+        git_repo.git.add("-A")
+        git_repo.index.commit("changes")
+        
+        repo = GitRepository("https://github.com/user/repo.git", clone_path=clone_path)
+        changes = repo.get_changes_since(base)
+        assert changes.added == ["new.py"]
+        assert sorted(changes.modified) == ["edit.py", "moved_edit.py"]
+        assert changes.deleted == ["gone.py"]
+        assert sorted(changes.renamed) == [("move.py", "moved.py"), ("move_edit.py", "moved_edit.py")]
+        assert sorted(changes.to_process) == ["edit.py", "moved_edit.py", "new.py"]
+        
+        # Unknown base commits require a full run
+        assert repo.get_changes_since("0" * 40) is None
+    
+    def test_get_blob_sha_map(self, temp_dir):
+        """Test identical file contents map to the same blob SHA."""
+        clone_path = Path(temp_dir) / "test_repo"
+        (clone_path / "sub").mkdir(parents=True)
+        git_repo = Repo.init(clone_path)
+        with git_repo.config_writer() as writer:
+            writer.set_value("user", "name", "Test")
+            writer.set_value("user", "email", "test@example.com")
+        
+        (clone_path / "a.py").write_text("shared = True\n")
+        (clone_path / "sub" / "b.py").write_text("shared = True\n")
+        (clone_path / "c.py").write_text("other = True\n")
+        git_repo.index.add(["a.py", "sub/b.py", "c.py"])
+        git_repo.index.commit("initial")
+        
+        repo = GitRepository("https://github.com/user/repo.git", clone_path=clone_path)
+        blob_map = repo.get_blob_sha_map()
+        assert set(blob_map) == {"a.py", "sub/b.py", "c.py"}
+        assert blob_map["a.py"] == blob_map["sub/b.py"]
+        assert blob_map["a.py"] == git_repo.git.hash_object(str(clone_path / "a.py"))
+        assert blob_map["c.py"] != blob_map["a.py"]
+        assert repo.get_file_blob_sha("missing.py") is None
+    
+    def test_sparse_partial_clone(self, temp_dir):
+        """Test a blobless clone only checks out and downloads files matching the patterns."""
+        source_path = Path(temp_dir) / "source"
+        source_path.mkdir()
+        source = Repo.init(source_path, initial_branch="main")
+        with source.config_writer() as writer:
+            writer.set_value("user", "name", "Test")
+            writer.set_value("user", "email", "test@example.com")
+            writer.set_value("uploadpack", "allowFilter", "true")
+        
+        (source_path / "ReadMe.md").write_text("# Readme\n")
+        (source_path / "src").mkdir()
+        (source_path / "src" / "model.py").write_text("x = 1\n")
+        (source_path / "data").mkdir()
+        (source_path / "data" / "heads.bin").write_bytes(b"\x00" * 4096)
+        (source_path / "node_modules").mkdir()
+        (source_path / "node_modules" / "lib.js").write_text("var x;\n")
+        source.git.add("-A")
+        source.index.commit("initial")
+        
+        patterns = sparse_checkout_patterns(["**/*.py", "**/*.js"], ["**/.git/**", "**/node_modules/**"])
+        assert patterns[-1] == "!**/node_modules/**"
+        
+        clone_path = Path(temp_dir) / "clone"
+        repo = GitRepository(
+            f"file://{source_path}",
+            clone_path=clone_path,
+            branch="main",
+            clone_filter="blob:none",
+            sparse_patterns=patterns,
+        )
+        assert repo.clone()
+        
+        assert (clone_path / "ReadMe.md").exists()
+        assert (clone_path / "src" / "model.py").exists()
+        assert not (clone_path / "data" / "heads.bin").exists()
+        assert not (clone_path / "node_modules" / "lib.js").exists()
+        
+        # Blobs of files outside the patterns were never downloaded
+        missing = repo.repo.git.rev_list("--objects", "--all", "--missing=print")
+        assert "?" in missing
+        
+        # History is complete, so per-file commits still resolve
+        assert repo.get_file_commit_map()["data/heads.bin"] == repo.get_last_commit()
+        
+        # Existing full clones are not sparsified on update
+        full_path = Path(temp_dir) / "full"
+        assert GitRepository(f"file://{source_path}", clone_path=full_path, branch="main", sparse_patterns=[]).clone()
+        full = GitRepository(f"file://{source_path}", clone_path=full_path, branch="main", sparse_patterns=patterns)
+        success, _ = full.update()
+        assert success
+        assert (full_path / "data" / "heads.bin").exists()
+    
+    def test_object_reader(self, temp_dir):
+        """Test reading files at any revision through one cat-file process."""
+        clone_path = Path(temp_dir) / "test_repo"
+        clone_path.mkdir()
+        git_repo = Repo.init(clone_path)
+        with git_repo.config_writer() as writer:
+            writer.set_value("user", "name", "Test")
+            writer.set_value("user", "email", "test@example.com")
+        
+        (clone_path / "a.py").write_text("a = 1\n")
+        (clone_path / "data.bin").write_bytes(b"\x00\n\x01" * 1000)
+        git_repo.index.add(["a.py", "data.bin"])
+        first = git_repo.index.commit("first").hexsha
+        
+        (clone_path / "a.py").write_text("a = 2\n")
+        git_repo.index.add(["a.py"])
+        git_repo.index.commit("second")
+        
+        repo = GitRepository("https://github.com/user/repo.git", clone_path=clone_path)
+        assert repo.get_file_content("a.py") == "a = 2\n"
+        assert repo.get_file_content("a.py", first) == "a = 1\n"
+        assert repo.get_file_content("missing.py") is None
+        assert repo.object_reader.read_blob("HEAD", "data.bin") == b"\x00\n\x01" * 1000
+        process = repo.object_reader._process
+        assert repo.get_file_content("a.py") == "a = 2\n"
+        assert repo.object_reader._process is process
+        repo.close()
+        
+        async def read_concurrently():
+            paths = ["a.py", "data.bin", "missing.py"] * 20
+            contents = await repo.async_object_reader.read_blobs(first, paths)
+            await repo.aclose()
+            return contents
+        
+        contents = asyncio.run(read_concurrently())
+        assert contents[:3] == [b"a = 1\n", b"\x00\n\x01" * 1000, None]
+        assert contents == contents[:3] * 20
+        
+        # Bare mirrors have no working tree to read from
+        mirror = Repo.clone_from(str(clone_path), Path(temp_dir) / "mirror.git", mirror=True)
+        mirror_repo = GitRepository("https://github.com/user/repo.git", clone_path=mirror.git_dir)
+        assert mirror_repo.get_file_content("a.py", first) == "a = 1\n"
+        mirror_repo.close()
+    
+    def test_object_reader_missing_path_with_spaces(self, temp_dir):
+        """Test missing paths with spaces read as None, alone and next to existing files."""
+        clone_path = Path(temp_dir) / "test_repo"
+        clone_path.mkdir()
+        git_repo = Repo.init(clone_path)
+        with git_repo.config_writer() as writer:
+            writer.set_value("user", "name", "Test")
+            writer.set_value("user", "email", "test@example.com")
+        
+        (clone_path / "a.txt").write_text("a\n")
+        git_repo.index.add(["a.txt"])
+        git_repo.index.commit("first")
+        
+        repo = GitRepository("https://github.com/user/repo.git", clone_path=clone_path)
+        assert repo.get_file_content("my file.txt") is None
+        assert repo.get_file_content("a b c.txt") is None
+        assert repo.get_file_content("a.txt") == "a\n"
+        repo.close()
+        
+        async def read_alone_and_together():
+            alone = await repo.async_object_reader.read_blob("HEAD", "my file.txt")
+            together = await asyncio.gather(
+                repo.async_object_reader.read_blob("HEAD", "my file.txt"),
+                repo.async_object_reader.read_blob("HEAD", "a.txt"),
+            )
+            await repo.aclose()
+            return alone, together
+        
+        alone, together = asyncio.run(read_alone_and_together())
+        assert alone is None
+        assert together == [None, b"a\n"]
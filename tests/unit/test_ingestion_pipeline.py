@@ -0,0 +1,120 @@
+"""
+Tests for the staged ingestion pipeline.
+"""
+import asyncio
+
+import pytest
+
+from mfai_db_repos.core.services.ingestion_pipeline import SKIPPED, PipelineStage, StagedPipeline
+
+
+class TestStagedPipeline:
+    """Tests for the StagedPipeline class."""
+
+    @pytest.mark.asyncio
+    async def test_run_all_stages(self):
+        """Test items flow through every stage into the sink in groups."""
+        saved = []
+
+        async def double(key, item):
+            return item * 2
+
+        async def add_one(key, item):
+            return item + 1
+
+        async def sink(group):
+            saved.append([item for _, item in group])
+
+        pipeline = StagedPipeline(
+            stages=[
+                PipelineStage("double", double, concurrency=3),
+                PipelineStage("add_one", add_one, concurrency=2),
+            ],
+            sink=sink,
+            sink_batch_size=4,
+        )
+        result = await pipeline.run((str(i), i) for i in range(10))
+
+        assert result.success_count == 10
+        assert result.failure_count == 0
+        assert sorted(item for group in saved for item in group) == [2 * i + 1 for i in range(10)]
+        assert all(len(group) <= 4 for group in saved)
+        assert result.stage_stats["double"].processed == 10
+
+    @pytest.mark.asyncio
+    async def test_failures_and_dropped_items(self):
+        """Test failed and dropped items are reported without stopping the run."""
+        async def check(key, item):
+            if item == 3:
+                raise ValueError("bad item")
+            if item == 5:
+                return None
+            return item
+
+        async def failing_sink(group):
+            if any(item == 7 for _, item in group):
+                raise RuntimeError("database error")
+
+        pipeline = StagedPipeline(
+            stages=[PipelineStage("check", check, concurrency=2)],
+            sink=failing_sink,
+            sink_batch_size=1,
+        )
+        result = await pipeline.run((str(i), i) for i in range(8))
+
+        assert sorted(result.failed) == ["3", "5", "7"]
+        assert sorted(result.succeeded) == ["0", "1", "2", "4", "6"]
+        assert result.stage_stats["check"].dropped == 2
+
+    @pytest.mark.asyncio
+    async def test_skipped_items_are_not_failures(self):
+        """Test skipped items are reported apart from failed items."""
+        async def check(key, item):
+            if item == 2:
+                return SKIPPED
+            if item == 4:
+                return None
+            return item
+
+        async def sink(group):
+            pass
+
+        pipeline = StagedPipeline(
+            stages=[PipelineStage("check", check)],
+            sink=sink,
+        )
+        result = await pipeline.run((str(i), i) for i in range(5))
+
+        assert result.skipped == ["2"]
+        assert result.failed == ["4"]
+        assert result.success_count == 3
+        assert result.stage_stats["check"].skipped == 1
+        assert result.stage_stats["check"].dropped == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_item_does_not_stall_others(self):
+        """Test a slow item only occupies one worker while the rest are written."""
+        release = asyncio.Event()
+        saved = []
+
+        async def analyze(key, item):
+            if key == "slow":
+                await release.wait()
+            return item
+
+        async def sink(group):
+            saved.extend(key for key, _ in group)
+            if len(saved) == 5:
+                release.set()
+
+        pipeline = StagedPipeline(
+            stages=[PipelineStage("analysis", analyze, concurrency=2)],
+            sink=sink,
+            sink_batch_size=2,
+            sink_flush_interval=0.01,
+        )
+        items = [("slow", 0)] + [(f"fast{i}", i) for i in range(5)]
+        result = await asyncio.wait_for(pipeline.run(items), timeout=5)
+
+        assert result.success_count == 6
+        assert saved[-1] == "slow"
@@ -0,0 +1,60 @@
+"""
+Tests for the repository processing service.
+"""
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import pytest
+
+from mfai_db_repos.core.services import processing_service
+from mfai_db_repos.core.services.ingestion_pipeline import SKIPPED
+from mfai_db_repos.core.services.processing_service import RepositoryProcessingService
+from mfai_db_repos.lib.git.repository import FileChanges
+
+
+@asynccontextmanager
+async def fake_session_context():
+    """Stand in for the database session context."""
+    yield mock.Mock()
+
+
+class TestRepositoryProcessingService:
+    """Tests for the RepositoryProcessingService class."""
+
+    @pytest.mark.asyncio
+    async def test_rename_without_stored_row_is_processed(self):
+        """Test a rename that moves no row returns its new path for processing."""
+        file_repo = mock.Mock()
+        file_repo.delete_by_paths = mock.AsyncMock(return_value=0)
+        file_repo.rename = mock.AsyncMock(return_value=False)
+
+        git_repo = mock.Mock()
+        git_repo.get_last_commit.return_value = "abc123"
+        embedding_manager = mock.Mock()
+
+        changes = FileChanges(renamed=[("docs/x.rst", "docs/x.md")])
+        service = RepositoryProcessingService(local_analyzers=None)
+        with mock.patch.object(processing_service, "session_context", fake_session_context), \
+                mock.patch.object(processing_service, "RepositoryFileRepository", return_value=file_repo):
+            to_process, failed = await service.apply_removed_and_renamed_files(
+                1, git_repo, changes, embedding_manager
+            )
+
+        assert to_process == ["docs/x.md"]
+        assert failed == []
+        file_repo.rename.assert_awaited_once_with(1, "docs/x.rst", "docs/x.md", "abc123")
+        embedding_manager.embed_text_batched.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_read_stage_skips_empty_files(self, tmp_path):
+        """Test empty and binary files are skipped by the read stage, not failed."""
+        (tmp_path / "__init__.py").write_text("")
+        (tmp_path / "blob.dat").write_bytes(b"\x00\x01\x02")
+
+        git_repo = mock.Mock()
+        git_repo.repo.working_dir = str(tmp_path)
+        service = RepositoryProcessingService(local_analyzers=None)
+
+        assert await service._read_file_stage("__init__.py", git_repo) is SKIPPED
+        assert await service._read_file_stage("blob.dat", git_repo) is SKIPPED
+        assert await service._read_file_stage("missing.py", git_repo) is None